@@ -1,31 +1,55 @@
 import enum
+import functools
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 from importlib import resources as impresources
-from typing import List, Tuple, TypedDict
+from typing import TYPE_CHECKING, List, Tuple, TypedDict
 
 import numpy as np
-import pandas as pd
-from timescoring.annotations import Annotation as MaskEvents
 
 from . import bids
 
-# Load Seizure types defined in the HED-SCORE JSON event file
+if TYPE_CHECKING:
+    import pandas as pd
+
+# pandas and timescoring are imported on first use to keep the import of this module fast.
+
 BIDS_LOC = impresources.files(bids)
-szTypes = dict()
-with open(BIDS_LOC / "events.json", "r") as f:
-    eventsJSON = json.load(f)
-    szTypes = eventsJSON["Levels"]
-    del szTypes["bckg"]
 
-for key, _ in szTypes.items():
-    szTypes[key] = key
 
-SeizureType = enum.Enum("SeizureType", szTypes)
+@functools.cache
+def _loadEventTypes() -> tuple[dict, enum.EnumMeta, dict, enum.EnumMeta]:
+    """Load Seizure types defined in the HED-SCORE JSON event file.
+
+    Returns:
+        tuple[dict, EnumMeta, dict, EnumMeta]: szTypes, SeizureType, EVENT_TYPES and EventType.
+    """
+    with open(BIDS_LOC / "events.json", "r") as f:
+        eventsJSON = json.load(f)
+        szTypes = eventsJSON["eventType"]["Levels"]
+        del szTypes["bckg"]
+
+    for key, _ in szTypes.items():
+        szTypes[key] = key
+
+    SeizureType = enum.Enum("SeizureType", szTypes, module=__name__)
+
+    EVENT_TYPES = szTypes.copy()
+    EVENT_TYPES["bckg"] = "bckg"
+    EventType = enum.Enum("EventType", EVENT_TYPES, module=__name__)
+    return szTypes, SeizureType, EVENT_TYPES, EventType
+
+
+_EVENT_TYPE_NAMES = ("szTypes", "SeizureType", "EVENT_TYPES", "EventType")
 
-EVENT_TYPES = szTypes.copy()
-EVENT_TYPES["bckg"] = "bckg"
-EventType = enum.Enum("EventType", EVENT_TYPES)
+
+def __getattr__(name: str):
+    # Event types are built from events.json on first access
+    if name in _EVENT_TYPE_NAMES:
+        value = _loadEventTypes()[_EVENT_TYPE_NAMES.index(name)]
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # TODO Subclass dataFrame
 # Q? Expose dataFrame or getter class to get masks and annotations
@@ -36,7 +60,7 @@ class Annotation(TypedDict):
         float  # start time of the event from the beginning of the recording, in seconds
     )
     duration: float  # duration of the event, in seconds
-    eventType: EventType  # type of the event
+    eventType: enum.Enum  # type of the event, member of EventType
     confidence: float  # confidence in the event label. Values are in the range [0–1]
     channels: list[str]  # channels on which the event appears
     dateTime: datetime  # start date time of the recording file
@@ -49,6 +73,9 @@ class Annotations:
 
     @classmethod
     def loadTsv(cls, filename: str):
+        import pandas as pd
+
+        EventType = _loadEventTypes()[3]
         df = pd.read_csv(filename, delimiter="\t")
         annotations = cls()
         for _, row in df.iterrows():
@@ -94,11 +121,14 @@ class Annotations:
 
     @classmethod
     def loadMask(cls, mask, fs):
+        from timescoring.annotations import Annotation as MaskEvents
+
         maskEvent = MaskEvents(mask, fs)
         return cls.loadEvents(maskEvent.events, len(mask) / fs)
 
     @classmethod
     def loadEvents(cls, events: List[Tuple[float, float]], duration: float):
+        _, SeizureType, _, EventType = _loadEventTypes()
         annotations = cls()
         for event in events:
             annotation = Annotation()
@@ -123,6 +153,7 @@ class Annotations:
         return annotations
 
     def getEvents(self) -> list[(float, float)]:
+        SeizureType = _loadEventTypes()[1]
         events = list()
         for event in self.events:
             if event["eventType"].value in SeizureType._member_names_:
@@ -130,6 +161,7 @@ class Annotations:
         return events
 
     def getMask(self, fs: int) -> np.ndarray:
+        SeizureType = _loadEventTypes()[1]
         mask = np.zeros(int(self.events[0]["recordingDuration"] * fs))
         for event in self.events:
             if event["eventType"].value in SeizureType._member_names_:
@@ -140,6 +172,76 @@ class Annotations:
                 ] = 1
         return mask
 
+    def crop(self, start: float, duration: float):
+        """Crop annotations to a time window of the recording.
+
+        Events are clipped to the window and their onset is made relative to the start of the window. If no event
+        overlaps the window, a single background event covering the window is returned.
+
+        Args:
+            start (float): start of the window in seconds from the beginning of the recording.
+            duration (float): duration of the window in seconds.
+
+        Returns:
+            Annotations: a new Annotations object describing the window.
+        """
+        EventType = _loadEventTypes()[3]
+        annotations = Annotations()
+        end = start + duration
+        for event in self.events:
+            onset = max(event["onset"], start)
+            offset = min(event["onset"] + event["duration"], end)
+            if offset <= onset:
+                continue
+            annotation = Annotation(event)
+            annotation["onset"] = onset - start
+            annotation["duration"] = offset - onset
+            if isinstance(event["dateTime"], datetime):
+                annotation["dateTime"] = event["dateTime"] + timedelta(seconds=start)
+            annotation["recordingDuration"] = duration
+            annotations.events.append(annotation)
+        if len(annotations.events) == 0:
+            annotation = Annotation(self.events[0])
+            annotation["onset"] = 0
+            annotation["duration"] = duration
+            annotation["eventType"] = EventType.bckg
+            annotation["confidence"] = "n/a"
+            annotation["channels"] = "n/a"
+            if isinstance(annotation["dateTime"], datetime):
+                annotation["dateTime"] += timedelta(seconds=start)
+            annotation["recordingDuration"] = duration
+            annotations.events.append(annotation)
+        return annotations
+
+    def toDataFrame(self) -> "pd.DataFrame":
+        """Convert annotations to a DataFrame with one row per event.
+
+        Missing values ("n/a") are stored as nulls and channels are stored as comma separated strings.
+
+        Returns:
+            pd.DataFrame: DataFrame with one column per Annotation field.
+        """
+        import pandas as pd
+
+        columns = {key: list() for key in Annotation.__annotations__.keys()}
+        for event in self.events:
+            for key in columns.keys():
+                value = event[key]
+                if isinstance(value, str) and value == "n/a":
+                    value = None
+                elif key == "eventType":
+                    value = value.value
+                elif key == "channels":
+                    value = ",".join(value)
+                columns[key].append(value)
+        df = pd.DataFrame(columns)
+        for key in ("onset", "duration", "confidence", "recordingDuration"):
+            df[key] = pd.to_numeric(df[key]).astype("float64")
+        df["eventType"] = df["eventType"].astype("string")
+        df["channels"] = df["channels"].astype("string")
+        df["dateTime"] = pd.to_datetime(df["dateTime"]).astype("datetime64[us]")
+        return df
+
     def saveTsv(self, filename: str):
         with open(filename, "w") as f:
             line = "\t".join(list(Annotation.__annotations__.keys()))
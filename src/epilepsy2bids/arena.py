@@ -0,0 +1,107 @@
+"""Reuse of large arrays across recordings.
+
+Converting a dataset allocates and frees arrays of the same size for every recording (decoded data, selected
+electrodes, re-referenced data, ...). Allocations of that size are served by the operating system with fresh pages,
+which are zeroed on first touch and returned when the array is freed. A BufferArena keeps released arrays and serves
+later requests of the same size or smaller from them.
+
+An array obtained from an arena must not be used after it is released.
+"""
+
+import threading
+from typing import TypedDict
+
+import numpy as np
+
+
+class ArenaStats(TypedDict):
+    hits: int  # number of requests served by a released buffer
+    misses: int  # number of requests that allocated a buffer
+    buffers: int  # number of released buffers kept by the arena
+    bytes: int  # memory of the released buffers kept by the arena, in bytes
+
+
+class BufferArena:
+    def __init__(self, maxBytes: int = 2**30, growth: float = 1.25):
+        """Pool of reusable memory buffers.
+
+        The arena can be shared by threads.
+
+        Args:
+            maxBytes (int, optional): maximum memory of the released buffers kept by the arena, in bytes. Defaults to
+                                      1 GiB.
+            growth (float, optional): new buffers are allocated this much larger than requested, so that slightly
+                                      longer recordings reuse them. Defaults to 1.25.
+        """
+        self.maxBytes = maxBytes
+        self.growth = growth
+        self._lock = threading.Lock()
+        self._free: list[np.ndarray] = list()
+        self._used: dict[int, np.ndarray] = dict()
+        self._hits = 0
+        self._misses = 0
+
+    def stats(self) -> ArenaStats:
+        """Hit and miss counts and released buffers of the arena."""
+        with self._lock:
+            return ArenaStats(
+                hits=self._hits,
+                misses=self._misses,
+                buffers=len(self._free),
+                bytes=sum(x.nbytes for x in self._free),
+            )
+
+    def empty(self, shape: tuple[int, ...], dtype: np.dtype = np.float64) -> np.ndarray:
+        """Uninitialized C-contiguous array, backed by a released buffer if one is large enough.
+
+        Args:
+            shape (tuple[int, ...]): shape of the array.
+            dtype (np.dtype, optional): type of the array. Defaults to np.float64.
+
+        Returns:
+            np.ndarray: array to release with BufferArena.release once it is not used anymore.
+        """
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape)) * dtype.itemsize
+        with self._lock:
+            # Smallest released buffer that fits
+            candidates = [i for i, x in enumerate(self._free) if x.nbytes >= size]
+            if candidates:
+                buffer = self._free.pop(min(candidates, key=lambda i: self._free[i].nbytes))
+                self._hits += 1
+            else:
+                buffer = None
+                self._misses += 1
+        if buffer is None:
+            buffer = np.empty(max(int(size * self.growth), 1), dtype=np.uint8)
+        with self._lock:
+            self._used[id(buffer)] = buffer
+        return buffer[:size].view(dtype).reshape(shape)
+
+    def zeros(self, shape: tuple[int, ...], dtype: np.dtype = np.float64) -> np.ndarray:
+        """Array of zeros, backed by a released buffer if one is large enough (see BufferArena.empty)."""
+        array = self.empty(shape, dtype)
+        array.fill(0)
+        return array
+
+    def release(self, array: np.ndarray):
+        """Give the buffer of an array back to the arena. Arrays that do not come from the arena are ignored.
+
+        Args:
+            array (np.ndarray): array returned by BufferArena.empty or a view of it.
+        """
+        buffer = array
+        while isinstance(buffer, np.ndarray) and buffer.base is not None:
+            buffer = buffer.base
+        with self._lock:
+            if self._used.pop(id(buffer), None) is None:
+                return
+            self._free.append(buffer)
+            # Drop the oldest buffers beyond the budget
+            while sum(x.nbytes for x in self._free) > self.maxBytes:
+                self._free.pop(0)
+
+    def clear(self):
+        """Drop all released buffers. Statistics are kept."""
+        with self._lock:
+            self._free.clear()
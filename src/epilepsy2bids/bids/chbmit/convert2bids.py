@@ -1,89 +1,78 @@
 import os
+from functools import partial
 from importlib import resources as impresources
 from pathlib import Path
-from string import Template
 
 import pandas as pd
 
 from ... import bids
 from ...bids.convert2bids import BidsConverter
 from ...eeg import Eeg
-from ...load_annotations.chbmit import loadAnnotationsFromEdf
+from ...load_annotations.chbmit import loadAnnotationsFromEdf, loadAnnotationsIndex
+from ...sources import sourcePath
 
 BIDS_DIR = impresources.files(bids)
 DATASET = BIDS_DIR / "chbmit"
 
+# Recordings of chb12 stored with a unipolar montage
+UNIPOLAR_FILES = (
+    "chb12_27.edf",
+    "chb12_28.edf",
+    "chb12_29.edf",
+)
 
-def convert(root: Path, outDir: Path):
-    root = Path(root)
+
+class ChbmitBidsConverter(BidsConverter):
+    def loadEeg(self, edfFile: Path, start: float = 0, duration: float = None) -> list[Eeg]:
+        if os.path.basename(edfFile) not in UNIPOLAR_FILES:
+            return self.loadStandardized(
+                edfFile, Eeg.Montage.BIPOLAR, Eeg.BIPOLAR_DBANANA, "bipolar", start, duration
+            )
+        else:
+            return self.loadStandardized(
+                edfFile, Eeg.Montage.UNIPOLAR, Eeg.ELECTRODES_10_20, "bipolar", start, duration
+            )
+
+
+def convert(root: Path, outDir: Path, **kwargs):
+    """Convert the CHB-MIT dataset to BIDS.
+
+    Args:
+        root (Path): root folder of the source dataset.
+        outDir (Path): root folder of the BIDS output.
+        **kwargs: conversion options forwarded to BidsConverter (e.g. segments, select).
+    """
+    root = sourcePath(root)
     outDir = Path(outDir)
-    bidsConverter = BidsConverter(BIDS_DIR, DATASET, root, outDir, loadAnnotationsFromEdf)
-    subjects = []
-    for _, directory, _ in os.walk(root):
-        for subject in directory:
-            subjects.append(subject)
+    # Parse all annotation sources once
+    loadAnnotations = partial(loadAnnotationsFromEdf, index=loadAnnotationsIndex(root))
+    bidsConverter = ChbmitBidsConverter(
+        BIDS_DIR,
+        DATASET,
+        root,
+        outDir,
+        loadAnnotations,
+        Eeg.Montage.BIPOLAR,
+        Eeg.BIPOLAR_DBANANA,
+        "bipolar",
+        **kwargs,
+    )
+    subjects = [folder.name for folder in root.glob("**/*") if folder.is_dir()]
     for folder in subjects:
         print(folder)
         # Extract subject & session ID
         subject = os.path.split(folder)[-1][3:5]
         session = "01"
-        task = "szMonitoring"
         if subject == "21":
             subject = "01"
             session = "02"
 
-        # Create BIDS hierarchy
-        outPath = outDir / f"sub-{subject}" / f"ses-{session}" / "eeg"
-        os.makedirs(outPath, exist_ok=True)
-
         edfFiles = sorted((root / folder).glob("*.edf"))
-        for fileIndex, edfFile in enumerate(edfFiles):
-            edfBaseName = (
-                outPath
-                / f"sub-{subject}_ses-{session}_task-{task}_run-{fileIndex:02}_eeg"
-            )
-            edfFileName = edfBaseName.with_suffix(".edf")
-            # Load EEG and standardize it
-            if os.path.basename(edfFile) not in (
-                "chb12_27.edf",
-                "chb12_28.edf",
-                "chb12_29.edf",
-            ):
-                eeg = Eeg.loadEdf(
-                    edfFile.as_posix(), Eeg.Montage.BIPOLAR, Eeg.BIPOLAR_DBANANA
-                )
-                eeg.standardize(256, Eeg.BIPOLAR_DBANANA, "bipolar")
-            else:
-                eeg = Eeg.loadEdf(
-                    edfFile.as_posix(), Eeg.Montage.UNIPOLAR, Eeg.ELECTRODES_10_20
-                )
-                eeg.standardize(256, Eeg.ELECTRODES_10_20, "bipolar")
-
-            # Save EEG
-            eeg.saveEdf(edfFileName.as_posix())
-
-            # Save JSON sidecar
-            eegJsonDict = {
-                "fs": f"{eeg.fs:d}",
-                "channels": f"{eeg.data.shape[0]}",
-                "duration": f"{(eeg.data.shape[1] / eeg.fs):.2f}",
-                "task": task,
-            }
-
-            with open(DATASET / "eeg.json", "r") as f:
-                src = Template(f.read())
-                eegJsonSidecar = src.substitute(eegJsonDict)
-            with open(edfBaseName.with_suffix(".json"), "w") as f:
-                f.write(eegJsonSidecar)
-
-            # Load annotation
-            annotations = loadAnnotationsFromEdf(edfFile.as_posix())
-            annotations.saveTsv(edfBaseName.as_posix()[:-4] + "_events.tsv")
+        bidsConverter.buildBIDSHierarchy(edfFiles, subject, session, firstRun=0)
 
     # Build participant metadata
-    subjectInfo = pd.read_csv(
-        root / "SUBJECT-INFO", delimiter="\t", skip_blank_lines=True
-    )
+    with (root / "SUBJECT-INFO").open("rb") as f:
+        subjectInfo = pd.read_csv(f, delimiter="\t", skip_blank_lines=True)
     participants = {"participant_id": [], "age": [], "sex": [], "comment": []}
     for folder in outDir.glob("sub-*"):
         subject = os.path.split(folder)[-1]
@@ -1,13 +1,137 @@
+import copy
+import fnmatch
 import os
 import shutil
+from pathlib import Path
 from string import Template
+from typing import TypedDict
 
+import numpy as np
 import pandas as pd
 
-from ..eeg import Eeg
+from ..annotations import Annotations
+from ..arena import BufferArena
+from ..bidsio import EVENTS_TABLE, RUN_KEYS
+from ..cache import DiskCache
+from ..chunked import saveChunked
+from ..eeg import Eeg, FileFormat
+from ..labels import DEFAULT_LABEL_OPTIONS, LabelOptions, saveLabels
+from ..pyramid import DEFAULT_PYRAMID_OPTIONS, PyramidOptions, savePyramid
+from ..segments import DEFAULT_SEGMENT_OPTIONS, SegmentOptions, selectSegments
+from ..validator import ERROR, validateDataset
+
+
+class SelectionOptions(TypedDict):
+    subjects: list[str]  # BIDS labels of the subjects to convert
+    sessions: list[str]  # BIDS labels of the sessions to convert
+    splits: list[str]  # splits of the source dataset to convert (TUH: train, dev, eval)
+    include: list[str]  # glob patterns of the source EDF files to convert, relative to the root of the dataset
+    exclude: list[str]  # glob patterns of the source EDF files to skip, relative to the root of the dataset
+    timeRange: tuple[float, float]  # (start, stop) of the part of each recording to convert, in seconds
+
+
+DEFAULT_SELECTION_OPTIONS: SelectionOptions = {
+    "subjects": None,
+    "sessions": None,
+    "splits": None,
+    "include": None,
+    "exclude": None,
+    "timeRange": None,
+}
+
+
+class OutputTarget(TypedDict):
+    outDir: Path  # root folder of the BIDS output of the target
+    fs: int  # sampling frequency of the recordings, in Hz
+    reference: str  # referencing scheme of the recordings (see Eeg.standardize), None for the converter's reference
+    outputFormat: FileFormat  # format of the recordings: FileFormat.EDF, FileFormat.CHUNKED or FileFormat.PARQUET_ZSTD
+
+
+DEFAULT_OUTPUT_TARGET: OutputTarget = {
+    "outDir": None,
+    "fs": 256,
+    "reference": None,
+    "outputFormat": FileFormat.EDF,
+}
+
+# Extension of the recordings of each output format
+_OUTPUT_SUFFIXES = {
+    FileFormat.EDF: ".edf",
+    FileFormat.CHUNKED: f".{FileFormat.CHUNKED.value}",
+    FileFormat.PARQUET_ZSTD: ".parquet",
+}
+
 
 class BidsConverter:
-    def __init__(self, BIDS_DIR, DATASET, root, outDir, loadAnnotationsFromEdf, montage = Eeg.Montage.UNIPOLAR, electrodes = Eeg.ELECTRODES_10_20):
+    def __init__(
+        self,
+        BIDS_DIR,
+        DATASET,
+        root,
+        outDir,
+        loadAnnotationsFromEdf,
+        montage=Eeg.Montage.UNIPOLAR,
+        electrodes=Eeg.ELECTRODES_10_20,
+        reference: str = "Avg",
+        segments: SegmentOptions = None,
+        labels: LabelOptions = None,
+        cacheDir: Path = None,
+        select: SelectionOptions = None,
+        outputFormat: FileFormat = FileFormat.EDF,
+        targets: list[OutputTarget] = None,
+        arena: BufferArena = None,
+        pyramid: PyramidOptions = None,
+        validate: bool = False,
+    ):
+        """Helper to convert a dataset to BIDS.
+
+        Args:
+            BIDS_DIR (Path): folder containing the generic BIDS resources (events.json).
+            DATASET (Path): folder containing the dataset specific BIDS resources (eeg.json, participants.json, ...).
+            root (Path): root folder of the source dataset.
+            outDir (Path): root folder of the BIDS output.
+            loadAnnotationsFromEdf (Callable[[str], Annotations]): loads the annotations of a source EDF file.
+            montage (Montage, optional): montage of the source recordings. Defaults to Montage.UNIPOLAR.
+            electrodes (list[str], optional): electrodes to load. Defaults to the 19 electrodes of the 10-20 system.
+            reference (str, optional): referencing scheme of the output (see Eeg.standardize). Defaults to "Avg".
+            segments (SegmentOptions, optional): if provided, only seizure-centred and background segments of each
+                                                 recording are converted, each segment being saved as its own run.
+                                                 Missing options take their value from DEFAULT_SEGMENT_OPTIONS.
+                                                 Defaults to None which converts full recordings.
+            labels (LabelOptions, optional): if provided, the window labels and seizure intervals of each run are
+                                             cached in a _labels.npz file next to its events. Missing options take
+                                             their value from DEFAULT_LABEL_OPTIONS. Defaults to None.
+            cacheDir (Path, optional): folder of a DiskCache in which standardized recordings are stored and looked up
+                                       by content. Can be shared between conversions. Defaults to None (no cache).
+            select (SelectionOptions, optional): if provided, only the selected part of the dataset is converted.
+                                                 Filters are applied before any EDF file is opened, subjects,
+                                                 sessions and runs keep the labels they have in a full conversion.
+                                                 With segments, the annotations of skipped files are still loaded
+                                                 to count their runs. Missing options take their value from
+                                                 DEFAULT_SELECTION_OPTIONS. Defaults to None which converts the full
+                                                 dataset.
+            outputFormat (FileFormat, optional): format of the recordings, FileFormat.EDF or FileFormat.CHUNKED. The
+                                                 chunked compressed store is smaller and allows random access but is
+                                                 not a BIDS EEG format. Defaults to FileFormat.EDF.
+            targets (list[OutputTarget], optional): additional outputs produced in the same pass, e.g. another sampling
+                                                    frequency, reference or format. Each source file is decoded once
+                                                    for all outputs and resampled once per sampling frequency. Missing
+                                                    options take their value from DEFAULT_OUTPUT_TARGET. Defaults to
+                                                    None (outDir only).
+            arena (BufferArena, optional): if provided, data arrays are taken from the arena and released to it once
+                                           a run is saved, so that arrays are reused from one recording to the next.
+                                           Can be shared by the converters of a worker. Defaults to None.
+            pyramid (PyramidOptions, optional): if provided, the min/max envelope pyramid of each run is saved in a
+                                                _pyramid.npz file next to its recording, for visualization. Missing
+                                                options take their value from DEFAULT_PYRAMID_OPTIONS. Defaults to None.
+            validate (bool, optional): if True, every output is checked by validateDataset once its metadata is saved
+                                       and a ValueError is raised if it has errors. Defaults to False.
+
+        Raises:
+            ValueError: raised if an output format is not supported or a target has no outDir.
+        """
+        if outputFormat not in (FileFormat.EDF, FileFormat.CHUNKED):
+            raise ValueError("Unsupported output format {}".format(outputFormat))
         self.BIDS_DIR = BIDS_DIR
         self.DATASET = DATASET
         self.root = root
@@ -15,60 +139,331 @@ class BidsConverter:
         self.loadAnnotationsFromEdf = loadAnnotationsFromEdf
         self.montage = montage
         self.electrodes = electrodes
+        self.reference = reference
+        self.segments = None if segments is None else DEFAULT_SEGMENT_OPTIONS | segments
+        self.labels = None if labels is None else DEFAULT_LABEL_OPTIONS | labels
+        self.pyramid = None if pyramid is None else DEFAULT_PYRAMID_OPTIONS | pyramid
+        self.cache = None if cacheDir is None else DiskCache(cacheDir)
+        self.select = DEFAULT_SELECTION_OPTIONS | (select or {})
+        self.outputFormat = FileFormat(outputFormat)
+        self.arena = arena
+        self.validate = validate
+        # The main output is the first target
+        self.targets = [
+            OutputTarget(outDir=outDir, fs=256, reference=None, outputFormat=self.outputFormat)
+        ]
+        for target in targets or []:
+            target = DEFAULT_OUTPUT_TARGET | target
+            if target["outDir"] is None:
+                raise ValueError("Output target without outDir: {}".format(target))
+            if target["outputFormat"] not in _OUTPUT_SUFFIXES:
+                raise ValueError("Unsupported output format {}".format(target["outputFormat"]))
+            target["outDir"] = Path(target["outDir"])
+            target["outputFormat"] = FileFormat(target["outputFormat"])
+            self.targets.append(target)
+        # Events of all converted runs, consolidated in EVENTS_TABLE by saveMetadata
+        self.events = list()
+        # Patterns of files written next to the BIDS files that the BIDS validator should ignore
+        self.bidsIgnore = [EVENTS_TABLE]
+        if self.labels is not None:
+            self.bidsIgnore.append("*_labels.npz")
+        if self.pyramid is not None:
+            self.bidsIgnore.append("*_pyramid.npz")
 
+    def loadEeg(self, edfFile: Path, start: float = 0, duration: float = None) -> list[Eeg]:
+        """Load a source EDF file and standardize it for every output target.
 
-    def buildBIDSHierarchy(self, edfFiles, subject, session = "01", task = "szMonitoring", addEegJsonDict = None):        
-        # Create BIDS hierarchy
-        outPath = self.outDir / f"sub-{subject}" / f"ses-{session}" / "eeg"
-        os.makedirs(outPath, exist_ok=True)
-        for fileIndex, edfFile in enumerate(edfFiles):
-            edfBaseName = (
-                outPath / f"sub-{subject}_ses-{session}_task-{task}_run-{(fileIndex + 1):02}_eeg"
-            )
-            edfFileName = edfBaseName.with_suffix(".edf")
-            # Load EEG and standardize it
-            eeg = Eeg.loadEdf(edfFile.as_posix(), self.montage, self.electrodes)
-            eeg.standardize(256, self.electrodes, "Avg")
-
-            # Save EEG
-            eeg.saveEdf(edfFileName.as_posix())
-
-            # Save JSON sidecar
-            eegJsonDict = {
-                "fs": f"{eeg.fs:d}",
-                "channels": f"{eeg.data.shape[0]}",
-                "duration": f"{(eeg.data.shape[1] / eeg.fs):.2f}",
-                "task": task,
+        Args:
+            edfFile (Path): source EDF file.
+            start (float, optional): start of the data to load in seconds. Defaults to 0.
+            duration (float, optional): duration of the data to load in seconds. Defaults to None (until the end).
+
+        Returns:
+            list[Eeg]: standardized recording of each target, in the order of self.targets.
+        """
+        return self.loadStandardized(edfFile, self.montage, self.electrodes, self.reference, start, duration)
+
+    def loadStandardized(
+        self,
+        edfFile: Path,
+        montage: Eeg.Montage,
+        electrodes: list[str],
+        reference: str,
+        start: float = 0,
+        duration: float = None,
+    ) -> list[Eeg]:
+        """Load an EDF file and standardize it for every output target, through the cache of the converter if it has
+        one.
+
+        The file is decoded at most once and resampled once per sampling frequency. Targets with the same sampling
+        frequency and reference share the same recording. reference is used for targets without a reference.
+        """
+        parameters = [(target["fs"], target["reference"] or reference) for target in self.targets]
+        recordings = dict()
+        if self.cache is not None:
+            keys = {
+                (fs, targetReference): self.cache.key(
+                    edfFile.as_posix(), montage, electrodes, fs, targetReference, start, duration
+                )
+                for fs, targetReference in parameters
             }
-            if addEegJsonDict is not None:
-                eegJsonDict = eegJsonDict | addEegJsonDict
+            for x, key in keys.items():
+                eeg = self.cache.get(key)
+                if eeg is not None:
+                    recordings[x] = eeg
+        missing = [x for x in dict.fromkeys(parameters) if x not in recordings]
+        if missing:
+            decoded = Eeg.loadEdf(edfFile.as_posix(), montage, electrodes, start, duration, self.arena)
+            frequencies = list(dict.fromkeys(x[0] for x in missing))
+            for fs in frequencies:
+                references = [x[1] for x in missing if x[0] == fs]
+                # The last user of a recording modifies it in place instead of a copy
+                resampled = decoded if fs == frequencies[-1] else self._copy(decoded)
+                resampled.resample(fs, self.arena)
+                for i, targetReference in enumerate(references):
+                    eeg = resampled if i == len(references) - 1 else self._copy(resampled)
+                    # Electrodes are already selected and data resampled: standardize only re-references
+                    eeg.standardize(fs, electrodes, targetReference, self.arena, resampled=True)
+                    if self.cache is not None:
+                        self.cache.put(keys[(fs, targetReference)], eeg)
+                    recordings[(fs, targetReference)] = eeg
+        return [recordings[x] for x in parameters]
+
+    def _copy(self, eeg: Eeg) -> Eeg:
+        """Deep copy of a recording, with its data in an array of the arena if the converter has one."""
+        if self.arena is None:
+            return copy.deepcopy(eeg)
+        data = self.arena.empty(eeg.data.shape, eeg.data.dtype)
+        np.copyto(data, eeg.data)
+        return copy.deepcopy(eeg, {id(eeg.data): data})
+
+    def isSelected(self, subject: str = None, session: str = None, split: str = None, edfFile: Path = None) -> bool:
+        """Check whether part of the dataset is selected for conversion.
+
+        Args:
+            subject (str, optional): BIDS subject label. Defaults to None (not checked).
+            session (str, optional): BIDS session label. Defaults to None (not checked).
+            split (str, optional): split of the source dataset. Defaults to None (not checked).
+            edfFile (Path, optional): source EDF file. Defaults to None (not checked).
 
-            with open(self.DATASET / "eeg.json", "r") as f:
-                src = Template(f.read())
-                eegJsonSidecar = src.substitute(eegJsonDict)
-            with open(edfBaseName.with_suffix(".json"), "w") as f:
-                f.write(eegJsonSidecar)
+        Returns:
+            bool: True if the part of the dataset is selected.
+        """
+        for value, selection in ((subject, "subjects"), (session, "sessions"), (split, "splits")):
+            if value is not None and self.select[selection] is not None and value not in self.select[selection]:
+                return False
+        if edfFile is not None:
+            relativePath = Path(edfFile).relative_to(self.root).as_posix()
+            if self.select["include"] is not None and not any(
+                fnmatch.fnmatch(relativePath, pattern) for pattern in self.select["include"]
+            ):
+                return False
+            if self.select["exclude"] is not None and any(
+                fnmatch.fnmatch(relativePath, pattern) for pattern in self.select["exclude"]
+            ):
+                return False
+        return True
 
+    def selectRuns(self, annotations: Annotations) -> list[tuple[float, float, Annotations]]:
+        """Parts of a source recording converted to runs.
+
+        Args:
+            annotations (Annotations): annotations of the recording.
+
+        Returns:
+            list[tuple[float, float, Annotations]]: start (in seconds), duration (in seconds, None for the end of the
+                                                    recording) and annotations of each run. Empty if the recording
+                                                    ends before the start of the time range.
+        """
+        offset = 0
+        if self.select["timeRange"] is not None:
+            start, stop = self.select["timeRange"]
+            stop = min(stop, annotations.events[0]["recordingDuration"])
+            if stop <= start:
+                return []
+            annotations = annotations.crop(start, stop - start)
+            offset = start
+
+        if self.segments is None:
+            if self.select["timeRange"] is None:
+                return [(0, None, annotations)]
+            return [(offset, annotations.events[0]["recordingDuration"], annotations)]
+        return [
+            (
+                offset + segment["onset"],
+                segment["duration"],
+                annotations.crop(segment["onset"], segment["duration"]),
+            )
+            for segment in selectSegments(annotations, **self.segments)
+        ]
+
+    def buildBIDSHierarchy(
+        self, edfFiles, subject, session="01", task="szMonitoring", addEegJsonDict=None, firstRun=1
+    ):
+        if not self.isSelected(subject, session):
+            return
+        # Create BIDS hierarchy
+        outPaths = [target["outDir"] / f"sub-{subject}" / f"ses-{session}" / "eeg" for target in self.targets]
+        for outPath in outPaths:
+            os.makedirs(outPath, exist_ok=True)
+        run = firstRun
+        for edfFile in edfFiles:
+            # Skipped files keep their run numbers to keep labels consistent with a full conversion
+            selected = self.isSelected(edfFile=edfFile)
+            if not selected and self.segments is None:
+                # Without segments a file is a single run: it is skipped without being opened
+                run += 1
+                continue
             # Load annotation
             annotations = self.loadAnnotationsFromEdf(edfFile.as_posix())
-            annotations.saveTsv(edfBaseName.as_posix()[:-4] + "_events.tsv")
+            runs = self.selectRuns(annotations)
+            if not selected:
+                # The number of segments of a skipped file is only known from its annotations
+                run += len(runs)
+                continue
+            if self.segments is None and not runs:
+                # Recording ending before the time range: its run number is not given to the next file
+                run += 1
+                continue
+
+            for start, duration, runAnnotations in runs:
+                # Load EEG once and standardize it for every target
+                eegs = self.loadEeg(edfFile, start, duration)
+                for target, outPath, eeg in zip(self.targets, outPaths, eegs):
+                    edfBaseName = outPath / f"sub-{subject}_ses-{session}_task-{task}_run-{run:02}_eeg"
+                    self.saveRun(eeg, runAnnotations, edfBaseName, task, addEegJsonDict, target["outputFormat"])
+                if self.arena is not None:
+                    for eeg in eegs:
+                        self.arena.release(eeg.data)
+                self.addEvents(runAnnotations, subject, session, task, f"{run:02}")
+                run += 1
+
+    def addEvents(self, annotations: Annotations, subject: str, session: str, task: str, run: str):
+        """Add the events of a run to the consolidated events table.
+
+        Args:
+            annotations (Annotations): annotations of the run.
+            subject (str): BIDS subject label.
+            session (str): BIDS session label.
+            task (str): BIDS task label.
+            run (str): BIDS run index.
+        """
+        events = annotations.toDataFrame()
+        for key, value in zip(RUN_KEYS, (subject, session, task, run)):
+            events.insert(RUN_KEYS.index(key), key, value)
+        self.events.append(events)
+
+    def saveEventsTable(self, outDir: Path = None):
+        """Write the consolidated events table of the dataset.
 
+        Runs converted by this converter replace their previous rows in an existing table, other rows are kept.
+
+        Args:
+            outDir (Path, optional): root folder of the BIDS output. Defaults to None (self.outDir).
+        """
+        if len(self.events) == 0:
+            return
+        events = pd.concat(self.events, ignore_index=True)
+        tableFileName = (self.outDir if outDir is None else outDir) / EVENTS_TABLE
+        if tableFileName.exists():
+            previous = pd.read_parquet(tableFileName)
+            runs = pd.MultiIndex.from_frame(events[RUN_KEYS].drop_duplicates())
+            keep = ~pd.MultiIndex.from_frame(previous[RUN_KEYS]).isin(runs)
+            events = pd.concat([previous[keep], events], ignore_index=True)
+        events.sort_values(by=RUN_KEYS + ["onset"], inplace=True, kind="stable")
+        events.to_parquet(tableFileName, index=False)
+
+    def saveRun(
+        self,
+        eeg: Eeg,
+        annotations: Annotations,
+        edfBaseName: Path,
+        task: str,
+        addEegJsonDict: dict = None,
+        outputFormat: FileFormat = None,
+    ):
+        """Save the recording, JSON sidecar and events of a run.
+
+        Args:
+            eeg (Eeg): standardized recording.
+            annotations (Annotations): annotations of the recording.
+            edfBaseName (Path): path of the run without extension (ends with _eeg).
+            task (str): BIDS task name.
+            addEegJsonDict (dict, optional): additional substitutions for the eeg.json template. Defaults to None.
+            outputFormat (FileFormat, optional): format of the recording. Defaults to None (self.outputFormat).
+        """
+        # Save EEG
+        outputFormat = self.outputFormat if outputFormat is None else outputFormat
+        eegFileName = edfBaseName.with_suffix(_OUTPUT_SUFFIXES[outputFormat]).as_posix()
+        match outputFormat:
+            case FileFormat.EDF:
+                eeg.saveEdf(eegFileName)
+            case FileFormat.CHUNKED:
+                saveChunked(eeg, eegFileName)
+            case FileFormat.PARQUET_ZSTD:
+                eeg.saveDataFrame(eegFileName, FileFormat.PARQUET_ZSTD)
+        if self.pyramid is not None:
+            savePyramid(eeg, eegFileName, **self.pyramid)
+
+        # Save JSON sidecar
+        eegJsonDict = {
+            "fs": f"{eeg.fs:d}",
+            "channels": f"{eeg.data.shape[0]}",
+            "duration": f"{(eeg.data.shape[1] / eeg.fs):.2f}",
+            "task": task,
+        }
+        if addEegJsonDict is not None:
+            eegJsonDict = eegJsonDict | addEegJsonDict
+
+        with open(self.DATASET / "eeg.json", "r") as f:
+            src = Template(f.read())
+            eegJsonSidecar = src.substitute(eegJsonDict)
+        with open(edfBaseName.with_suffix(".json"), "w") as f:
+            f.write(eegJsonSidecar)
+
+        # Save annotations
+        eventsFileName = edfBaseName.as_posix()[:-4] + "_events.tsv"
+        annotations.saveTsv(eventsFileName)
+        if self.labels is not None:
+            saveLabels(eventsFileName, annotations, **self.labels)
 
     def saveMetadata(self, participants):
         participantsDf = pd.DataFrame(participants)
         participantsDf.sort_values(by=["participant_id"], inplace=True)
-        participantsDf.to_csv(self.outDir / "participants.tsv", sep="\t", index=False)
-        participantsJsonFileName = self.DATASET / "participants.json"
-        shutil.copy(participantsJsonFileName, self.outDir)
+        for target in self.targets:
+            outDir = target["outDir"]
+            participantsDf.to_csv(outDir / "participants.tsv", sep="\t", index=False)
+            participantsJsonFileName = self.DATASET / "participants.json"
+            shutil.copy(participantsJsonFileName, outDir)
+
+            # Copy Readme file
+            readmeFileName = self.DATASET / "README.md"
+            shutil.copyfile(readmeFileName, outDir / "README")
+
+            # Copy dataset description
+            descriptionFileName = self.DATASET / "dataset_description.json"
+            shutil.copy(descriptionFileName, outDir)
+
+            # Copy Events JSON Sidecar
+            eventsFileName = self.BIDS_DIR / "events.json"
+            shutil.copy(eventsFileName, outDir)
 
-        # Copy Readme file
-        readmeFileName = self.DATASET / "README.md"
-        shutil.copyfile(readmeFileName, self.outDir / "README")
+            # Write consolidated events table
+            self.saveEventsTable(outDir)
 
-        # Copy dataset description
-        descriptionFileName = self.DATASET / "dataset_description.json"
-        shutil.copy(descriptionFileName, self.outDir)
+            # List non-BIDS files for the BIDS validator
+            bidsIgnore = list(self.bidsIgnore)
+            if target["outputFormat"] != FileFormat.EDF:
+                bidsIgnore.append(f"*_eeg{_OUTPUT_SUFFIXES[target['outputFormat']]}")
+            with open(outDir / ".bidsignore", "w") as f:
+                f.write("\n".join(bidsIgnore) + "\n")
 
-        # Copy Events JSON Sidecar
-        eventsFileName = self.BIDS_DIR / "events.json"
-        shutil.copy(eventsFileName, self.outDir)
+            if self.validate:
+                report = validateDataset(outDir)
+                errors = report[report["severity"] == ERROR]
+                if len(errors):
+                    raise ValueError(
+                        "{} is not a valid BIDS dataset: {}".format(
+                            outDir, "; ".join(f"{x.file}: {x.message}" for x in errors.head(10).itertuples())
+                        )
+                    )
@@ -1,19 +1,30 @@
 import os
+from functools import partial
 from importlib import resources as impresources
 from pathlib import Path
 
 from ... import bids
 from ...bids.convert2bids import BidsConverter
-from ...load_annotations.seizeit import loadAnnotationsFromEdf
+from ...load_annotations.seizeit import loadAnnotationsFromEdf, loadAnnotationsIndex
+from ...sources import sourcePath
 
 BIDS_DIR = impresources.files(bids)
 DATASET = BIDS_DIR / "seizeit"
 
 
-def convert(root: Path, outDir: Path):
-    root = Path(root)
+def convert(root: Path, outDir: Path, **kwargs):
+    """Convert the SeizeIT1 dataset to BIDS.
+
+    Args:
+        root (Path): root folder of the source dataset.
+        outDir (Path): root folder of the BIDS output.
+        **kwargs: conversion options forwarded to BidsConverter (e.g. segments, select).
+    """
+    root = sourcePath(root)
     outDir = Path(outDir)
-    bidsConverter = BidsConverter(BIDS_DIR, DATASET, root, outDir, loadAnnotationsFromEdf)
+    # Parse all annotation sources once
+    loadAnnotations = partial(loadAnnotationsFromEdf, index=loadAnnotationsIndex(root))
+    bidsConverter = BidsConverter(BIDS_DIR, DATASET, root, outDir, loadAnnotations, **kwargs)
     for folder in root.glob("P_ID*"):
         print(folder)
         # Extract subject & session ID
@@ -23,13 +34,13 @@ def convert(root: Path, outDir: Path):
 
     # Build participant metadata
     participants = {"participant_id": [], "age": [], "sex": []}
-    for folder in outDir.glob("P_ID*"):
+    for folder in sorted(outDir.glob("sub-*")):
         print(folder)
         subject = os.path.split(folder)[-1]
         originalSubjectName = f"P_ID{subject[-2:]}"
         # Get information from header in one of the metadata files
         annotationFile = next((root / originalSubjectName).glob("*_a1.tsv"), None)
-        with open(annotationFile, "r") as f:
+        with annotationFile.open("r") as f:
             lines = f.readlines()
             age = int(lines[4].split(": ")[-1])
             sex = lines[3].split(": ")[-1][0].lower()
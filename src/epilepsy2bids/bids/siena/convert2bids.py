@@ -1,4 +1,5 @@
 import os
+from functools import partial
 from importlib import resources as impresources
 from pathlib import Path
 
@@ -6,16 +7,26 @@ import pandas as pd
 
 from ... import bids
 from ...bids.convert2bids import BidsConverter
-from ...load_annotations.siena import loadAnnotationsFromEdf
+from ...load_annotations.siena import loadAnnotationsFromEdf, loadAnnotationsIndex
+from ...sources import sourcePath
 
 BIDS_DIR = impresources.files(bids)
 DATASET = BIDS_DIR / "siena"
 
 
-def convert(root: Path, outDir: Path):
-    root = Path(root)
+def convert(root: Path, outDir: Path, **kwargs):
+    """Convert the Siena Scalp EEG dataset to BIDS.
+
+    Args:
+        root (Path): root folder of the source dataset.
+        outDir (Path): root folder of the BIDS output.
+        **kwargs: conversion options forwarded to BidsConverter (e.g. segments, select).
+    """
+    root = sourcePath(root)
     outDir = Path(outDir)
-    bidsConverter = BidsConverter(BIDS_DIR, DATASET, root, outDir, loadAnnotationsFromEdf)
+    # Parse all annotation sources once
+    loadAnnotations = partial(loadAnnotationsFromEdf, index=loadAnnotationsIndex(root))
+    bidsConverter = BidsConverter(BIDS_DIR, DATASET, root, outDir, loadAnnotations, **kwargs)
 
     for folder in root.glob("PN*"):
         print(folder)
@@ -25,7 +36,8 @@ def convert(root: Path, outDir: Path):
         bidsConverter.buildBIDSHierarchy(edfFiles, subject)
 
     # Build participant metadata
-    subjectInfo = pd.read_csv(root / "subject_info.csv")
+    with (root / "subject_info.csv").open("rb") as f:
+        subjectInfo = pd.read_csv(f)
     participants = {"participant_id": [], "age": [], "sex": []}
     for folder in outDir.glob("sub-*"):
         subject = os.path.split(folder)[-1]
@@ -1,20 +1,31 @@
 import os
+from functools import partial
 from importlib import resources as impresources
 from pathlib import Path
 
 from ... import bids
 from ...bids.convert2bids import BidsConverter
-from ...load_annotations.tuh import loadAnnotationsFromEdf
+from ...load_annotations.tuh import loadAnnotationsFromEdf, loadAnnotationsIndex
+from ...sources import sourcePath
 
 BIDS_DIR = impresources.files(bids)
 DATASET = BIDS_DIR / "tuh"
 
 
-def convert(root: Path, outDir: Path):
-    root = Path(root)
+def convert(root: Path, outDir: Path, **kwargs):
+    """Convert the TUH EEG Seizure Corpus to BIDS.
+
+    Args:
+        root (Path): root folder of the source dataset.
+        outDir (Path): root folder of the BIDS output.
+        **kwargs: conversion options forwarded to BidsConverter (e.g. segments, select).
+    """
+    root = sourcePath(root)
     outDir = Path(outDir)
+    # Parse all annotation sources once
+    loadAnnotations = partial(loadAnnotationsFromEdf, index=loadAnnotationsIndex(root))
     bidsConverter = BidsConverter(
-        BIDS_DIR, DATASET, root, outDir, loadAnnotationsFromEdf
+        BIDS_DIR, DATASET, root, outDir, loadAnnotations, **kwargs
     )
 
     subjectIdPairs = {}
@@ -45,6 +56,9 @@ def convert(root: Path, outDir: Path):
                         sessionFolder.name
                     ] = session
 
+                # IDs are assigned for the full corpus so that a subset keeps the IDs of a full conversion
+                if not bidsConverter.isSelected(split=subset):
+                    continue
                 edfFiles = sorted((root / sessionFolder).glob("**/*.edf"))
                 bidsConverter.buildBIDSHierarchy(edfFiles, subject, session)
 
@@ -0,0 +1,44 @@
+"""Files of converted BIDS datasets shared by the converters, the dataset index, the window index and the scoring."""
+
+import re
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv
+
+# Consolidated table of the events of all runs, written at the root of the BIDS dataset
+EVENTS_TABLE = "events.parquet"
+# BIDS entities identifying a run
+RUN_KEYS = ["subject", "session", "task", "run"]
+
+# Name of the _events.tsv files, from which the entities of the run are read
+EVENTS_FILE_REGEX = re.compile(
+    r"sub-(?P<subject>[^_]+)_ses-(?P<session>[^_]+)_task-(?P<task>[^_]+)_run-(?P<run>[^_]+)_events\.tsv$"
+)
+# Columns of the _events.tsv files read into event tables
+EVENTS_COLUMNS = {
+    "onset": pa.float64(),
+    "duration": pa.float64(),
+    "eventType": pa.string(),
+    "recordingDuration": pa.float64(),
+}
+
+
+def readEventsFile(eventsFile: Path) -> pd.DataFrame:
+    """Read the columns needed for scoring from an _events.tsv file and tag them with the BIDS entities of the run."""
+    table = pyarrow.csv.read_csv(
+        eventsFile,
+        parse_options=pyarrow.csv.ParseOptions(delimiter="\t"),
+        convert_options=pyarrow.csv.ConvertOptions(
+            column_types=EVENTS_COLUMNS,
+            include_columns=list(EVENTS_COLUMNS.keys()),
+            include_missing_columns=True,
+            null_values=["n/a", ""],
+        ),
+    )
+    df = table.to_pandas()
+    entities = EVENTS_FILE_REGEX.search(eventsFile.name)
+    for key in RUN_KEYS:
+        df[key] = entities.group(key)
+    return df
@@ -0,0 +1,350 @@
+"""Caches of decoded and standardized recordings.
+
+EegCache keeps recordings in memory up to a byte budget and evicts them in least recently used order. Its entries are
+keyed by the path and modification time of the EDF file and by the loading and standardization parameters, so that a
+modified file is never served from the cache.
+
+DiskCache stores standardized recordings on disk. Its entries are addressed by a hash of the content of the EDF file,
+of the standardization parameters and of the versions of the packages producing them, so that the cache can be shared
+between output directories, between datasets containing the same recordings and between processes, and is not reused
+after an upgrade.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import TypedDict
+
+import numpy as np
+
+from .eeg import Eeg, _headerFromJson, _headerToJson
+from .sources import openSource, sourceStat
+
+# Version of the DiskCache entry format. Changing it invalidates existing entries.
+_DISK_CACHE_VERSION = 1
+
+
+class CacheStats(TypedDict):
+    hits: int  # number of requests served from the cache
+    misses: int  # number of requests that loaded the recording
+    evictions: int  # number of entries evicted to respect the budget
+    entries: int  # number of entries in the cache
+    bytes: int  # memory used by the data of the entries, in bytes
+
+
+def _copy(eeg: Eeg) -> Eeg:
+    return Eeg(
+        eeg.data.copy(),
+        list(eeg.channels),
+        eeg.fs,
+        eeg.montage,
+        eeg._signalHeader.copy(),
+        eeg._fileHeader.copy(),
+    )
+
+
+class EegCache:
+    def __init__(self, maxBytes: int = 2**30):
+        """Least recently used cache of Eeg objects with a memory budget.
+
+        Recordings are returned as copies which can be modified without altering the cache. The cache can be shared by
+        threads.
+
+        Args:
+            maxBytes (int, optional): maximum memory used by the data of the cached recordings, in bytes. Recordings
+                                      larger than the budget are not cached. Defaults to 1 GiB.
+        """
+        self.maxBytes = maxBytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, Eeg] = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> CacheStats:
+        """Hit, miss and eviction counts and current size of the cache."""
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                entries=len(self._entries),
+                bytes=self._bytes,
+            )
+
+    def clear(self):
+        """Remove all entries. Statistics are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _get(self, key: tuple) -> Eeg:
+        with self._lock:
+            eeg = self._entries.get(key)
+            if eeg is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return eeg
+
+    def _put(self, key: tuple, eeg: Eeg):
+        size = eeg.data.nbytes
+        if size > self.maxBytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key).data.nbytes
+            self._entries[key] = eeg
+            self._bytes += size
+            while self._bytes > self.maxBytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.data.nbytes
+                self._evictions += 1
+
+    def loadEdf(
+        self,
+        edfFile: str,
+        montage: Eeg.Montage = Eeg.Montage.UNIPOLAR,
+        electrodes: list[str] = Eeg.ELECTRODES_10_20,
+        start: float = 0,
+        duration: float = None,
+    ) -> Eeg:
+        """Cached equivalent of Eeg.loadEdf."""
+        key = (
+            os.path.abspath(edfFile),
+            sourceStat(edfFile).st_mtime_ns,
+            Eeg.Montage(montage),
+            None if electrodes is None else tuple(electrodes),
+            None,
+            None,
+            start,
+            duration,
+        )
+        eeg = self._get(key)
+        if eeg is None:
+            eeg = Eeg.loadEdf(edfFile, montage, electrodes, start, duration)
+            self._put(key, eeg)
+        return _copy(eeg)
+
+    def loadStandardized(
+        self,
+        edfFile: str,
+        montage: Eeg.Montage = Eeg.Montage.UNIPOLAR,
+        electrodes: list[str] = Eeg.ELECTRODES_10_20,
+        fs: int = 256,
+        reference: str = "Avg",
+        start: float = 0,
+        duration: float = None,
+    ) -> Eeg:
+        """Cached equivalent of Eeg.loadEdf followed by Eeg.standardize(fs, electrodes, reference).
+
+        The decoded recording is looked up in the cache before decoding the file, so that standardizing a recording
+        with other parameters does not decode it again.
+        """
+        key = (
+            os.path.abspath(edfFile),
+            sourceStat(edfFile).st_mtime_ns,
+            Eeg.Montage(montage),
+            None if electrodes is None else tuple(electrodes),
+            fs,
+            reference,
+            start,
+            duration,
+        )
+        eeg = self._get(key)
+        if eeg is None:
+            eeg = self.loadEdf(edfFile, montage, electrodes, start, duration)
+            eeg.standardize(fs, electrodes, reference)
+            self._put(key, eeg)
+        return _copy(eeg)
+
+
+# Cache shared by the process
+EEG_CACHE = EegCache()
+
+
+@functools.cache
+def _packageVersions() -> dict:
+    """Versions of the packages decoding, resampling and standardizing the cached recordings.
+
+    Looked up once per process: the returned dict is shared and must not be modified.
+    """
+    versions = dict()
+    for package in ("epilepsy2bids", "pyedflib", "resampy"):
+        try:
+            versions[package] = version(package)
+        except PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+class DiskCache:
+    def __init__(self, cacheDir: Path):
+        """Content-addressed on-disk cache of standardized recordings.
+
+        Entries are written atomically and can be shared by concurrent processes.
+
+        Args:
+            cacheDir (Path): folder of the cache. It is created if it does not exist.
+        """
+        self.cacheDir = Path(cacheDir)
+        self._lock = threading.Lock()
+        self._contentHashes: dict[tuple, str] = dict()
+        self._hits = 0
+        self._misses = 0
+
+    def stats(self) -> CacheStats:
+        """Hit and miss counts of this instance and current size of the cache."""
+        entries = list(self.cacheDir.glob("*/*.json"))
+        size = sum(x.stat().st_size + x.with_suffix(".npy").stat().st_size for x in entries)
+        return CacheStats(hits=self._hits, misses=self._misses, evictions=0, entries=len(entries), bytes=size)
+
+    def contentHash(self, edfFile: str) -> str:
+        """SHA-256 of the content of a file. Hashes are memoized on the path, size and modification time of the file."""
+        stat = sourceStat(edfFile)
+        memoKey = (os.path.abspath(edfFile), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            contentHash = self._contentHashes.get(memoKey)
+        if contentHash is None:
+            digest = hashlib.sha256()
+            with openSource(edfFile) as f:
+                for chunk in iter(lambda: f.read(2**20), b""):
+                    digest.update(chunk)
+            contentHash = digest.hexdigest()
+            with self._lock:
+                self._contentHashes[memoKey] = contentHash
+        return contentHash
+
+    def key(
+        self,
+        edfFile: str,
+        montage: Eeg.Montage = Eeg.Montage.UNIPOLAR,
+        electrodes: list[str] = Eeg.ELECTRODES_10_20,
+        fs: int = 256,
+        reference: str = "Avg",
+        start: float = 0,
+        duration: float = None,
+    ) -> str:
+        """Address of a standardized recording in the cache."""
+        parameters = {
+            "version": _DISK_CACHE_VERSION,
+            "content": self.contentHash(edfFile),
+            "montage": Eeg.Montage(montage).value,
+            "electrodes": None if electrodes is None else list(electrodes),
+            "fs": fs,
+            "reference": reference,
+            "packages": _packageVersions(),
+            "start": start,
+            "duration": duration,
+        }
+        return hashlib.sha256(json.dumps(parameters, sort_keys=True).encode()).hexdigest()
+
+    def _paths(self, key: str) -> tuple[Path, Path]:
+        folder = self.cacheDir / key[:2]
+        return folder / f"{key}.npy", folder / f"{key}.json"
+
+    def _load(self, key: str) -> Eeg:
+        dataFile, metadataFile = self._paths(key)
+        try:
+            with open(metadataFile, "r") as f:
+                metadata = json.load(f)
+            data = np.load(dataFile)
+        except (OSError, ValueError):
+            return None
+        # Mark entry as recently used for prune
+        os.utime(metadataFile)
+        return Eeg(
+            data,
+            metadata["channels"],
+            metadata["fs"],
+            Eeg.Montage(metadata["montage"]),
+            _headerFromJson(metadata["signalHeader"]),
+            _headerFromJson(metadata["fileHeader"]),
+        )
+
+    def _save(self, key: str, eeg: Eeg):
+        dataFile, metadataFile = self._paths(key)
+        os.makedirs(dataFile.parent, exist_ok=True)
+        metadata = {
+            "channels": list(eeg.channels),
+            "fs": eeg.fs,
+            "montage": Eeg.Montage(eeg.montage).value,
+            "signalHeader": _headerToJson(eeg._signalHeader),
+            "fileHeader": _headerToJson(eeg._fileHeader),
+        }
+        # The metadata file is written last: an entry is complete once it exists
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(dataFile.with_name(dataFile.name + suffix), "wb") as f:
+            np.save(f, eeg.data)
+        os.replace(dataFile.with_name(dataFile.name + suffix), dataFile)
+        with open(metadataFile.with_name(metadataFile.name + suffix), "w") as f:
+            json.dump(metadata, f)
+        os.replace(metadataFile.with_name(metadataFile.name + suffix), metadataFile)
+
+    def get(self, key: str) -> Eeg:
+        """Recording stored under a key (see DiskCache.key). Returns None if the cache has no such entry."""
+        eeg = self._load(key)
+        with self._lock:
+            if eeg is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return eeg
+
+    def put(self, key: str, eeg: Eeg):
+        """Store a standardized recording under a key (see DiskCache.key)."""
+        self._save(key, eeg)
+
+    def loadStandardized(
+        self,
+        edfFile: str,
+        montage: Eeg.Montage = Eeg.Montage.UNIPOLAR,
+        electrodes: list[str] = Eeg.ELECTRODES_10_20,
+        fs: int = 256,
+        reference: str = "Avg",
+        start: float = 0,
+        duration: float = None,
+    ) -> Eeg:
+        """Cached equivalent of Eeg.loadEdf followed by Eeg.standardize(fs, electrodes, reference)."""
+        key = self.key(edfFile, montage, electrodes, fs, reference, start, duration)
+        eeg = self.get(key)
+        if eeg is None:
+            eeg = Eeg.loadEdf(edfFile, montage, electrodes, start, duration)
+            eeg.standardize(fs, electrodes, reference)
+            self.put(key, eeg)
+        return eeg
+
+    def prune(self, maxBytes: int):
+        """Remove least recently used entries until the cache is smaller than maxBytes.
+
+        Args:
+            maxBytes (int): maximum size of the cache, in bytes.
+        """
+        entries = list()
+        for metadataFile in self.cacheDir.glob("*/*.json"):
+            dataFile = metadataFile.with_suffix(".npy")
+            try:
+                stat = metadataFile.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size + dataFile.stat().st_size, metadataFile, dataFile))
+            except OSError:
+                continue
+        size = sum(x[1] for x in entries)
+        for _, entrySize, metadataFile, dataFile in sorted(entries, key=lambda x: x[0]):
+            if size <= maxBytes:
+                break
+            for file in (metadataFile, dataFile):
+                try:
+                    os.remove(file)
+                except FileNotFoundError:
+                    pass
+            size -= entrySize
@@ -0,0 +1,224 @@
+"""Chunked compressed store of EEG recordings with random access.
+
+A recording is stored in a single file as a sequence of compressed chunks, each chunk holding all channels over a fixed
+duration. Samples are quantized to int16 as in an EDF file written by Eeg.saveEdf, so that the store is as precise as an
+EDF conversion. They are optionally delta-encoded along time, which is lossless on the quantized samples. The low and
+high bytes of the samples are then stored in separate planes, which compress better, and compressed with zstd. The file
+ends with a JSON footer holding the metadata of the recording and the index of the chunks:
+
+    MAGIC | chunk 0 | chunk 1 | ... | footer (JSON) | footer size (uint64, little endian) | MAGIC
+
+Reading a time range only decompresses the chunks that cover it.
+"""
+
+import datetime
+import json
+import os
+import struct
+import threading
+
+import numpy as np
+
+from .eeg import Eeg, _headerFromJson, _headerToJson
+
+# pyarrow provides the zstd codec and is imported on first use.
+
+_MAGIC = b"E2BCHNK1"
+_FOOTER_SIZE = struct.Struct("<Q")
+_CODEC = "zstd"
+
+
+def saveChunked(eeg: Eeg, file: str, chunkDuration: float = 10, delta: bool = True, level: int = None):
+    """Save an Eeg object to a chunked compressed store.
+
+    Args:
+        eeg (Eeg): recording to save.
+        file (str): path of the file to save to. If directory does not exist it is created.
+        chunkDuration (float, optional): duration of a chunk, in seconds. Defaults to 10.
+        delta (bool, optional): if True the difference between consecutive samples is stored, which compresses
+                                better for smooth signals. Defaults to True.
+        level (int, optional): zstd compression level. Defaults to None (default level of the codec).
+    """
+    import pyarrow as pa
+
+    codec = pa.Codec(_CODEC, compression_level=level)
+    numChannels, numSamples = eeg.data.shape
+    # Same physical and digital ranges as Eeg.saveEdf: physical = gain * digital + baseline
+    if numSamples:
+        physicalMin = np.floor(np.min(eeg.data, axis=1))
+        physicalMax = np.ceil(np.max(eeg.data, axis=1))
+    else:
+        physicalMin = physicalMax = np.zeros(numChannels)
+    digitalMin = eeg._signalHeader["digital_min"]
+    digitalMax = eeg._signalHeader["digital_max"]
+    gains = np.where(physicalMax > physicalMin, (physicalMax - physicalMin) / (digitalMax - digitalMin), 1.0)
+    baselines = physicalMin - gains * digitalMin
+    chunkSize = max(1, int(round(chunkDuration * eeg.fs)))
+
+    if os.path.dirname(file):
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+    offsets = list()
+    sizes = list()
+    with open(file, "wb") as f:
+        f.write(_MAGIC)
+        for first in range(0, numSamples, chunkSize):
+            chunk = np.round((eeg.data[:, first : first + chunkSize] - baselines[:, None]) / gains[:, None])
+            chunk = np.clip(chunk, digitalMin, digitalMax).astype(np.int16)
+            if delta:
+                # int16 differences wrap around and are undone exactly by an int16 cumulative sum
+                chunk[:, 1:] = np.diff(chunk, axis=1)
+            planes = chunk.astype("<i2").view(np.uint8).reshape(chunk.shape + (2,)).transpose(2, 0, 1)
+            compressed = codec.compress(np.ascontiguousarray(planes).tobytes(), asbytes=True)
+            offsets.append(f.tell())
+            sizes.append(len(compressed))
+            f.write(compressed)
+        footer = json.dumps(
+            {
+                "channels": list(eeg.channels),
+                "fs": eeg.fs,
+                "montage": Eeg.Montage(eeg.montage).value,
+                "signalHeader": _headerToJson(eeg._signalHeader),
+                "fileHeader": _headerToJson(eeg._fileHeader),
+                "numSamples": numSamples,
+                "chunkSize": chunkSize,
+                "delta": delta,
+                "codec": _CODEC,
+                "gains": gains.tolist(),
+                "baselines": baselines.tolist(),
+                "chunkOffsets": offsets,
+                "chunkSizes": sizes,
+            }
+        ).encode()
+        f.write(footer)
+        f.write(_FOOTER_SIZE.pack(len(footer)))
+        f.write(_MAGIC)
+
+
+class ChunkedReader:
+    def __init__(self, file: str):
+        """Random-access reader of a chunked compressed store.
+
+        The file is kept open until close is called. The reader can be shared by threads.
+
+        Args:
+            file (str): path to the store.
+
+        Raises:
+            ValueError: raised if the file is not a chunked store.
+        """
+        import pyarrow as pa
+
+        self.file = file
+        self._f = open(file, "rb")
+        self._lock = threading.Lock()
+        tail = len(_MAGIC) + _FOOTER_SIZE.size
+        self._f.seek(-tail, os.SEEK_END)
+        end = self._f.read(tail)
+        self._f.seek(0)
+        if self._f.read(len(_MAGIC)) != _MAGIC or end[-len(_MAGIC) :] != _MAGIC:
+            self._f.close()
+            raise ValueError(f"{file} is not a chunked store.")
+        (footerSize,) = _FOOTER_SIZE.unpack(end[: _FOOTER_SIZE.size])
+        self._f.seek(-tail - footerSize, os.SEEK_END)
+        self.metadata = json.loads(self._f.read(footerSize))
+        self._codec = pa.Codec(self.metadata["codec"])
+        self._gains = np.array(self.metadata["gains"])
+        self._baselines = np.array(self.metadata["baselines"])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._f.close()
+
+    @property
+    def channels(self) -> list[str]:
+        return self.metadata["channels"]
+
+    @property
+    def fs(self) -> int:
+        return self.metadata["fs"]
+
+    @property
+    def numSamples(self) -> int:
+        return self.metadata["numSamples"]
+
+    def _readChunk(self, i: int) -> np.ndarray:
+        chunkSize = self.metadata["chunkSize"]
+        numSamples = min(chunkSize, self.numSamples - i * chunkSize)
+        with self._lock:
+            self._f.seek(self.metadata["chunkOffsets"][i])
+            compressed = self._f.read(self.metadata["chunkSizes"][i])
+        raw = self._codec.decompress(compressed, decompressed_size=len(self.channels) * numSamples * 2, asbytes=True)
+        planes = np.frombuffer(raw, dtype=np.uint8).reshape((2, len(self.channels), numSamples))
+        chunk = np.ascontiguousarray(planes.transpose(1, 2, 0)).view("<i2")[..., 0].astype(np.int16)
+        if self.metadata["delta"]:
+            chunk = np.cumsum(chunk, axis=1, dtype=np.int16)
+        return chunk
+
+    def read(self, start: int, stop: int = None, channels: list[str] = None) -> np.ndarray:
+        """Read a range of samples. Only the chunks covering the range are decompressed.
+
+        Args:
+            start (int): index of the first sample.
+            stop (int, optional): index after the last sample. Defaults to None (end of the recording).
+            channels (list[str], optional): channels to read. Defaults to None (all channels).
+
+        Returns:
+            NDArray[Shape['*, *'], float32]: data (channels x samples).
+        """
+        stop = self.numSamples if stop is None else min(stop, self.numSamples)
+        start = min(start, stop)
+        rows = np.arange(len(self.channels)) if channels is None else [self.channels.index(x) for x in channels]
+        chunkSize = self.metadata["chunkSize"]
+        data = np.empty((len(rows), stop - start), dtype=np.int16)
+        for i in range(start // chunkSize, -(-stop // chunkSize)):
+            first = max(start, i * chunkSize)
+            last = min(stop, (i + 1) * chunkSize)
+            chunk = self._readChunk(i)
+            data[:, first - start : last - start] = chunk[rows, first - i * chunkSize : last - i * chunkSize]
+        return (data * self._gains[rows, None] + self._baselines[rows, None]).astype(np.float32)
+
+    def toEeg(self, start: float = 0, duration: float = None, channels: list[str] = None) -> Eeg:
+        """Read a time range as an Eeg object.
+
+        Args:
+            start (float, optional): start of the data to load in seconds. Defaults to 0.
+            duration (float, optional): duration of the data to load in seconds. Defaults to None (until the end).
+            channels (list[str], optional): channels to load. Defaults to None (all channels).
+
+        Returns:
+            Eeg: recording.
+        """
+        first = int(round(start * self.fs))
+        stop = None if duration is None else first + int(round(duration * self.fs))
+        fileHeader = _headerFromJson(self.metadata["fileHeader"])
+        if start and isinstance(fileHeader.get("startdate"), datetime.datetime):
+            fileHeader["startdate"] += datetime.timedelta(seconds=start)
+        return Eeg(
+            self.read(first, stop, channels),
+            list(self.channels if channels is None else channels),
+            self.fs,
+            Eeg.Montage(self.metadata["montage"]),
+            _headerFromJson(self.metadata["signalHeader"]),
+            fileHeader,
+        )
+
+
+def loadChunked(file: str, start: float = 0, duration: float = None, channels: list[str] = None) -> Eeg:
+    """Instantiate an Eeg object from a chunked compressed store.
+
+    Args:
+        file (str): path to the store.
+        start (float, optional): start of the data to load in seconds. Defaults to 0.
+        duration (float, optional): duration of the data to load in seconds. Defaults to None (until the end).
+        channels (list[str], optional): channels to load. Defaults to None (all channels).
+
+    Returns:
+        Eeg: recording.
+    """
+    with ChunkedReader(file) as reader:
+        return reader.toEeg(start, duration, channels)
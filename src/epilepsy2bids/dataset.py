@@ -0,0 +1,421 @@
+"""Indexed reader of converted BIDS datasets.
+
+The tree of a converted dataset is scanned once into an in-memory index of its participants, runs (with the sampling
+frequency, number of channels and duration of their _eeg.json sidecar) and events. The index is persisted in a cache
+file at the root of the dataset, a Parquet table of the events holding the rest of the index as JSON in its schema
+metadata. When the dataset is opened again, only the modification times of the indexed directories and files are
+checked and the files that changed since the index was built are parsed again.
+"""
+
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .annotations import Annotations, SeizureType
+from .bidsio import RUN_KEYS, readEventsFile
+from .chunked import loadChunked
+from .eeg import Eeg, FileFormat
+from .labels import DEFAULT_LABEL_OPTIONS, Labels, loadLabels
+from .pyramid import Pyramid, loadPyramid
+
+# Cache of the index, written at the root of the dataset. Hidden files are ignored by the BIDS validator.
+INDEX_CACHE = ".epilepsy2bids_index.parquet"
+_INDEX_VERSION = 2
+# Key of the schema metadata of the cache holding the index, except the events
+_INDEX_METADATA_KEY = "epilepsy2bids_index"
+
+_EEG_FILE_REGEX = re.compile(
+    r"sub-(?P<subject>[^_]+)_ses-(?P<session>[^_]+)_task-(?P<task>[^_]+)_run-(?P<run>[^_]+)_eeg\.(?:edf|chunked)$"
+)
+_RUN_COLUMNS = RUN_KEYS + ["edfFile", "fs", "channels", "duration", "numSeizures"]
+
+
+def _eventsFile(eegFile: Path) -> Path:
+    """Path of the _events.tsv file of a recording."""
+    return eegFile.with_name(eegFile.name[: eegFile.name.rindex("_eeg.")] + "_events.tsv")
+
+
+class Run:
+    def __init__(self, root: Path, info: dict):
+        """Lazy handle on a run of a BIDS dataset. No data is read until one of the load methods is called.
+
+        Args:
+            root (Path): root folder of the BIDS dataset.
+            info (dict): row of the runs table of a BidsDataset.
+        """
+        self.subject = info["subject"]
+        self.session = info["session"]
+        self.task = info["task"]
+        self.run = info["run"]
+        self.edfFile = Path(root) / info["edfFile"]
+        self.eventsFile = _eventsFile(self.edfFile)
+        self.fs = info["fs"]
+        self.channels = info["channels"]
+        self.duration = info["duration"]
+
+    def __repr__(self) -> str:
+        return f"Run(sub-{self.subject}_ses-{self.session}_task-{self.task}_run-{self.run})"
+
+    def loadEeg(self, start: float = 0, duration: float = None) -> Eeg:
+        """Load the recording of the run.
+
+        Args:
+            start (float, optional): start of the data to load in seconds. Defaults to 0.
+            duration (float, optional): duration of the data to load in seconds. Defaults to None (until the end).
+
+        Returns:
+            Eeg: recording of the run.
+        """
+        if self.edfFile.suffix == f".{FileFormat.CHUNKED.value}":
+            return loadChunked(self.edfFile.as_posix(), start, duration)
+        return Eeg.loadEdfAutoDetectMontage(self.edfFile.as_posix(), start, duration)
+
+    def loadAnnotations(self) -> Annotations:
+        """Load the annotations of the run from its _events.tsv file."""
+        return Annotations.loadTsv(self.eventsFile.as_posix())
+
+    def loadLabels(
+        self,
+        window: float = DEFAULT_LABEL_OPTIONS["window"],
+        stride: float = DEFAULT_LABEL_OPTIONS["stride"],
+        minOverlap: float = DEFAULT_LABEL_OPTIONS["minOverlap"],
+    ) -> Labels:
+        """Load the window labels of the run from its label cache (see labels.loadLabels)."""
+        return loadLabels(self.eventsFile.as_posix(), window, stride, minOverlap)
+
+    def loadPyramid(self) -> Pyramid:
+        """Load the min/max envelope pyramid of the run saved by the converter (see pyramid.loadPyramid)."""
+        return loadPyramid(self.edfFile.as_posix())
+
+
+def _signature(path: Path) -> tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _readSidecar(jsonFile: Path) -> tuple[float, float, float]:
+    """Read the sampling frequency, number of channels and duration of a run from its _eeg.json sidecar."""
+    try:
+        with open(jsonFile, "r") as f:
+            sidecar = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return np.nan, np.nan, np.nan
+    return (
+        float(sidecar.get("SamplingFrequency", np.nan)),
+        float(sidecar.get("EEGChannelCount", np.nan)),
+        float(sidecar.get("RecordingDuration", np.nan)),
+    )
+
+
+def _tableToJson(df: pd.DataFrame) -> dict:
+    """JSON serializable columns of a table."""
+    return {column: df[column].tolist() for column in df.columns}
+
+
+def _tableFromJson(columns: dict) -> pd.DataFrame:
+    return pd.DataFrame(columns, columns=list(columns.keys()))
+
+
+def _readEvents(eventsFile: Path) -> pd.DataFrame:
+    if not eventsFile.exists():
+        return None
+    return readEventsFile(eventsFile)
+
+
+class BidsDataset:
+    def __init__(self, root: Path, cacheFile: Path = INDEX_CACHE, numWorkers: int = None):
+        """Index of a converted BIDS dataset.
+
+        Args:
+            root (Path): root folder of the BIDS dataset.
+            cacheFile (Path, optional): file in which the index is persisted. Relative paths are relative to root.
+                                        If None the index is not persisted. Defaults to INDEX_CACHE.
+            numWorkers (int, optional): number of threads used to parse files. Defaults to None (Python default).
+        """
+        self.root = Path(root)
+        self.cacheFile = None if cacheFile is None else self.root / cacheFile
+        self.numWorkers = numWorkers
+
+        index = self._loadCache()
+        if index is None or not self._isValid(index):
+            index = self._scan(index)
+            self._saveCache(index)
+
+        self.participants = index["participants"]
+        self.events = index["events"]
+        self.runs = index["runs"]
+
+    def __len__(self) -> int:
+        return len(self.runs)
+
+    def __getitem__(self, index: int) -> Run:
+        return Run(self.root, self.runs.iloc[index])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def subjects(self) -> list[str]:
+        return sorted(self.runs["subject"].unique())
+
+    def query(
+        self,
+        subject: str | list[str] = None,
+        session: str | list[str] = None,
+        task: str | list[str] = None,
+        run: str | list[str] = None,
+        minDuration: float = None,
+        hasSeizure: bool = None,
+    ) -> pd.DataFrame:
+        """Select runs of the dataset.
+
+        Args:
+            subject (str | list[str], optional): subject label(s) to select. Defaults to None (all).
+            session (str | list[str], optional): session label(s) to select. Defaults to None (all).
+            task (str | list[str], optional): task label(s) to select. Defaults to None (all).
+            run (str | list[str], optional): run index(es) to select. Defaults to None (all).
+            minDuration (float, optional): minimum duration of the runs in seconds. Defaults to None.
+            hasSeizure (bool, optional): if True only runs with seizures are selected, if False only runs without
+                                         seizures. Defaults to None (all).
+
+        Returns:
+            pd.DataFrame: selected rows of the runs table.
+        """
+        mask = self._entityMask(self.runs, subject=subject, session=session, task=task, run=run)
+        if minDuration is not None:
+            mask &= self.runs["duration"].to_numpy() >= minDuration
+        if hasSeizure is not None:
+            mask &= (self.runs["numSeizures"].to_numpy() > 0) == hasSeizure
+        return self.runs[mask]
+
+    def queryEvents(
+        self,
+        eventType: str | list[str] = None,
+        subject: str | list[str] = None,
+        session: str | list[str] = None,
+        task: str | list[str] = None,
+        run: str | list[str] = None,
+    ) -> pd.DataFrame:
+        """Select events of the dataset.
+
+        Args:
+            eventType (str | list[str], optional): event type(s) to select. "seizure" selects all seizure types.
+                                                   Defaults to None (all).
+            subject, session, task, run (str | list[str], optional): BIDS entities to select. Defaults to None (all).
+
+        Returns:
+            pd.DataFrame: selected rows of the events table.
+        """
+        if eventType == "seizure":
+            eventType = SeizureType._member_names_
+        mask = self._entityMask(
+            self.events, subject=subject, session=session, task=task, run=run, eventType=eventType
+        )
+        return self.events[mask]
+
+    def getRuns(self, runs: pd.DataFrame = None) -> list[Run]:
+        """Build lazy handles on runs of the dataset.
+
+        Args:
+            runs (pd.DataFrame, optional): rows of the runs table, as returned by query. Defaults to None (all runs).
+
+        Returns:
+            list[Run]: handles on the runs.
+        """
+        if runs is None:
+            runs = self.runs
+        return [Run(self.root, row) for row in runs.to_dict("records")]
+
+    @staticmethod
+    def _entityMask(df: pd.DataFrame, **values) -> np.ndarray:
+        mask = np.ones(len(df), dtype=bool)
+        for key, value in values.items():
+            if value is None:
+                continue
+            if isinstance(value, str):
+                value = [value]
+            mask &= df[key].isin(value).to_numpy()
+        return mask
+
+    def _directories(self) -> list[Path]:
+        """Subject, session and eeg directories. Their modification time changes when runs are added or removed."""
+        directories = list()
+        for subjectDir in sorted(self.root.glob("sub-*")):
+            directories.append(subjectDir)
+            for sessionDir in sorted(subjectDir.glob("ses-*")):
+                directories.append(sessionDir)
+                if (sessionDir / "eeg").is_dir():
+                    directories.append(sessionDir / "eeg")
+        return directories
+
+    def _isValid(self, index: dict) -> bool:
+        """Check that none of the indexed directories and files changed since the index was built."""
+        # The root directory is compared on its subjects as writing the cache changes its modification time
+        if sorted(x.name for x in self.root.glob("sub-*")) != index["subjects"]:
+            return False
+        try:
+            for path, mtime in index["directories"].items():
+                if os.stat(self.root / path).st_mtime_ns != mtime:
+                    return False
+            for path, signature in index["files"].items():
+                if _signature(self.root / path) != signature:
+                    return False
+        except OSError:
+            return False
+        return True
+
+    def _scan(self, previous: dict = None) -> dict:
+        """Scan the dataset. Files whose signature did not change are not parsed again."""
+        previousFiles = dict() if previous is None else previous["files"]
+        previousSidecars = dict() if previous is None else previous["sidecars"]
+        previousEvents = dict() if previous is None else previous["eventTables"]
+
+        directories = {d.relative_to(self.root).as_posix(): os.stat(d).st_mtime_ns for d in self._directories()}
+        edfFiles = sorted(
+            x for x in self.root.glob("sub-*/ses-*/eeg/*_eeg.*") if _EEG_FILE_REGEX.search(x.name)
+        )
+
+        files = dict()
+        toParseSidecars = list()
+        toParseEvents = list()
+        for edfFile in edfFiles:
+            for path, toParse in (
+                (edfFile.with_suffix(".json"), toParseSidecars),
+                (_eventsFile(edfFile), toParseEvents),
+            ):
+                key = path.relative_to(self.root).as_posix()
+                try:
+                    files[key] = _signature(path)
+                except OSError:
+                    continue
+                if previousFiles.get(key) != files[key]:
+                    toParse.append(key)
+        participantsFile = self.root / "participants.tsv"
+        if participantsFile.exists():
+            files["participants.tsv"] = _signature(participantsFile)
+
+        with ThreadPoolExecutor(self.numWorkers) as executor:
+            sidecars = dict(
+                zip(toParseSidecars, executor.map(lambda x: _readSidecar(self.root / x), toParseSidecars))
+            )
+            eventTables = dict(
+                zip(toParseEvents, executor.map(lambda x: _readEvents(self.root / x), toParseEvents))
+            )
+        sidecars = {key: sidecars.get(key, previousSidecars.get(key)) for key in files if key.endswith(".json")}
+        eventTables = {
+            key: eventTables.get(key, previousEvents.get(key)) for key in files if key.endswith("_events.tsv")
+        }
+
+        # Participants
+        if participantsFile.exists():
+            participants = pd.read_csv(participantsFile, sep="\t", dtype={"participant_id": str})
+        else:
+            participants = pd.DataFrame(columns=["participant_id"])
+
+        # Events
+        tables = [x for x in eventTables.values() if x is not None]
+        if len(tables):
+            events = pd.concat(tables, ignore_index=True)
+        else:
+            events = pd.DataFrame(columns=RUN_KEYS + ["onset", "duration", "eventType", "recordingDuration"])
+        seizures = events[events["eventType"].isin(SeizureType._member_names_)]
+        numSeizures = seizures.groupby(RUN_KEYS).size()
+
+        # Runs
+        rows = list()
+        for edfFile in edfFiles:
+            entities = _EEG_FILE_REGEX.search(edfFile.name)
+            key = tuple(entities.group(x) for x in RUN_KEYS)
+            sidecarKey = edfFile.with_suffix(".json").relative_to(self.root).as_posix()
+            fs, channels, duration = sidecars.get(sidecarKey) or (np.nan, np.nan, np.nan)
+            rows.append(
+                key
+                + (edfFile.relative_to(self.root).as_posix(), fs, channels, duration, int(numSeizures.get(key, 0)))
+            )
+        runs = pd.DataFrame(rows, columns=_RUN_COLUMNS)
+
+        return {
+            "version": _INDEX_VERSION,
+            "subjects": sorted(x.name for x in self.root.glob("sub-*")),
+            "directories": directories,
+            "files": files,
+            "sidecars": sidecars,
+            "eventTables": eventTables,
+            "participants": participants,
+            "events": events,
+            "runs": runs,
+        }
+
+    def _loadCache(self) -> dict:
+        if self.cacheFile is None or not self.cacheFile.exists():
+            return None
+        import pyarrow.parquet as pq
+
+        try:
+            table = pq.read_table(self.cacheFile)
+            metadata = json.loads((table.schema.metadata or dict())[_INDEX_METADATA_KEY.encode()])
+            if not isinstance(metadata, dict) or metadata.get("version") != _INDEX_VERSION:
+                return None
+            # Events of each _events.tsv file, in the order of the events table
+            events = table.to_pandas()
+            groups = dict(tuple(events.groupby("eventsFile", sort=False)))
+            eventTables = {
+                key: groups.get(key, events.iloc[:0]).drop(columns="eventsFile").reset_index(drop=True)
+                for key in metadata["eventsFiles"]
+            }
+            return {
+                "version": metadata["version"],
+                "subjects": metadata["subjects"],
+                "directories": metadata["directories"],
+                "files": {key: tuple(value) for key, value in metadata["files"].items()},
+                "sidecars": {key: None if x is None else tuple(x) for key, x in metadata["sidecars"].items()},
+                "eventTables": eventTables,
+                "participants": _tableFromJson(metadata["participants"]),
+                "events": events.drop(columns="eventsFile"),
+                "runs": _tableFromJson(metadata["runs"]),
+            }
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+
+    def _saveCache(self, index: dict):
+        if self.cacheFile is None:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        eventTables = {key: x for key, x in index["eventTables"].items() if x is not None}
+        if eventTables:
+            events = pd.concat([x.assign(eventsFile=key) for key, x in eventTables.items()], ignore_index=True)
+        else:
+            events = index["events"].assign(eventsFile=pd.Series(dtype=str))
+        metadata = {
+            "version": index["version"],
+            "subjects": index["subjects"],
+            "directories": index["directories"],
+            "files": index["files"],
+            "sidecars": index["sidecars"],
+            "eventsFiles": list(eventTables.keys()),
+            "participants": _tableToJson(index["participants"]),
+            "runs": _tableToJson(index["runs"]),
+        }
+        table = pa.Table.from_pandas(events, preserve_index=False)
+        table = table.replace_schema_metadata(
+            (table.schema.metadata or dict()) | {_INDEX_METADATA_KEY: json.dumps(metadata)}
+        )
+        # Write to a temporary file first so that concurrent readers never see a partial cache
+        tmpFile = self.cacheFile.with_name(f"{self.cacheFile.name}.{os.getpid()}.tmp")
+        try:
+            pq.write_table(table, tmpFile)
+            os.replace(tmpFile, self.cacheFile)
+        except OSError:
+            # Read-only datasets are indexed in memory only. A partial cache (e.g. full disk) is removed.
+            try:
+                tmpFile.unlink(missing_ok=True)
+            except OSError:
+                pass
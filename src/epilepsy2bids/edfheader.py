@@ -0,0 +1,187 @@
+"""Parsing of the header of EDF(+) files, without the EDF library.
+
+The header of an EDF file is made of 256 bytes describing the recording followed by 256 bytes per signal. It gives the
+layout of the data records, which hold the samples of every signal as little-endian 16-bit integers. Headers and data
+records are read with plain file reads, so that any number of readers can open the same file and only the first
+256 * (numSignals + 1) bytes of a stream are consumed to parse a header.
+"""
+
+import datetime
+import re
+from typing import IO
+
+import numpy as np
+
+# Label of the signal holding the annotations of EDF+ files
+EDF_ANNOTATIONS = "EDF Annotations"
+
+# Width of the fields of the signal headers of an EDF file, in the order of the header
+_EDF_SIGNAL_FIELDS = {
+    "label": 16,
+    "transducer": 80,
+    "dimension": 8,
+    "physicalMin": 8,
+    "physicalMax": 8,
+    "digitalMin": 8,
+    "digitalMax": 8,
+    "prefilter": 80,
+    "samplesPerRecord": 8,
+    "reserved": 32,
+}
+_EDFPLUS_STARTDATE = re.compile(r"^Startdate \d\d-[A-Z]{3}-(\d{4}) ")
+# Onset of the first time-keeping annotation of a data record
+_TIME_KEEPING = re.compile(rb"^[+-](\d+)(\.\d+)?\x14\x14")
+
+
+def edfHeaderSize(header: bytes) -> int:
+    """Size in bytes of the header of an EDF file, from its first 256 bytes."""
+    return 256 * (int(header[252:256]) + 1)
+
+
+def _startDateTime(header: bytes) -> datetime.datetime:
+    """Start of the recording from the startdate and starttime fields, with the 1985 clipping of two-digit years."""
+    day, month, year = (int(x) for x in header[168:176].decode("latin-1").split("."))
+    hour, minute, second = (int(x) for x in header[176:184].decode("latin-1").split("."))
+    year += 1900 if year > 84 else 2000
+    # EDF+ files store the four-digit year in the recording identification
+    match = _EDFPLUS_STARTDATE.match(header[88:168].decode("latin-1"))
+    if header[192:197] == b"EDF+" and match and int(match.group(1)) % 100 == year % 100:
+        year = int(match.group(1))
+    return datetime.datetime(year, month, day, hour, minute, second)
+
+
+def parseEdfHeader(header: bytes) -> dict:
+    """Parse the header of an EDF file.
+
+    Args:
+        header (bytes): first edfHeaderSize(header) bytes of the EDF file.
+
+    Returns:
+        dict: fields of the header. version, patient, recording, reserved, startDateTime, headerBytes, numRecords,
+              recordDuration (in seconds) and duration (in seconds) describe the file. labels, transducers,
+              dimensions, prefilters, samplesPerRecord, physicalMin, physicalMax, digitalMin and digitalMax hold one
+              value per signal, including annotation signals. recordBytes is the size of a data record.
+
+    Raises:
+        ValueError: raised if the header is truncated or a field can not be parsed.
+    """
+    numSignals = int(header[252:256])
+    if len(header) < 256 * (numSignals + 1):
+        raise ValueError(f"EDF header of {numSignals} signals truncated to {len(header)} bytes.")
+    signalHeader = header[256 : 256 * (numSignals + 1)]
+    fields = dict()
+    offset = 0
+    for field, width in _EDF_SIGNAL_FIELDS.items():
+        fields[field] = [
+            signalHeader[offset + i * width : offset + (i + 1) * width].decode("latin-1").strip()
+            for i in range(numSignals)
+        ]
+        offset += numSignals * width
+    samplesPerRecord = np.array([int(x) for x in fields["samplesPerRecord"]], dtype=int)
+    numRecords = int(header[236:244])
+    recordDuration = float(header[244:252])
+    return {
+        "version": header[0:8].decode("latin-1").strip(),
+        "patient": header[8:88].decode("latin-1").strip(),
+        "recording": header[88:168].decode("latin-1").strip(),
+        "startDateTime": _startDateTime(header),
+        "headerBytes": int(header[184:192]),
+        "reserved": header[192:236].decode("latin-1").strip(),
+        "numRecords": numRecords,
+        "recordDuration": recordDuration,
+        "duration": numRecords * recordDuration,
+        "labels": fields["label"],
+        "transducers": fields["transducer"],
+        "dimensions": fields["dimension"],
+        "prefilters": fields["prefilter"],
+        "samplesPerRecord": samplesPerRecord,
+        "recordBytes": 2 * int(samplesPerRecord.sum()),
+        "physicalMin": np.array([float(x) for x in fields["physicalMin"]]),
+        "physicalMax": np.array([float(x) for x in fields["physicalMax"]]),
+        "digitalMin": np.array([float(x) for x in fields["digitalMin"]]),
+        "digitalMax": np.array([float(x) for x in fields["digitalMax"]]),
+    }
+
+
+def _readHeaderBytes(f: IO[bytes]) -> bytes:
+    header = f.read(256)
+    if len(header) < 256:
+        raise ValueError("EDF header truncated.")
+    return header + f.read(edfHeaderSize(header) - 256)
+
+
+def readEdfHeader(source) -> dict:
+    """Read the header of an EDF file.
+
+    Args:
+        source (str | Path | IO): path of an EDF file or binary file object positioned at the start of an EDF file.
+                                  Only the header is read from the file object.
+
+    Returns:
+        dict: fields of the header (see parseEdfHeader).
+    """
+    if hasattr(source, "read"):
+        return parseEdfHeader(_readHeaderBytes(source))
+    with open(source, "rb") as f:
+        return parseEdfHeader(_readHeaderBytes(f))
+
+
+def readEdfStart(source) -> tuple[datetime.datetime, float]:
+    """Start time and duration of an EDF recording.
+
+    The start time of EDF+ files includes the fraction of a second given by the time-keeping annotation of their first
+    data record, as reported by the EDF library.
+
+    Args:
+        source (str | Path | IO): path of an EDF file or binary file object positioned at the start of an EDF file.
+                                  Only the header and, for EDF+ files, the first data record are read.
+
+    Returns:
+        tuple[datetime.datetime, float]: start of the recording and its duration in seconds.
+    """
+    if not hasattr(source, "read"):
+        with open(source, "rb") as f:
+            return readEdfStart(f)
+    header = readEdfHeader(source)
+    startDateTime = header["startDateTime"]
+    if header["reserved"].startswith("EDF+") and EDF_ANNOTATIONS in header["labels"] and header["numRecords"] != 0:
+        index = header["labels"].index(EDF_ANNOTATIONS)
+        record = source.read(header["recordBytes"])
+        offset = 2 * int(header["samplesPerRecord"][:index].sum())
+        match = _TIME_KEEPING.match(record[offset : offset + 2 * int(header["samplesPerRecord"][index])])
+        if match and match.group(2):
+            microseconds = round(float(b"0" + match.group(2)) * 1e6)
+            startDateTime += datetime.timedelta(microseconds=microseconds)
+    return startDateTime, header["duration"]
+
+
+def quantizationSteps(header: dict) -> np.ndarray:
+    """Physical value of a digital unit of each signal of an EDF file."""
+    return (header["physicalMax"] - header["physicalMin"]) / (header["digitalMax"] - header["digitalMin"])
+
+
+def readEdfRecords(f: IO[bytes], header: dict, first: int, numRecords: int) -> list[np.ndarray]:
+    """Physical values of each signal of a range of data records of an EDF file.
+
+    Args:
+        f (IO[bytes]): binary file object of the EDF file, moved to the first data record to read.
+        header (dict): header of the EDF file (see readEdfHeader).
+        first (int): index of the first data record.
+        numRecords (int): number of data records. Fewer records are returned past the end of the file.
+
+    Returns:
+        list[NDArray[Shape['*'], float]]: samples of each signal, in the order of the header.
+    """
+    f.seek(header["headerBytes"] + first * header["recordBytes"])
+    raw = f.read(numRecords * header["recordBytes"])
+    # The last data record of a truncated file is ignored
+    raw = raw[: len(raw) - len(raw) % header["recordBytes"]]
+    records = np.frombuffer(raw, dtype="<i2").reshape((-1, header["recordBytes"] // 2))
+    gains = quantizationSteps(header)
+    offsets = np.concatenate(([0], np.cumsum(header["samplesPerRecord"])))
+    return [
+        (records[:, offsets[i] : offsets[i + 1]].ravel() - header["digitalMin"][i]) * gains[i]
+        + header["physicalMin"][i]
+        for i in range(len(header["labels"]))
+    ]
+
@@ -1,22 +1,94 @@
 """Eeg class to manipulate EEG data and associated metadata. The class interfaces with EDF files."""
 
+import copy
 import datetime
 import enum
+import json
 import os
 import re
+import sys
+import weakref
 from typing import TypedDict
 
 import numpy as np
-import pandas as pd
-import pyedflib
-import resampy
+
+from .arena import BufferArena
+from .edfheader import EDF_ANNOTATIONS
+from .sources import openEdf, sourceEdfHeader
+
+# pandas, pyarrow, pyedflib and resampy (which compiles its kernels with numba) are imported on first use to keep the
+# import of this module fast.
+
+# Key of the Eeg metadata in the schema metadata of Parquet files
+_PARQUET_METADATA_KEY = "epilepsy2bids"
+
+
+def _headerToJson(header: dict) -> dict:
+    """Convert an EDF file or signal header to a JSON serializable dict. Dates are stored as ISO 8601 strings."""
+    converted = dict()
+    for key, value in header.items():
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            value = {"isoformat": value.isoformat(), "type": type(value).__name__}
+        elif isinstance(value, np.generic):
+            value = value.item()
+        converted[key] = value
+    return converted
+
+
+def _headerFromJson(header: dict) -> dict:
+    """Inverse of _headerToJson."""
+    converted = dict()
+    for key, value in header.items():
+        if isinstance(value, dict) and "isoformat" in value:
+            if value["type"] == "datetime":
+                value = datetime.datetime.fromisoformat(value["isoformat"])
+            else:
+                value = datetime.date.fromisoformat(value["isoformat"])
+        converted[key] = value
+    return converted
+
+
+def _rawSidecar(file: str) -> str:
+    """Path of the JSON sidecar of a raw binary array written by Eeg.saveRaw."""
+    return os.path.splitext(file)[0] + ".json"
+
+
+def _attachSharedMemory(name: str):
+    """Attach to an existing shared memory block without taking ownership of it."""
+    from multiprocessing import resource_tracker, shared_memory
+
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Before Python 3.13 attaching registers the block with the resource tracker, which would destroy it when this
+    # process exits if the tracker is not the one of the creator.
+    block = shared_memory.SharedMemory(name=name)
+    resource_tracker.unregister(block._name, "shared_memory")
+    return block
+
+
+def _releaseSharedMemory(block, owner: bool):
+    """Close a shared memory block and destroy it if owner is True. Used as finalizer of the Eeg owning the block."""
+    try:
+        block.close()
+    except BufferError:
+        # Arrays on the block are still referenced: it stays mapped until they are freed
+        pass
+    if owner:
+        if sys.version_info < (3, 13):
+            from multiprocessing import resource_tracker
+
+            # Processes sharing the resource tracker of the creator unregister the block when they attach to it
+            resource_tracker.register(block._name, "shared_memory")
+        block.unlink()
 
 
 class FileFormat(str, enum.Enum):
+    CHUNKED = "chunked"
     CSV = "csv"
     CSV_GZIP = "csv.gzip"
     EDF = "edf"
     PARQUET_GZIP = "parquet.gzip"
+    PARQUET_ZSTD = "parquet.zstd"
 
 
 class Eeg:
@@ -136,6 +208,90 @@ class Eeg:
         self.montage = montage
         self._signalHeader = signalHeader
         self._fileHeader = fileHeader
+        self._sharedMemory = None  # shared memory block backing data, see toSharedMemory
+        self._sharedData = None  # array created on the shared memory block
+        self._ownsSharedMemory = False  # True if the block was created by this object
+        self._sharedFinalizer = None  # destroys the block created by this object when it is garbage collected
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["_sharedMemory"] = None
+        state["_sharedData"] = None
+        state["_ownsSharedMemory"] = False
+        state["_sharedFinalizer"] = None
+        if self._sharedMemory is not None and self.data is self._sharedData:
+            # Data stays in shared memory: only the name of the block is pickled
+            state["data"] = None
+            state["_sharedMemoryName"] = self._sharedMemory.name
+            state["_sharedShape"] = self.data.shape
+            state["_sharedDtype"] = self.data.dtype.str
+        return state
+
+    def __setstate__(self, state: dict):
+        name = state.pop("_sharedMemoryName", None)
+        shape = state.pop("_sharedShape", None)
+        dtype = state.pop("_sharedDtype", None)
+        self.__dict__.update(
+            {"_sharedMemory": None, "_sharedData": None, "_ownsSharedMemory": False, "_sharedFinalizer": None} | state
+        )
+        if name is not None:
+            self._sharedMemory = _attachSharedMemory(name)
+            self._sharedData = np.ndarray(shape, dtype=dtype, buffer=self._sharedMemory.buf)
+            self.data = self._sharedData
+
+    def __deepcopy__(self, memo: dict):
+        # Deep copies hold their data in private memory
+        copied = self.__class__.__new__(self.__class__)
+        memo[id(self)] = copied
+        for key, value in self.__dict__.items():
+            if key in ("_sharedMemory", "_sharedData", "_sharedFinalizer"):
+                value = None
+            elif key == "_ownsSharedMemory":
+                value = False
+            else:
+                value = copy.deepcopy(value, memo)
+            setattr(copied, key, value)
+        return copied
+
+    def toSharedMemory(self):
+        """Move the data to a shared memory block.
+
+        A pickled Eeg whose data is in shared memory only contains the name of the block: passing it to another
+        process copies no sample data and processes see each other's changes to the data. The block is freed by
+        releaseSharedMemory, which must be called by the process that created it once all processes are done with
+        the data, or when the Eeg that created it is garbage collected. Data replaced by a processing method (e.g.
+        resample) is no longer shared.
+
+        Data not in shared memory is pickled as a regular array which, with pickle protocol 5, can be transferred
+        out-of-band (see pickle.PickleBuffer).
+        """
+        from multiprocessing import shared_memory
+
+        self.releaseSharedMemory()
+        data = np.asarray(self.data)
+        self._sharedMemory = shared_memory.SharedMemory(create=True, size=max(1, data.nbytes))
+        self._sharedData = np.ndarray(data.shape, dtype=data.dtype, buffer=self._sharedMemory.buf)
+        self._sharedData[...] = data
+        self._ownsSharedMemory = True
+        self._sharedFinalizer = weakref.finalize(self, _releaseSharedMemory, self._sharedMemory, True)
+        self.data = self._sharedData
+
+    def releaseSharedMemory(self):
+        """Copy the data back to private memory and close its shared memory block.
+
+        The block is destroyed if it was created by this object, other processes must no longer use it.
+        """
+        if self._sharedMemory is None:
+            return
+        if self.data is self._sharedData:
+            self.data = self._sharedData.copy()
+        self._sharedData = None
+        if self._sharedFinalizer is not None:
+            self._sharedFinalizer.detach()
+            self._sharedFinalizer = None
+        _releaseSharedMemory(self._sharedMemory, self._ownsSharedMemory)
+        self._ownsSharedMemory = False
+        self._sharedMemory = None
 
     @classmethod
     def loadEdf(
@@ -143,36 +299,56 @@ class Eeg:
         edfFile: str,
         montage: Montage = Montage.UNIPOLAR,
         electrodes: list[str] = ELECTRODES_10_20,
+        start: float = 0,
+        duration: float = None,
+        arena: BufferArena = None,
     ):
         """Instantiate an Eeg object from an EDF file.
 
         Args:
-            edfFile (str): path to EDF file.
+            edfFile (str): path to EDF file. Paths inside .zip or .tar(.gz) archives, .edf.gz files, bytes and binary
+                           file objects are also accepted (see sources.openEdf).
             montage (Montage, optional): montage of the EEG recording. Defaults to Montage.UNIPOLAR.
             electrodes (list[str], optional): electrodes to load. If None all electrodes are loaded.
                                               For a bipolar montage, electrodes are expected in dash separated pairs
                                               (e.g. Fp1-F3). Defaults to the 19 electrodes of the 10-20 system.
+            start (float, optional): time in seconds from the beginning of the recording at which to start reading.
+                                     Defaults to 0.
+            duration (float, optional): duration in seconds to read. Only the samples within [start, start + duration]
+                                        are decoded. If None the recording is read until its end. Defaults to None.
+            arena (BufferArena, optional): if provided, the data array is taken from the arena. Defaults to None.
 
         Returns:
             Eeg: returns an Eeg instance containing the data of the EDF file.
         """
-        with pyedflib.EdfReader(edfFile) as edf:
+        with openEdf(edfFile) as edf:
             samplingFrequencies = edf.getSampleFrequencies()
-            data = list()
+            nSamples = edf.getNSamples()
+            indices = list()
             channels = list()
+
+            def sampleRange(i: int) -> tuple[int, int]:
+                # First sample and number of samples of signal i within [start, start + duration]
+                first = min(int(round(start * samplingFrequencies[i])), nSamples[i])
+                if duration is None:
+                    n = nSamples[i] - first
+                else:
+                    n = min(int(round(duration * samplingFrequencies[i])), nSamples[i] - first)
+                return first, n
+
             # If electrodes are provided, load them
             if electrodes is not None:
                 allChannels = edf.getSignalLabels()
                 for electrode in electrodes:
                     try:
                         index = Eeg._findChannelIndex(allChannels, electrode, montage)
-                        data.append(edf.readSignal(index))
+                        indices.append(index)
                         channels.append(edf.getLabel(index))
                     except ValueError:
                         print(
                             f"Missing electrode {electrode} in file {edfFile} replaced by zeros."
                         )
-                        data.append(np.zeros_like(edf.readSignal(0)))
+                        indices.append(None)
                         channels.append(electrode)
             # Else read all channels with a fixed fs
             else:
@@ -180,14 +356,29 @@ class Eeg:
                 fixedFs = samplingFrequencies[index]
                 for i, fs in enumerate(samplingFrequencies):
                     if fixedFs == fs:
-                        data.append(edf.readSignal(i))
+                        indices.append(i)
                         channels.append(edf.getLabel(i))
+
+            # Signals are decoded directly in the rows of the data array
+            numSamples = sampleRange(next((i for i in indices if i is not None), 0))[1]
+            shape = (len(indices), numSamples)
+            data = np.empty(shape) if arena is None else arena.empty(shape)
+            for row, i in enumerate(indices):
+                if i is None:
+                    data[row] = 0
+                    continue
+                first, n = sampleRange(i)
+                if n != numSamples:
+                    raise ValueError(f"Signals of {edfFile} have different lengths.")
+                edf.readsignal(i, first, n, data[row])
             signalHeader = edf.getSignalHeader(index)
             fileHeader = edf.getHeader()
+            if start:
+                fileHeader["startdate"] += datetime.timedelta(seconds=start)
             edf._close()
 
         return cls(
-            np.array(data),
+            data,
             channels,
             samplingFrequencies[index],
             montage,
@@ -196,18 +387,24 @@ class Eeg:
         )
 
     @classmethod
-    def loadEdfAutoDetectMontage(cls, edfFile: str):
+    def loadEdfAutoDetectMontage(cls, edfFile: str, start: float = 0, duration: float = None):
         """Instantiate an Eeg object from an EDF file while auto-detecting electrodes and montage.
 
         Args:
-            edfFile (str): path to EDF file.
+            edfFile (str): path to EDF file, or any other source accepted by loadEdf.
+            start (float, optional): time in seconds from the beginning of the recording at which to start reading.
+                                     Defaults to 0.
+            duration (float, optional): duration in seconds to read. If None the recording is read until its end.
+                                        Defaults to None.
 
         Returns:
             Eeg: returns an Eeg instance containing the data of the EDF file.
         """
-        with pyedflib.EdfReader(edfFile) as edf:
-            channel = edf.getLabel(0)
-            edf._close()
+        if hasattr(edfFile, "read"):
+            # The file object is read twice: to detect the montage and to load the data
+            edfFile = edfFile.read()
+        # The montage is detected from the header only, without decoding the file
+        channel = next(x for x in sourceEdfHeader(edfFile)["labels"] if x != EDF_ANNOTATIONS)
         if (
             channel.upper() == Eeg.ELECTRODES_10_20[0].upper()
             or channel.upper() == f"{Eeg.ELECTRODES_10_20[0].upper()}-AVG"
@@ -222,20 +419,31 @@ class Eeg:
                 f"Unrecognized electrode: {channel}. Expected {Eeg.ELECTRODES_10_20[0]} or {Eeg.ELECTRODES_10_20[0]}-Avg or {Eeg.BIPOLAR_DBANANA[0]}"
             )
 
-        return cls.loadEdf(edfFile, montage, electrodes)
+        return cls.loadEdf(edfFile, montage, electrodes, start, duration)
 
-    def resample(self, newFs: int):
+    def resample(self, newFs: int, arena: BufferArena = None):
         """Resample data to a new sampling frequency.
 
         Args:
             newFs (int): new sampling frequency in Hz.
+            arena (BufferArena, optional): if provided, the previous data array is released to the arena. Defaults to
+                                           None.
         """
-        self.data = resampy.resample(self.data, self.fs, newFs)
+        import resampy
+
+        data = self.data
+        self.data = resampy.resample(data, self.fs, newFs)
         self.fs = newFs
+        if arena is not None:
+            arena.release(data)
 
-    def reReferenceToBipolar(self):
+    def reReferenceToBipolar(self, arena: BufferArena = None):
         """Rereference unipolar data to a double-banana bipolar montage.
 
+        Args:
+            arena (BufferArena, optional): if provided, the new data array is taken from the arena and the previous
+                                           one is released to it. Defaults to None.
+
         Raises:
             TypeError: raised if Eeg data is not in a unipolar montage.
         """
@@ -250,7 +458,7 @@ class Eeg:
                 reRefMatrix[i, index] = multiplier
 
         # Rereference data
-        self.data = reRefMatrix @ self.data  # matrix multiplication
+        self.data = Eeg._matmul(reRefMatrix, self.data, arena)
         self.channels = Eeg.BIPOLAR_DBANANA
         self.montage = Eeg.Montage.BIPOLAR
 
@@ -282,6 +490,8 @@ class Eeg:
         fs: int = 256,
         electrodes: list[str] = ELECTRODES_10_20,
         reference: str = "Avg",
+        arena: BufferArena = None,
+        resampled: bool = False,
     ):
         """Standardize data to a given sampling frequency, with a given set of electrodes and a given reference.
 
@@ -295,6 +505,10 @@ class Eeg:
                                        "bipolar:" double banana bipolar montage.
                                        electrode: name of the reference electrode for a unipolar referential montage.
                                        Defaults to "Avg".
+            arena (BufferArena, optional): if provided, intermediate data arrays are taken from the arena and released
+                                           to it. Defaults to None.
+            resampled (bool, optional): if True, data is already sampled at fs and is not resampled again. Defaults
+                                        to False.
 
         Raises:
             ValueError: raised if referencing scheme is unknown
@@ -306,13 +520,14 @@ class Eeg:
                 index = Eeg._findChannelIndex(self.channels, electrode, self.montage)
                 reRefMatrix[i, index] = 1
             # Select data
-            self.data = reRefMatrix @ self.data
+            self.data = Eeg._matmul(reRefMatrix, self.data, arena)
             # Select channels
             indices = np.where(reRefMatrix)[1]
             self.channels = [self.channels[i] for i in indices]
 
         # Resample
-        self.resample(fs)
+        if not resampled:
+            self.resample(fs, arena)
 
         # Re-Reference
         if reference == "Avg":
@@ -323,7 +538,7 @@ class Eeg:
             # Currently we trust bipolar montage without re-referencing
             # TODO attempt to re-reference bipolar montage if possible
             if self.montage is not Eeg.Montage.BIPOLAR:
-                self.reReferenceToBipolar()
+                self.reReferenceToBipolar(arena)
         else:
             raise ValueError("Unknown referencing scheme: {}".format(reference))
 
@@ -333,6 +548,8 @@ class Eeg:
         Args:
             file (str): path of the file to save to. If directory does not exist it is created.
         """
+        import pyedflib
+
         signalHeaders = list()
         for i, channel in enumerate(self.channels):
             signalHeaders.append(self._signalHeader.copy())
@@ -347,39 +564,196 @@ class Eeg:
         # Write new EDF file
         pyedflib.highlevel.write_edf(file, self.data, signalHeaders, self._fileHeader)
 
-    def saveDataFrame(self, file: str, format: FileFormat = FileFormat.PARQUET_GZIP):
+    def saveDataFrame(
+        self,
+        file: str,
+        format: FileFormat = FileFormat.PARQUET_ZSTD,
+        dtype: np.dtype = np.float64,
+        rowGroupDuration: float = 60,
+    ):
         """Save Eeg object to a dataframe compatible file.
 
+        Each channel is stored as a column. Parquet files are written with pyarrow: row groups hold a fixed duration
+        of the recording and the montage, sampling frequency and headers are stored in the schema metadata so that the
+        file can be read back with Eeg.loadDataFrame.
+
         Args:
             file (str):  path of the file to save to. If directory does not exist it is created.
-            format (FileFormat, optional): File format to save to. Defaults to FileFormat.PARQUET_GZIP.
+            format (FileFormat, optional): File format to save to. Defaults to FileFormat.PARQUET_ZSTD.
+            dtype (np.dtype, optional): type of the Parquet columns, np.float64, np.float32 or np.int16. float32 halves
+                                        the size of the file at the cost of precision. int16 columns are scaled per
+                                        channel to their full range, the scales are stored in the metadata. Defaults
+                                        to np.float64.
+            rowGroupDuration (float, optional): duration of a Parquet row group, in seconds. Defaults to 60.
 
         Raises:
             ValueError: raised if fileFormat is not supported.
         """
-        tmpData = self.data.copy()
-        dataDF = pd.DataFrame(data=tmpData.transpose(), columns=self.channels)
-        # TODO save metadata -- pyarrow might be a good candidate
-        dataDF.attrs["fileHeader"] = self._fileHeader
-        dataDF.attrs["fileHeader"]["startdate"] = str(
-            dataDF.attrs["fileHeader"]["startdate"]
-        )
-        dataDF.attrs["signalHeader"] = self._signalHeader
-
         # Create directory for file
         if os.path.dirname(file):
             os.makedirs(os.path.dirname(file), exist_ok=True)
         # Write new file
         match format:
+            case FileFormat.PARQUET_ZSTD:
+                self._saveParquet(file, "zstd", dtype, rowGroupDuration)
             case FileFormat.PARQUET_GZIP:
-                dataDF.to_parquet(file, index=False, compression="gzip")
-            case FileFormat.CSV_GZIP:
-                dataDF.to_csv(file, index=False, compression="gzip")
-            case FileFormat.CSV:
-                dataDF.to_csv(file, index=False)
+                self._saveParquet(file, "gzip", dtype, rowGroupDuration)
+            case FileFormat.CSV_GZIP | FileFormat.CSV:
+                import pandas as pd
+
+                # The transposed data is a view: the DataFrame is built without an intermediate copy
+                dataDF = pd.DataFrame(data=self.data.transpose(), columns=self.channels)
+                compression = "gzip" if format == FileFormat.CSV_GZIP else None
+                dataDF.to_csv(file, index=False, compression=compression)
             case _:
                 raise ValueError("Unknown output format {}".format(format))
 
+    def _metadata(self) -> dict:
+        """JSON serializable metadata of the recording: channels, fs, montage and headers."""
+        return {
+            "channels": list(self.channels),
+            "fs": self.fs,
+            "montage": Eeg.Montage(self.montage).value,
+            "signalHeader": _headerToJson(self._signalHeader),
+            "fileHeader": _headerToJson(self._fileHeader),
+        }
+
+    def _saveParquet(self, file: str, compression: str, dtype: np.dtype, rowGroupDuration: float):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        dtype = np.dtype(dtype)
+        columns = list()
+        scales = None
+        if dtype == np.int16:
+            peaks = np.max(np.abs(self.data), axis=1) if self.data.shape[1] else np.zeros(len(self.channels))
+            scales = np.where(peaks > 0, peaks / np.iinfo(np.int16).max, 1.0)
+        for i in range(len(self.channels)):
+            # Rows of the data array are contiguous: each channel is converted directly to an Arrow column
+            if scales is None:
+                columns.append(pa.array(self.data[i].astype(dtype, copy=False)))
+            else:
+                columns.append(pa.array(np.round(self.data[i] / scales[i]).astype(np.int16)))
+        metadata = self._metadata() | {"scales": None if scales is None else scales.tolist()}
+        table = pa.Table.from_arrays(
+            columns,
+            schema=pa.schema(
+                [pa.field(channel, column.type) for channel, column in zip(self.channels, columns)],
+                metadata={_PARQUET_METADATA_KEY: json.dumps(metadata)},
+            ),
+        )
+        rowGroupSize = max(1, int(round(rowGroupDuration * self.fs)))
+        pq.write_table(table, file, row_group_size=rowGroupSize, compression=compression)
+
+    @classmethod
+    def loadDataFrame(cls, file: str, start: float = 0, stop: float = None, channels: list[str] = None):
+        """Instantiate an Eeg object from a Parquet file written by Eeg.saveDataFrame.
+
+        Only the row groups overlapping [start, stop] and the requested columns are read from the file.
+
+        Args:
+            file (str): path to the Parquet file.
+            start (float, optional): time in seconds from the beginning of the recording at which to start reading.
+                                     Defaults to 0.
+            stop (float, optional): time in seconds at which to stop reading. If None the recording is read until its
+                                    end. Defaults to None.
+            channels (list[str], optional): channels to load. If None all channels are loaded. Defaults to None.
+
+        Raises:
+            ValueError: raised if the file was not written by Eeg.saveDataFrame or a channel is missing.
+
+        Returns:
+            Eeg: returns an Eeg instance containing the data of the file. Data is float32 unless it was saved as
+            float64.
+        """
+        import pyarrow.parquet as pq
+
+        parquetFile = pq.ParquetFile(file)
+        schemaMetadata = parquetFile.schema_arrow.metadata or dict()
+        if _PARQUET_METADATA_KEY.encode() not in schemaMetadata:
+            raise ValueError(f"{file} was not written by Eeg.saveDataFrame.")
+        metadata = json.loads(schemaMetadata[_PARQUET_METADATA_KEY.encode()])
+        fs = metadata["fs"]
+        if channels is None:
+            channels = metadata["channels"]
+        for channel in channels:
+            if channel not in metadata["channels"]:
+                raise ValueError(f"Missing channel {channel} in file {file}.")
+
+        # Select the row groups overlapping the requested samples
+        numRows = [parquetFile.metadata.row_group(i).num_rows for i in range(parquetFile.num_row_groups)]
+        groupStarts = np.concatenate(([0], np.cumsum(numRows)))
+        first = min(int(round(start * fs)), int(groupStarts[-1]))
+        last = int(groupStarts[-1]) if stop is None else min(max(int(round(stop * fs)), first), int(groupStarts[-1]))
+        groups = [i for i in range(len(numRows)) if groupStarts[i] < last and groupStarts[i + 1] > first]
+
+        double = all(parquetFile.schema_arrow.field(channel).type == "double" for channel in channels)
+        data = np.zeros((len(channels), last - first), dtype=np.float64 if double else np.float32)
+        if groups:
+            table = parquetFile.read_row_groups(groups, columns=list(dict.fromkeys(channels)))
+            offset = first - int(groupStarts[groups[0]])
+            for i, channel in enumerate(channels):
+                column = table.column(channel).to_numpy()[offset : offset + last - first]
+                if metadata["scales"] is not None:
+                    scale = metadata["scales"][metadata["channels"].index(channel)]
+                    data[i] = column * np.float32(scale)
+                else:
+                    data[i] = column
+
+        fileHeader = _headerFromJson(metadata["fileHeader"])
+        if start and isinstance(fileHeader.get("startdate"), datetime.datetime):
+            fileHeader["startdate"] += datetime.timedelta(seconds=start)
+        return cls(
+            data,
+            list(channels),
+            fs,
+            Eeg.Montage(metadata["montage"]),
+            _headerFromJson(metadata["signalHeader"]),
+            fileHeader,
+        )
+
+    def saveRaw(self, file: str, dtype: np.dtype = None):
+        """Save Eeg object to a raw binary array and a JSON sidecar.
+
+        The data is written as a contiguous .npy array (channels x samples) which can be memory-mapped by
+        Eeg.loadRaw. Channels, fs, montage and headers are written to a sidecar with the same name and a .json
+        extension.
+
+        Args:
+            file (str): path of the .npy file to save to. If directory does not exist it is created.
+            dtype (np.dtype, optional): type of the stored data. Defaults to None (type of the data).
+        """
+        if os.path.dirname(file):
+            os.makedirs(os.path.dirname(file), exist_ok=True)
+        data = self.data if dtype is None else self.data.astype(dtype, copy=False)
+        with open(file, "wb") as f:
+            np.save(f, np.ascontiguousarray(data), allow_pickle=False)
+        with open(_rawSidecar(file), "w") as f:
+            json.dump(self._metadata(), f)
+
+    @classmethod
+    def loadRaw(cls, file: str, mmapMode: str = "r"):
+        """Instantiate an Eeg object from a raw binary array written by Eeg.saveRaw.
+
+        Args:
+            file (str): path to the .npy file.
+            mmapMode (str, optional): memory-map mode of the data array (see numpy.load). "r" maps the file read-only,
+                                      "c" maps it copy-on-write, None reads it in memory. Defaults to "r".
+
+        Returns:
+            Eeg: returns an Eeg instance whose data is backed by the file.
+        """
+        with open(_rawSidecar(file), "r") as f:
+            metadata = json.load(f)
+        return cls(
+            np.load(file, mmap_mode=mmapMode, allow_pickle=False),
+            metadata["channels"],
+            metadata["fs"],
+            Eeg.Montage(metadata["montage"]),
+            _headerFromJson(metadata["signalHeader"]),
+            _headerFromJson(metadata["fileHeader"]),
+        )
+
     def _electrodeSynonymRegex(electrode: str) -> str:
         """Build a regex that matches the different synonyms of an electrode name.
 
@@ -443,6 +817,15 @@ class Eeg:
 
         return index
 
+    def _matmul(matrix: np.ndarray, data: np.ndarray, arena: BufferArena = None) -> np.ndarray:
+        """matrix @ data, written to an array of the arena if one is provided. data is then released to the arena."""
+        if arena is None:
+            return matrix @ data
+        out = arena.empty((matrix.shape[0], data.shape[1]), np.result_type(matrix, data))
+        result = np.matmul(matrix, data, out=out)
+        arena.release(data)
+        return result
+
     def _constructUnipolarChannelNames(self, reference: str = "REF"):
         """Rename channels to a standardized name of the format ELEC-REF.
 
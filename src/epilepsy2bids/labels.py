@@ -0,0 +1,223 @@
+"""Precomputed seizure labels stored alongside converted recordings.
+
+Labels of a run are computed from its _events.tsv file for windows of a given duration and stride, and saved with the
+seizure intervals in a compact .npz file next to the events file. The cache records the size, modification time and
+hash of the events file it was computed from and is rebuilt automatically when the events file changes. Caches are
+written to a temporary file which then replaces the cache, so that a cache is never read partially written by a crashed
+or concurrent worker.
+"""
+
+import hashlib
+import os
+import stat
+import uuid
+import zipfile
+from pathlib import Path
+from typing import TypedDict
+
+import numpy as np
+
+from .annotations import Annotations
+
+
+class LabelOptions(TypedDict):
+    window: float  # duration of a window, in seconds
+    stride: float  # time between the start of two consecutive windows, in seconds
+    minOverlap: float  # fraction of a window that must be covered by seizures for the window to be labelled as seizure
+
+
+DEFAULT_LABEL_OPTIONS: LabelOptions = {
+    "window": 4,
+    "stride": 4,
+    "minOverlap": 0,
+}
+
+
+class Labels:
+    def __init__(
+        self,
+        labels: np.ndarray,
+        intervals: np.ndarray,
+        window: float,
+        stride: float,
+        duration: float,
+    ):
+        """Seizure labels of a recording.
+
+        Args:
+            labels (NDArray[Shape['*'], uint8]): label of each window, 1 for seizure and 0 for background.
+            intervals (NDArray[Shape['*, 2'], float]): (start, stop) of each seizure, in seconds.
+            window (float): duration of a window, in seconds.
+            stride (float): time between the start of two consecutive windows, in seconds.
+            duration (float): duration of the recording, in seconds.
+        """
+        self.labels = labels
+        self.intervals = intervals
+        self.window = window
+        self.stride = stride
+        self.duration = duration
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def __getitem__(self, index):
+        return self.labels[index]
+
+    def labelAt(self, time: float) -> int:
+        """Label of the window starting at (or right before) a given time.
+
+        Args:
+            time (float): time in seconds from the beginning of the recording.
+
+        Returns:
+            int: 1 for seizure and 0 for background.
+        """
+        return int(self.labels[min(int(time // self.stride), len(self.labels) - 1)])
+
+    @classmethod
+    def fromAnnotations(
+        cls,
+        annotations: Annotations,
+        window: float = DEFAULT_LABEL_OPTIONS["window"],
+        stride: float = DEFAULT_LABEL_OPTIONS["stride"],
+        minOverlap: float = DEFAULT_LABEL_OPTIONS["minOverlap"],
+    ):
+        """Compute window labels from annotations.
+
+        Args:
+            annotations (Annotations): annotations of the recording.
+            window (float, optional): duration of a window, in seconds. Defaults to 4.
+            stride (float, optional): time between the start of two consecutive windows, in seconds. Defaults to 4.
+            minOverlap (float, optional): fraction of a window that must be covered by seizures for the window to be
+                                          labelled as seizure. 0 labels any overlapping window as seizure.
+                                          Defaults to 0.
+
+        Returns:
+            Labels: labels of the recording.
+        """
+        duration = annotations.events[0]["recordingDuration"]
+        intervals = np.array(annotations.getEvents(), dtype=np.float64).reshape((-1, 2))
+        numWindows = max(0, int((duration - window) // stride) + 1)
+        starts = np.arange(numWindows) * stride
+        stops = starts + window
+        # Overlap between every window and every seizure
+        overlap = np.clip(
+            np.minimum(stops[:, None], intervals[None, :, 1]) - np.maximum(starts[:, None], intervals[None, :, 0]),
+            0,
+            None,
+        ).sum(axis=1)
+        if minOverlap > 0:
+            labels = overlap >= minOverlap * window
+        else:
+            labels = overlap > 0
+        return cls(labels.astype(np.uint8), intervals, window, stride, duration)
+
+
+def labelsFileName(eventsFile: str) -> Path:
+    """Path of the label cache associated with an _events.tsv file."""
+    eventsFile = Path(eventsFile)
+    return eventsFile.with_name(eventsFile.name.replace("_events.tsv", "_labels.npz"))
+
+
+def _fileSignature(eventsFile: str) -> tuple[int, int]:
+    fileStat = os.stat(eventsFile)
+    return fileStat.st_size, fileStat.st_mtime_ns
+
+
+def _fileHash(eventsFile: str) -> str:
+    with open(eventsFile, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _writeCache(eventsFile: str, labels: Labels, minOverlap: float, contentHash: str):
+    """Write the label cache of an events file atomically, with the current signature of the events file."""
+    cacheFile = labelsFileName(eventsFile)
+    size, mtime = _fileSignature(eventsFile)
+    # Temporary file unique to the writer, in the folder of the cache so that it can replace it atomically
+    tmpFile = cacheFile.with_name(f".{cacheFile.name}.{uuid.uuid4().hex}.tmp")
+    f = open(tmpFile, "xb")
+    try:
+        with f:
+            np.savez_compressed(
+                f,
+                labels=labels.labels,
+                intervals=labels.intervals,
+                parameters=np.array([labels.window, labels.stride, minOverlap, labels.duration]),
+                signature=np.array([size, mtime], dtype=np.int64),
+                hash=np.array(contentHash),
+            )
+        # The cache is readable by the same users as its events file
+        os.chmod(tmpFile, stat.S_IMODE(os.stat(eventsFile).st_mode))
+        os.replace(tmpFile, cacheFile)
+    except BaseException:
+        os.remove(tmpFile)
+        raise
+
+
+def saveLabels(
+    eventsFile: str,
+    annotations: Annotations = None,
+    window: float = DEFAULT_LABEL_OPTIONS["window"],
+    stride: float = DEFAULT_LABEL_OPTIONS["stride"],
+    minOverlap: float = DEFAULT_LABEL_OPTIONS["minOverlap"],
+) -> Labels:
+    """Compute the labels of a run and save them next to its _events.tsv file.
+
+    Args:
+        eventsFile (str): path to the _events.tsv file of the run.
+        annotations (Annotations, optional): annotations of the run. If None they are loaded from eventsFile.
+        window (float, optional): duration of a window, in seconds. Defaults to 4.
+        stride (float, optional): time between the start of two consecutive windows, in seconds. Defaults to 4.
+        minOverlap (float, optional): minimum fraction of a window covered by seizures for a seizure label.
+                                      Defaults to 0 (any overlap).
+
+    Returns:
+        Labels: labels of the run.
+    """
+    if annotations is None:
+        annotations = Annotations.loadTsv(eventsFile)
+    labels = Labels.fromAnnotations(annotations, window, stride, minOverlap)
+    _writeCache(eventsFile, labels, minOverlap, _fileHash(eventsFile))
+    return labels
+
+
+def loadLabels(
+    eventsFile: str,
+    window: float = DEFAULT_LABEL_OPTIONS["window"],
+    stride: float = DEFAULT_LABEL_OPTIONS["stride"],
+    minOverlap: float = DEFAULT_LABEL_OPTIONS["minOverlap"],
+) -> Labels:
+    """Load the labels of a run from its cache.
+
+    The cache is rebuilt if it does not exist, can not be read, was computed with other parameters or if the events
+    file changed since it was computed. If only the size or modification time of the events file changed (e.g. after a
+    copy), its content is compared with the hash stored in the cache and the signature of the cache is refreshed.
+
+    Args:
+        eventsFile (str): path to the _events.tsv file of the run.
+        window (float, optional): duration of a window, in seconds. Defaults to 4.
+        stride (float, optional): time between the start of two consecutive windows, in seconds. Defaults to 4.
+        minOverlap (float, optional): minimum fraction of a window covered by seizures for a seizure label.
+                                      Defaults to 0 (any overlap).
+
+    Returns:
+        Labels: labels of the run.
+    """
+    cacheFile = labelsFileName(eventsFile)
+    try:
+        with np.load(cacheFile) as cache:
+            parameters = cache["parameters"]
+            signature = tuple(cache["signature"])
+            contentHash = str(cache["hash"])
+            labels = Labels(cache["labels"], cache["intervals"], window, stride, float(parameters[3]))
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        # Missing or unreadable cache
+        return saveLabels(eventsFile, None, window, stride, minOverlap)
+    if np.array_equal(parameters[:3], [window, stride, minOverlap]):
+        if signature == _fileSignature(eventsFile):
+            return labels
+        if contentHash == _fileHash(eventsFile):
+            _writeCache(eventsFile, labels, minOverlap, contentHash)
+            return labels
+    return saveLabels(eventsFile, None, window, stride, minOverlap)
+
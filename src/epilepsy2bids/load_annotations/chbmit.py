@@ -3,9 +3,8 @@
 import os
 import re
 
-import pyedflib
-
 from ..annotations import Annotation, Annotations, EventType, SeizureType
+from ..sources import openSource, sourceEdfStart, sourcePath
 
 
 def _parseTimeStamp(string: str) -> float:
@@ -21,36 +20,65 @@ def _parseTimeStamp(string: str) -> float:
     return float(timeStamp)
 
 
+def _parseSummary(summaryFile: str) -> dict[str, list[tuple]]:
+    """Parse all seizures of a chb**-summary.txt file.
+
+    Args:
+        summaryFile (str): path to the summary file.
+
+    Returns:
+        dict[str, list[tuple]]: maps the name of each EDF file mentioned in the summary to a list of (start, end)
+                                tuples for each seizure in seconds from the beginning of the file.
+    """
+    seizures = dict()
+    edfFileName = None
+    with openSource(summaryFile, "r") as summary:
+        line = summary.readline()
+        while line:
+            if line.startswith("File Name: "):
+                edfFileName = line[len("File Name: ") :].strip()
+                seizures.setdefault(edfFileName, list())
+            elif edfFileName is not None and re.match(
+                "Seizure.*Start Time:", line
+            ):  # find start of new seizure
+                seizureStart = _parseTimeStamp(line)
+                seizureEnd = _parseTimeStamp(summary.readline())
+                seizures[edfFileName].append((seizureStart, seizureEnd))
+            line = summary.readline()
+    return seizures
+
+
 def _loadSeizures(edfFile: str, subject: str, edfFileName: str) -> list[tuple]:
     """Load seizures from a chb**-summary.txt file"""
-    seizures = []
     summaryFile = os.path.join(
         os.path.dirname(edfFile), "{}-summary.txt".format(subject)
     )
-    with open(summaryFile, "r") as summary:
-        # Search for mention of edfFile in summary
-        line = summary.readline()
-        while line:
-            if line == "File Name: {}\n".format(edfFileName):
-                line = summary.readline()
-                while ("File Name" not in line) and line:
-                    if re.match(
-                        "Seizure.*Start Time:", line
-                    ):  # find start of new seizure
-                        seizureStart = _parseTimeStamp(line)
-                        seizureEnd = _parseTimeStamp(summary.readline())
-                        seizures.append((seizureStart, seizureEnd))
-                    line = summary.readline()
-            else:
-                line = summary.readline()
-    return seizures
+    return _parseSummary(summaryFile).get(edfFileName, [])
+
+
+def loadAnnotationsIndex(root: str) -> dict[str, list[tuple]]:
+    """Parse the seizures of all summary files of the CHBMIT dataset once.
+
+    Args:
+        root (str): root folder of the CHBMIT dataset.
+
+    Returns:
+        dict[str, list[tuple]]: maps EDF file names to a list of (start, end) tuples for each seizure in seconds.
+                                The index is meant to be passed to loadAnnotationsFromEdf.
+    """
+    index = dict()
+    for summaryFile in sorted(sourcePath(root).rglob("*-summary.txt")):
+        index |= _parseSummary(summaryFile)
+    return index
 
 
-def loadAnnotationsFromEdf(edfFile: str) -> Annotations:
+def loadAnnotationsFromEdf(edfFile: str, index: dict[str, list[tuple]] = None) -> Annotations:
     """Loads annotations related to an EDF recording in the CHBMIT dataset.
 
     Args:
         edfFile (str): full path to the EDF for which annotations should be extracted.
+        index (dict[str, list[tuple]], optional): seizures of the dataset built by loadAnnotationsIndex. If None the
+                                                  summary file of the subject is parsed. Defaults to None.
 
     Returns:
         Annotations: an Annotations object
@@ -59,16 +87,16 @@ def loadAnnotationsFromEdf(edfFile: str) -> Annotations:
     subject = os.path.basename(os.path.dirname(edfFile))
 
     # dateTime and duration
-    with pyedflib.EdfReader(edfFile) as edf:
-        dateTime = edf.getStartdatetime()
-        duration = edf.getFileDuration()
-        edf._close()
+    dateTime, duration = sourceEdfStart(edfFile)
 
     # Get Seizure type
     seizureType = SeizureType.sz  # seizure types are not available for CHB-MIT
 
     # Load Seizures
-    seizures = _loadSeizures(edfFile, subject, os.path.basename(edfFile))
+    if index is None:
+        seizures = _loadSeizures(edfFile, subject, os.path.basename(edfFile))
+    else:
+        seizures = list(index.get(os.path.basename(edfFile), []))
 
     # Confidence
     confidence = "n/a"  # confidence is not available for CHB-MIT
@@ -1,27 +1,76 @@
 """load annotations from the SeizeIT dataset https://doi.org/10.48804/P5Q0OJ to a Annotations object."""
 
-import math
 import os
 import re
-from pathlib import Path
 
 import pandas as pd
-import pyedflib
 
 from ..annotations import Annotation, Annotations, EventType, SeizureType
 from ..eeg import Eeg
+from ..sources import openSource, sourceEdfStart, sourcePath
+
+
+SEIZURE_TYPES = {
+    "FIA": SeizureType.sz_foc_ia,
+    "FA": SeizureType.sz_foc_a,
+    "F-BTC": SeizureType.sz_foc_f2b,
+}
+
+
+def _parseTsv(
+    tsvFile: str,
+) -> tuple[list[tuple], list[SeizureType], list, list[list[str]]]:
+    """Parse seizures from a seizeIT _a1.tsv file
+
+    Args:
+        tsvFile (str): path to the _a1.tsv file.
+
+    Raises:
+        ValueError: raises a ValueError if a seizure type is unknown.
+
+    Returns:
+        seizures: A list of (start, end) tuples for each seizure in seconds from the beginning of the file.
+        types: A list off seizureType
+        confidence: A list of confidence for each seizure. The value is 0.5 for the 12 seizures that do not have an endt-time.
+        channels: A list of channels the seizure is visible on for each seizure.
+    """
+    with openSource(tsvFile) as f:
+        annotations = pd.read_csv(
+            f,
+            comment="#",
+            delimiter="\t",
+            names=["start", "stop", "type", "comments"],
+        )
+    # Seizure Timing
+    # 12 weizures do not mark the end time, consider a default seizure time of 30 seconds
+    missingStop = annotations["stop"].isna().tolist()
+    stops = annotations["stop"].where(~annotations["stop"].isna(), annotations["start"] + 30)
+    seizures = list(zip(annotations["start"].tolist(), stops.tolist()))
+    confidence = [0.5 if missing else "n/a" for missing in missingStop]
+
+    # Seizure Type
+    types = list()
+    for seizureType in annotations["type"]:
+        if seizureType not in SEIZURE_TYPES:
+            raise ValueError(f"Unknown seizure type ({seizureType}) for SeizeIT dataset.")
+        types.append(SEIZURE_TYPES[seizureType])
+
+    # Seizure localization
+    channels = [_getChannels(comments) for comments in annotations["comments"]]
+
+    return seizures, types, confidence, channels
 
 
 def _loadSeizures(
     edfFile: str,
-) -> tuple[list[tuple], list[SeizureType], list[list[str]], list]:
+) -> tuple[list[tuple], list[SeizureType], list, list[list[str]]]:
     """Load seizures from a seizeIT .tsv file
 
     Args:
         edfFile (str): full path to the EDF for which annotations should be extracted.
 
     Raises:
-        ValueError: raises a ValueError if txt file format is unknown.
+        ValueError: raises a ValueError if a seizure type is unknown.
 
     Returns:
         seizures: A list of (start, end) tuples for each seizure in seconds from the beginning of the file.
@@ -29,43 +78,24 @@ def _loadSeizures(
         confidence: A list of confidence for each seizure. The value is 0.5 for the 12 seizures that do not have an endt-time.
         channels: A list of channels the seizure is visible on for each seizure.
     """
-    seizures = []
-    types = []
-    confidence = []
-    channels = []
-    tsvFile = Path(os.path.dirname(edfFile)) / (Path(edfFile).stem + "_a1.tsv")
-    annotations = pd.read_csv(
-        tsvFile,
-        comment="#",
-        delimiter="\t",
-        names=["start", "stop", "type", "comments"],
-    )
-    for _, row in annotations.iterrows():
-        # Seizure Timing
-        if not math.isnan(row["stop"]):
-            seizures.append((row["start"], row["stop"]))
-            confidence.append("n/a")
-        # 12 weizures do not mark the end time, consider a default seizure time of 30 seconds
-        else:
-            seizures.append((row["start"], row["start"] + 30))
-            confidence.append(0.5)
-
-        # Seizure Type
-        seizureType = row["type"]
-        if seizureType == "FIA":
-            seizureType = SeizureType.sz_foc_ia
-        elif seizureType == "FA":
-            seizureType = SeizureType.sz_foc_a
-        elif seizureType == "F-BTC":
-            seizureType = SeizureType.sz_foc_f2b
-        else:
-            raise ValueError(f"Unknown seizure type ({seizureType}) for Siena dataset.")
-        types.append(seizureType)
-
-        # Seizure localization
-        channels.append(_getChannels(row["comments"]))
+    tsvFile = sourcePath(os.path.dirname(edfFile)) / (sourcePath(edfFile).stem + "_a1.tsv")
+    return _parseTsv(tsvFile)
 
-    return seizures, types, confidence, channels
+
+def loadAnnotationsIndex(root: str) -> dict[str, tuple]:
+    """Parse all _a1.tsv annotation files of the SeizeIT dataset once.
+
+    Args:
+        root (str): root folder of the SeizeIT dataset.
+
+    Returns:
+        dict[str, tuple]: maps EDF file names to the (seizures, types, confidence, channels) parsed from their _a1.tsv
+                          file. The index is meant to be passed to loadAnnotationsFromEdf.
+    """
+    index = dict()
+    for tsvFile in sorted(sourcePath(root).rglob("*_a1.tsv")):
+        index[tsvFile.name[: -len("_a1.tsv")] + ".edf"] = _parseTsv(tsvFile)
+    return index
 
 
 def _getChannels(descriptor: str) -> list[str]:
@@ -122,23 +152,27 @@ def _getChannels(descriptor: str) -> list[str]:
     return channels
 
 
-def loadAnnotationsFromEdf(edfFile: str) -> Annotations:
-    """Loads annotations related to an EDF recording in the Siena dataset.
+def loadAnnotationsFromEdf(edfFile: str, index: dict[str, tuple] = None) -> Annotations:
+    """Loads annotations related to an EDF recording in the SeizeIT dataset.
 
     Args:
         edfFile (str): full path to the EDF for which annotations should be extracted.
+        index (dict[str, tuple], optional): seizures of the dataset built by loadAnnotationsIndex. If None the _a1.tsv
+                                            file of the recording is parsed. Defaults to None.
 
     Returns:
         Annotations: an Annotations object
     """
     # dateTime and duration
-    with pyedflib.EdfReader(edfFile) as edf:
-        dateTime = edf.getStartdatetime()
-        duration = edf.getFileDuration()
-        edf._close()
+    dateTime, duration = sourceEdfStart(edfFile)
 
     # Load event file
-    seizures, types, confidence, channels = _loadSeizures(edfFile)
+    if index is None:
+        seizures, types, confidence, channels = _loadSeizures(edfFile)
+    else:
+        seizures, types, confidence, channels = (
+            list(x) for x in index[os.path.basename(edfFile)]
+        )
 
     # Populate dictionary
     if len(seizures) == 0:
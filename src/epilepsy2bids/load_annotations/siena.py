@@ -3,13 +3,12 @@
 import os
 import re
 import time
-from pathlib import Path
 
 import pandas as pd
-import pyedflib
 
 from ..annotations import Annotation, Annotations, EventType, SeizureType
 from ..eeg import Eeg
+from ..sources import openSource, sourceEdfStart, sourcePath
 
 
 def _parseTimeStamp(string: str) -> float:
@@ -37,29 +36,30 @@ def _substractTimeStamps(time1: float, time2: float) -> float:
     return difference
 
 
-def _loadSeizures(edfFile: str) -> list[tuple]:
-    """Load seizures from a Siena Seizures-list-Pxx.txt file
+def _parseSeizureList(summaryFile: str) -> dict[str, list[tuple]]:
+    """Parse all seizures of a Siena Seizures-list-Pxx.txt file
 
     Args:
-        edfFile (str): full path to the EDF for which annotations should be extracted.
+        summaryFile (str): path to the Seizures-list-Pxx.txt file.
 
     Raises:
         ValueError: raises a ValueError if txt file format is unknown.
 
     Returns:
-        seizures: A list of (start, end) tuples for each seizure in seconds from the beginning of the file.
+        dict[str, list[tuple]]: maps each file name mentioned in the summary (with the typos of the summary) to a list
+                                of (start, end) tuples for each seizure in seconds from the beginning of the file.
     """
-
-    subject = os.path.basename(os.path.dirname(edfFile))
-    correctedEdfFileName = _correctEdfFileNameTypos(edfFile)
-
-    seizures = []
-    summaryFile = Path(os.path.dirname(edfFile)) / f"Seizures-list-{subject}.txt"
-    with open(summaryFile, "r") as summary:
-        # Search for mention of edfFile in summary
+    allSeizures = dict()
+    registrationStarts = dict()
+    with openSource(summaryFile, "r") as summary:
+        # Search for mentions of EDF files in summary
         line = summary.readline()
         while line:
-            if re.search(r"File name: {} *\n".format(correctedEdfFileName), line):
+            fileName = re.search(r"File name: (\S+) *\n", line)
+            if fileName:
+                correctedEdfFileName = fileName.group(1)
+                seizures = allSeizures.setdefault(correctedEdfFileName, list())
+                registrationStart = registrationStarts.get(correctedEdfFileName)
                 firstLine = summary.readline()
                 # PN01 exception
                 if correctedEdfFileName == "PN01.edf":
@@ -130,27 +130,72 @@ def _loadSeizures(edfFile: str) -> list[tuple]:
                     )
                 else:
                     raise ValueError("Unknown format for Siena summary file.")
+                registrationStarts[correctedEdfFileName] = registrationStart
             line = summary.readline()
-    return seizures
+    return allSeizures
 
 
-def _getSeizureType(edfFile: str) -> SeizureType:
-    """Get seizure type associated to an EDF file from the subject_info.csv file.
+def _loadSeizures(edfFile: str) -> list[tuple]:
+    """Load seizures from a Siena Seizures-list-Pxx.txt file
 
     Args:
         edfFile (str): full path to the EDF for which annotations should be extracted.
 
     Raises:
-        ValueError: raises a ValueError if the seizure type is unknown.
+        ValueError: raises a ValueError if txt file format is unknown.
 
     Returns:
-        SeizureType: the seizure type of the subject (Siena only records one seizure type per subject).
+        seizures: A list of (start, end) tuples for each seizure in seconds from the beginning of the file.
     """
-    # Load CSV
-    subject_info = pd.read_csv(Path(edfFile).parents[1] / "subject_info.csv")
     subject = os.path.basename(os.path.dirname(edfFile))
+    summaryFile = sourcePath(os.path.dirname(edfFile)) / f"Seizures-list-{subject}.txt"
+    return _parseSeizureList(summaryFile).get(_correctEdfFileNameTypos(edfFile), [])
+
+
+def _parseSubjectInfo(subjectInfoFile: str) -> dict[str, tuple[SeizureType, list[str]]]:
+    """Parse the seizure type and the channels associated with seizures of every subject in the subject_info.csv file.
+
+    The subject_info.csv file provides the seizure type, lateralization and localization information for each subject.
+    Electrodes from the 10-20 system associated with the lateralization and localization are returned.
+
+    Args:
+        subjectInfoFile (str): path to the subject_info.csv file.
+
+    Raises:
+        ValueError: raises a ValueError if the seizure type, the lateralization or localization is unknown.
+
+    Returns:
+        dict[str, tuple[SeizureType, list[str]]]: maps each subject to its seizure type (Siena only records one seizure
+                                                  type per subject) and the channels associated with its seizures.
+    """
+    with openSource(subjectInfoFile) as f:
+        subjectInfo = pd.read_csv(f)
+    subjects = dict()
+    for subject, seizureType, localization, lateralization in zip(
+        subjectInfo["patient_id"],
+        subjectInfo[" seizure"],
+        subjectInfo[" localization"],
+        subjectInfo[" lateralization"],
+    ):
+        subjects[subject] = (
+            _getSeizureType(seizureType),
+            _getChannels(localization, lateralization),
+        )
+    return subjects
+
+
+def _getSeizureType(seizureType: str) -> SeizureType:
+    """Get seizure type from its code in the subject_info.csv file.
+
+    Args:
+        seizureType (str): seizure type code of the subject_info.csv file.
+
+    Raises:
+        ValueError: raises a ValueError if the seizure type is unknown.
 
-    seizureType = subject_info[subject_info.patient_id == subject][" seizure"].iloc[0]
+    Returns:
+        SeizureType: the seizure type.
+    """
     if seizureType == "IAS":
         seizureType = SeizureType.sz_foc_ia
     elif seizureType == "WIAS":
@@ -163,14 +208,12 @@ def _getSeizureType(edfFile: str) -> SeizureType:
     return seizureType
 
 
-def _getChannels(edfFile: str) -> list[str]:
-    """Get channels associated with a seizure from the subject_info.csv file.
-
-    The subject_info.csv file provides lateralization and localization information for each subject. Electrodes from the
-    10-20 system associated with the lateralization and localization are returned.
+def _getChannels(localization: str, lateralization: str) -> list[str]:
+    """Get channels associated with a seizure from the localization and lateralization of the subject_info.csv file.
 
     Args:
-        edfFile (str): full path to the EDF for which annotations should be extracted.
+        localization (str): localization code of the subject_info.csv file.
+        lateralization (str): lateralization code of the subject_info.csv file.
 
     Raises:
         ValueError: raises a ValueError if the lateralization or localization is unknown.
@@ -178,16 +221,6 @@ def _getChannels(edfFile: str) -> list[str]:
     Returns:
         channels: List of electrodes names from the 10-20 system associated associated with a seizure.
     """
-    # Load CSV
-    subject_info = pd.read_csv(Path(edfFile).parents[1] / "subject_info.csv")
-    subject = os.path.basename(os.path.dirname(edfFile))
-
-    localization = subject_info[subject_info.patient_id == subject][
-        " localization"
-    ].iloc[0]
-    lateralization = subject_info[subject_info.patient_id == subject][
-        " lateralization"
-    ].iloc[0]
     channels = Eeg.ELECTRODES_10_20
     if localization == "T":  # Temporal
         r = re.compile("^T.*")
@@ -226,33 +259,64 @@ def _correctEdfFileNameTypos(filename: str) -> str:
     return correctedEdfFileName
 
 
-def loadAnnotationsFromEdf(edfFile: str) -> Annotations:
+def loadAnnotationsIndex(root: str) -> dict[str, tuple[list[tuple], SeizureType, list[str]]]:
+    """Parse the seizure lists of all subjects and the subject_info.csv file of the Siena dataset once.
+
+    Args:
+        root (str): root folder of the Siena dataset.
+
+    Returns:
+        dict[str, tuple[list[tuple], SeizureType, list[str]]]: maps EDF file names to their seizures as a list of
+                                                                (start, end) tuples in seconds, the seizure type and
+                                                                the seizure channels of the subject. The index is
+                                                                meant to be passed to loadAnnotationsFromEdf.
+    """
+    root = sourcePath(root)
+    subjects = _parseSubjectInfo(root / "subject_info.csv")
+    index = dict()
+    for summaryFile in sorted(root.glob("*/Seizures-list-*.txt")):
+        subject = summaryFile.parent.name
+        seizures = _parseSeizureList(summaryFile)
+        for edfFile in sorted(summaryFile.parent.glob("*.edf")):
+            seizureType, channels = subjects[subject]
+            index[edfFile.name] = (
+                seizures.get(_correctEdfFileNameTypos(edfFile), []),
+                seizureType,
+                channels,
+            )
+    return index
+
+
+def loadAnnotationsFromEdf(
+    edfFile: str, index: dict[str, tuple[list[tuple], SeizureType, list[str]]] = None
+) -> Annotations:
     """Loads annotations related to an EDF recording in the Siena dataset.
 
     Args:
         edfFile (str): full path to the EDF for which annotations should be extracted.
+        index (dict, optional): seizures of the dataset built by loadAnnotationsIndex. If None the seizure list of the
+                                subject and the subject_info.csv file are parsed. Defaults to None.
 
     Returns:
         Annotations: an Annotations object
     """
     # dateTime and duration
-    with pyedflib.EdfReader(edfFile) as edf:
-        dateTime = edf.getStartdatetime()
-        duration = edf.getFileDuration()
-        edf._close()
+    dateTime, duration = sourceEdfStart(edfFile)
 
-    # Get Seizure type
-    seizureType = _getSeizureType(edfFile)
+    if index is None:
+        # Get Seizure type and channels
+        subject = os.path.basename(os.path.dirname(edfFile))
+        seizureType, channels = _parseSubjectInfo(sourcePath(edfFile).parents[1] / "subject_info.csv")[subject]
 
-    # Load Seizures
-    seizures = _loadSeizures(edfFile)
+        # Load Seizures
+        seizures = _loadSeizures(edfFile)
+    else:
+        seizures, seizureType, channels = index[os.path.basename(edfFile)]
+        seizures = list(seizures)
 
     # Confidence
     confidence = "n/a"
 
-    # Channels
-    channels = _getChannels(edfFile)
-
     # Populate dictionary
     if len(seizures) == 0:
         seizureType = EventType.bckg
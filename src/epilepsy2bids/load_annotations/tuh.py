@@ -1,84 +1,122 @@
 """load annotations from the TUH Sz Corpus dataset https://isip.piconepress.com/projects/tuh_eeg/downloads/tuh_eeg_seizure/ to a Annotations object."""
 
 import os
-from pathlib import Path
 
 import pandas as pd
-import pyedflib
 
 from ..annotations import Annotation, Annotations, EventType, SeizureType
+from ..sources import openSource, sourceEdfStart, sourcePath
+
+
+MAPPING = {
+    "BCKG": EventType.bckg,
+    "SEIZ": SeizureType.sz,
+    "FNSZ": SeizureType.sz_foc,
+    "GNSZ": SeizureType.sz_gen,
+    "SPSZ": SeizureType.sz_foc_a,
+    "CPSZ": SeizureType.sz_foc_ia,
+    "ABSZ": SeizureType.sz_gen_nm,
+    "TNSZ": SeizureType.sz_gen_m_tonic,
+    "CNSZ": SeizureType.sz_gen_m_clonic,
+    "TCSZ": SeizureType.sz_gen_m_tonicClonic,
+    "ATSZ": SeizureType.sz_gen_m_atonic,
+    "MYSZ": SeizureType.sz_gen_nm_myoclonic,
+}
+
+
+def _parseCsvBi(
+    csvFile: str,
+) -> tuple[list[tuple], list[SeizureType], list[float], list]:
+    """Parse seizures from a TUH .csv_bi file
+
+    Args:
+        csvFile (str): path to the .csv_bi file.
+
+    Raises:
+        ValueError: raises a ValueError if the channel of an event is unknown.
+
+    Returns:
+        seizures: A list of (start, end) tuples for each seizure in seconds from the beginning of the file.
+        types: A list off seizureType
+        confidence: A list of confidence for each seizure.
+        channels: A list of channels the seizure is visible on for each seizure.
+    """
+    with openSource(csvFile) as f:
+        annotations = pd.read_csv(f, comment="#", delimiter=",")
+    # Seizure localization
+    unknownChannels = annotations["channel"][annotations["channel"] != "TERM"]
+    if len(unknownChannels):
+        raise ValueError(f"Unknown channel: {unknownChannels.iloc[0]}")
+
+    # Seizure Timing
+    seizures = list(
+        zip(annotations["start_time"].tolist(), annotations["stop_time"].tolist())
+    )
+    types = [MAPPING[label.upper()] for label in annotations["label"]]
+    confidence = annotations["confidence"].astype(float).tolist()  # TODO
+    channels = ["n/a"] * len(annotations)
+
+    return seizures, types, confidence, channels
 
 
 def _loadSeizures(
     edfFile: str,
-) -> tuple[list[tuple], list[SeizureType], list[list[str]], list]:
+) -> tuple[list[tuple], list[SeizureType], list[float], list]:
     """Load seizures from a TUH .csv_bi file
 
     Args:
         edfFile (str): full path to the EDF for which annotations should be extracted.
 
     Raises:
-        ValueError: raises a ValueError if txt file format is unknown.
+        ValueError: raises a ValueError if the channel of an event is unknown.
 
     Returns:
         seizures: A list of (start, end) tuples for each seizure in seconds from the beginning of the file.
         types: A list off seizureType
-        confidence: A list of confidence for each seizure. The value is 0.5 for the 12 seizures that do not have an endt-time.
+        confidence: A list of confidence for each seizure.
         channels: A list of channels the seizure is visible on for each seizure.
     """
+    csvFile = sourcePath(os.path.dirname(edfFile)) / (sourcePath(edfFile).stem + ".csv_bi")
+    return _parseCsvBi(csvFile)
 
-    MAPPING = {
-        "BCKG": EventType.bckg,
-        "SEIZ": SeizureType.sz,
-        "FNSZ": SeizureType.sz_foc,
-        "GNSZ": SeizureType.sz_gen,
-        "SPSZ": SeizureType.sz_foc_a,
-        "CPSZ": SeizureType.sz_foc_ia,
-        "ABSZ": SeizureType.sz_gen_nm,
-        "TNSZ": SeizureType.sz_gen_m_tonic,
-        "CNSZ": SeizureType.sz_gen_m_clonic,
-        "TCSZ": SeizureType.sz_gen_m_tonicClonic,
-        "ATSZ": SeizureType.sz_gen_m_atonic,
-        "MYSZ": SeizureType.sz_gen_nm_myoclonic,
-    }
-    seizures = []
-    types = []
-    confidence = []
-    channels = []
-    csvFile = Path(os.path.dirname(edfFile)) / (Path(edfFile).stem + ".csv_bi")
-    annotations = pd.read_csv(csvFile, comment="#", delimiter=",")
-    for _, row in annotations.iterrows():
-        # Seizure Timing
-        seizures.append((row["start_time"], row["stop_time"]))
-        types.append(MAPPING[row["label"].upper()])
-        confidence.append(float(row["confidence"]))  # TODO
-
-        # Seizure localization
-        if row["channel"] == "TERM":
-            channels.append("n/a")
-        else:
-            raise ValueError(f"Unknown channel: {row['channel']}")
 
-    return seizures, types, confidence, channels
+def loadAnnotationsIndex(root: str) -> dict[str, tuple]:
+    """Parse all .csv_bi files of the TUH dataset once.
+
+    Args:
+        root (str): root folder of the TUH dataset.
+
+    Returns:
+        dict[str, tuple]: maps EDF file names to the (seizures, types, confidence, channels) parsed from their .csv_bi
+                          file. The index is meant to be passed to loadAnnotationsFromEdf.
+    """
+    index = dict()
+    for csvFile in sorted(sourcePath(root).rglob("*.csv_bi")):
+        index[csvFile.stem + ".edf"] = _parseCsvBi(csvFile)
+    return index
 
 
-def loadAnnotationsFromEdf(edfFile: str) -> Annotations:
-    """Loads annotations related to an EDF recording in the Siena dataset.
+def loadAnnotationsFromEdf(edfFile: str, index: dict[str, tuple] = None) -> Annotations:
+    """Loads annotations related to an EDF recording in the TUH dataset.
 
     Args:
         edfFile (str): full path to the EDF for which annotations should be extracted.
+        index (dict[str, tuple], optional): seizures of the dataset built by loadAnnotationsIndex. If None the .csv_bi
+                                            file of the recording is parsed. Defaults to None.
 
     Returns:
         Annotations: an Annotations object
     """
     # dateTime and duration
-    with pyedflib.EdfReader(edfFile) as edf:
-        dateTime = edf.getStartdatetime()
-        duration = edf.getFileDuration()
-        edf._close()
+    dateTime, duration = sourceEdfStart(edfFile)
 
     # Load event file
-    seizures, types, confidence, channels = _loadSeizures(edfFile)
+    if index is None:
+        seizures, types, confidence, channels = _loadSeizures(edfFile)
+    else:
+        seizures, types, confidence, channels = (
+            list(x) for x in index[os.path.basename(edfFile)]
+        )
 
     # Populate dictionary
     if len(seizures) == 0:
@@ -0,0 +1,262 @@
+"""Multi-resolution min/max envelopes of recordings for visualization.
+
+A pyramid stores, for every channel, the minimum and maximum of the signal over consecutive bins of samples. The finest
+level summarizes binSize samples per bin and every following level summarizes factor bins of the previous level, until
+a level has less than minBins bins. Drawing the envelope of any part of a recording then only reads the level whose
+number of bins in that part is closest to the number of pixels to draw. Views shorter than a bin of the finest level
+should read the samples of the recording instead.
+
+Pyramids of converted runs are saved in an uncompressed _pyramid.npz file next to the recording. The arrays of a level
+are memory-mapped from the file on first use, so that drawing a view only reads the bins of that view.
+"""
+
+import os
+import struct
+import zipfile
+from functools import partial
+from pathlib import Path
+from typing import TypedDict
+
+import numpy as np
+
+from .eeg import Eeg
+
+
+class PyramidOptions(TypedDict):
+    binSize: int  # number of samples summarized by a bin of the finest level
+    factor: int  # number of bins of a level summarized by a bin of the next level
+    minBins: int  # levels are added until a level has less bins than this
+
+
+DEFAULT_PYRAMID_OPTIONS: PyramidOptions = {
+    "binSize": 64,
+    "factor": 4,
+    "minBins": 1024,
+}
+
+
+# Fixed part of the local file header of a ZIP member, followed by its file name and extra field
+_ZIP_LOCAL_HEADER = struct.Struct("<4s22xHH")
+
+
+def _memmapMember(file: str, archive: zipfile.ZipFile, name: str) -> np.ndarray:
+    """Read-only memory map of a .npy member of an uncompressed .npz file."""
+    info = archive.getinfo(name)
+    if info.compress_type != zipfile.ZIP_STORED:
+        with archive.open(info) as f:
+            return np.lib.format.read_array(f)
+    with open(file, "rb") as f:
+        f.seek(info.header_offset)
+        signature, nameLength, extraLength = _ZIP_LOCAL_HEADER.unpack(f.read(_ZIP_LOCAL_HEADER.size))
+        if signature != b"PK\x03\x04":
+            raise ValueError(f"Corrupted member {name} of {file}.")
+        f.seek(info.header_offset + _ZIP_LOCAL_HEADER.size + nameLength + extraLength)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortranOrder, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortranOrder, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    if np.prod(shape) == 0:
+        # Empty files can not be mapped
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(file, dtype=dtype, mode="r", offset=offset, shape=shape, order="F" if fortranOrder else "C")
+
+
+def _loadLevel(file: str, level: int) -> tuple[np.ndarray, np.ndarray]:
+    """Memory-mapped mins and maxs of a level of a pyramid saved by Pyramid.save."""
+    with zipfile.ZipFile(file) as archive:
+        return _memmapMember(file, archive, f"mins{level}.npy"), _memmapMember(file, archive, f"maxs{level}.npy")
+
+
+def _envelope(mins: np.ndarray, maxs: np.ndarray, size: int) -> tuple[np.ndarray, np.ndarray]:
+    """Min and max over consecutive bins of size columns. The last bin may be shorter."""
+    starts = np.arange(0, mins.shape[1], size)
+    if len(starts) == 0:
+        return mins[:, :0], maxs[:, :0]
+    return np.minimum.reduceat(mins, starts, axis=1), np.maximum.reduceat(maxs, starts, axis=1)
+
+
+class Pyramid:
+    def __init__(
+        self,
+        levels: list,
+        channels: list[str],
+        fs: float,
+        numSamples: int,
+        binSize: int = DEFAULT_PYRAMID_OPTIONS["binSize"],
+        factor: int = DEFAULT_PYRAMID_OPTIONS["factor"],
+    ):
+        """Min/max envelopes of a recording at decreasing resolutions.
+
+        Args:
+            levels (list): (mins, maxs) of each level, from the finest to the coarsest. Each array has one row per
+                           channel and one column per bin. A level can be given as a callable returning the tuple, in
+                           which case it is loaded on first use.
+            channels (list[str]): channel names.
+            fs (float): sampling frequency of the recording, in Hz.
+            numSamples (int): number of samples of the recording.
+            binSize (int, optional): number of samples summarized by a bin of the finest level. Defaults to 64.
+            factor (int, optional): number of bins of a level summarized by a bin of the next level. Defaults to 4.
+        """
+        self._levels = list(levels)
+        self.channels = list(channels)
+        self.fs = fs
+        self.numSamples = numSamples
+        self.binSize = binSize
+        self.factor = factor
+
+    def __len__(self) -> int:
+        return len(self._levels)
+
+    @classmethod
+    def fromEeg(
+        cls,
+        eeg: Eeg,
+        binSize: int = DEFAULT_PYRAMID_OPTIONS["binSize"],
+        factor: int = DEFAULT_PYRAMID_OPTIONS["factor"],
+        minBins: int = DEFAULT_PYRAMID_OPTIONS["minBins"],
+    ):
+        """Compute the pyramid of a recording.
+
+        Args:
+            eeg (Eeg): recording.
+            binSize (int, optional): number of samples summarized by a bin of the finest level. Defaults to 64.
+            factor (int, optional): number of bins of a level summarized by a bin of the next level. Defaults to 4.
+            minBins (int, optional): levels are added until a level has less bins than minBins. Defaults to 1024.
+
+        Returns:
+            Pyramid: pyramid of the recording, in float32.
+        """
+        mins, maxs = _envelope(eeg.data, eeg.data, binSize)
+        levels = [(mins.astype(np.float32), maxs.astype(np.float32))]
+        while levels[-1][0].shape[1] >= minBins and levels[-1][0].shape[1] > 1:
+            levels.append(_envelope(*levels[-1], factor))
+        return cls(levels, eeg.channels, eeg.fs, eeg.data.shape[1], binSize, factor)
+
+    def binDuration(self, level: int) -> float:
+        """Duration of a bin of a level, in seconds."""
+        return self.binSize * self.factor**level / self.fs
+
+    def level(self, level: int) -> tuple[np.ndarray, np.ndarray]:
+        """Mins and maxs (channels x bins) of a level. 0 is the finest level."""
+        if callable(self._levels[level]):
+            self._levels[level] = self._levels[level]()
+        return self._levels[level]
+
+    def selectLevel(self, start: float = 0, stop: float = None, maxPoints: int = 2000) -> int:
+        """Finest level with at most maxPoints bins between start and stop (the coarsest level if none has).
+
+        Args:
+            start (float, optional): start of the view, in seconds. Defaults to 0.
+            stop (float, optional): end of the view, in seconds. Defaults to None (end of the recording).
+            maxPoints (int, optional): maximum number of bins to read. Defaults to 2000.
+
+        Returns:
+            int: index of the level.
+        """
+        stop = self.numSamples / self.fs if stop is None else stop
+        for level in range(len(self)):
+            if (stop - start) / self.binDuration(level) <= maxPoints:
+                return level
+        return len(self) - 1
+
+    def envelope(
+        self, start: float = 0, stop: float = None, maxPoints: int = 2000, channels: list[str] = None
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Min/max envelope of part of the recording, at the finest resolution with at most maxPoints bins.
+
+        Args:
+            start (float, optional): start of the view, in seconds. Defaults to 0.
+            stop (float, optional): end of the view, in seconds. Defaults to None (end of the recording).
+            maxPoints (int, optional): maximum number of bins to read. Defaults to 2000.
+            channels (list[str], optional): channels to read. Defaults to None (all channels).
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: start time of each bin (in seconds), mins and maxs
+                                                       (channels x bins).
+        """
+        level = self.selectLevel(start, stop, maxPoints)
+        mins, maxs = self.level(level)
+        binDuration = self.binDuration(level)
+        first = max(0, int(start // binDuration))
+        last = mins.shape[1] if stop is None else min(mins.shape[1], int(np.ceil(stop / binDuration)))
+        rows = slice(None) if channels is None else [self.channels.index(x) for x in channels]
+        return np.arange(first, max(first, last)) * binDuration, mins[rows, first:last], maxs[rows, first:last]
+
+    def save(self, file: str):
+        """Save the pyramid to an uncompressed .npz file.
+
+        Args:
+            file (str): path of the file to save to. If directory does not exist it is created.
+        """
+        if os.path.dirname(file):
+            os.makedirs(os.path.dirname(file), exist_ok=True)
+        arrays = dict()
+        for i in range(len(self)):
+            arrays[f"mins{i}"], arrays[f"maxs{i}"] = self.level(i)
+        with open(file, "wb") as f:
+            np.savez(
+                f,
+                channels=np.array(self.channels),
+                parameters=np.array([self.fs, self.numSamples, self.binSize, self.factor, len(self)]),
+                **arrays,
+            )
+
+    @classmethod
+    def load(cls, file: str):
+        """Load a pyramid saved by Pyramid.save. Levels are memory-mapped from the file on first use.
+
+        Args:
+            file (str): path to the .npz file.
+
+        Returns:
+            Pyramid: pyramid of the recording.
+        """
+        with np.load(file) as npz:
+            fs, numSamples, binSize, factor, numLevels = npz["parameters"].tolist()
+            channels = npz["channels"].tolist()
+        levels = [partial(_loadLevel, file, i) for i in range(int(numLevels))]
+        return cls(levels, channels, fs, int(numSamples), int(binSize), int(factor))
+
+
+def pyramidFileName(eegFile: str) -> Path:
+    """Path of the pyramid associated with the _eeg file of a run."""
+    eegFile = Path(eegFile)
+    return eegFile.with_name(eegFile.name[: eegFile.name.rindex("_eeg.")] + "_pyramid.npz")
+
+
+def savePyramid(
+    eeg: Eeg,
+    eegFile: str,
+    binSize: int = DEFAULT_PYRAMID_OPTIONS["binSize"],
+    factor: int = DEFAULT_PYRAMID_OPTIONS["factor"],
+    minBins: int = DEFAULT_PYRAMID_OPTIONS["minBins"],
+) -> Pyramid:
+    """Compute the pyramid of a run and save it next to its _eeg file.
+
+    Args:
+        eeg (Eeg): recording of the run.
+        eegFile (str): path to the _eeg file of the run.
+        binSize (int, optional): number of samples summarized by a bin of the finest level. Defaults to 64.
+        factor (int, optional): number of bins of a level summarized by a bin of the next level. Defaults to 4.
+        minBins (int, optional): levels are added until a level has less bins than minBins. Defaults to 1024.
+
+    Returns:
+        Pyramid: pyramid of the run.
+    """
+    pyramid = Pyramid.fromEeg(eeg, binSize, factor, minBins)
+    pyramid.save(pyramidFileName(eegFile).as_posix())
+    return pyramid
+
+
+def loadPyramid(eegFile: str) -> Pyramid:
+    """Load the pyramid saved next to the _eeg file of a run.
+
+    Args:
+        eegFile (str): path to the _eeg file of the run.
+
+    Returns:
+        Pyramid: pyramid of the run. Levels are read from the file on first use.
+    """
+    return Pyramid.load(pyramidFileName(eegFile).as_posix())
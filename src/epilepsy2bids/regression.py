@@ -0,0 +1,337 @@
+"""Regression check between two converted BIDS trees.
+
+Two conversions of the same dataset (e.g. before and after an upgrade of a dependency) are compared file by file:
+    - EDF files are compared on the fields of their headers and on hashes of fixed blocks of their data records. Only
+      the blocks whose hashes differ are decoded, straight from the digital samples of the files, to measure the
+      largest difference per channel. All blocks are decoded if the scaling of the samples changed.
+    - Chunked stores and EEG Parquet files are compressed, their bytes depend on the codec: when they differ, the
+      recordings are decoded block by block to measure the largest difference per channel.
+    - JSON sidecars are compared structurally, key by key.
+    - TSV files (events, participants) and other Parquet tables (events table) are compared cell by cell, numbers being
+      compared by value.
+    - Other files are compared on their hash.
+
+Files are compared in parallel by a pool of processes.
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .chunked import ChunkedReader, loadChunked
+from .edfheader import quantizationSteps, readEdfHeader, readEdfRecords
+from .eeg import _PARQUET_METADATA_KEY, Eeg, FileFormat
+
+# Maximum number of differences listed in the details of a file
+_MAX_DETAILS = 10
+# Fields of EDF headers that describe the recording without changing the layout or the scaling of its samples
+_EDF_METADATA_FIELDS = (
+    "version",
+    "patient",
+    "recording",
+    "startDateTime",
+    "reserved",
+    "transducers",
+    "dimensions",
+    "prefilters",
+)
+
+
+def _blockHashes(edfFile: Path, header: dict, recordsPerBlock: int) -> list[bytes]:
+    """Hashes of the data records of an EDF file, grouped in blocks of recordsPerBlock records."""
+    hashes = list()
+    blockBytes = recordsPerBlock * header["recordBytes"]
+    with open(edfFile, "rb") as f:
+        f.seek(header["headerBytes"])
+        for block in iter(lambda: f.read(blockBytes), b""):
+            hashes.append(hashlib.blake2b(block, digest_size=16).digest())
+    return hashes
+
+
+def _headerBytes(edfFile: Path, header: dict) -> bytes:
+    with open(edfFile, "rb") as f:
+        return f.read(header["headerBytes"])
+
+
+def _compareEdf(refFile: Path, newFile: Path, blockDuration: float, tolerance: float) -> dict:
+    refHeader = readEdfHeader(refFile)
+    newHeader = readEdfHeader(newFile)
+    details = list()
+    for field in ("labels", "samplesPerRecord", "recordDuration", "numRecords"):
+        if not np.array_equal(refHeader[field], newHeader[field]):
+            details.append(f"{field}: {refHeader[field]} != {newHeader[field]}")
+    if details:
+        # Data of files with different layouts can not be compared
+        return {"status": "different", "maxDifference": np.inf, "withinTolerance": False, "details": details}
+
+    scalingEqual = all(
+        np.array_equal(refHeader[x], newHeader[x]) for x in ("physicalMin", "physicalMax", "digitalMin", "digitalMax")
+    )
+    metadata = [
+        f"{field}: {refHeader[field]!r} != {newHeader[field]!r}"
+        for field in _EDF_METADATA_FIELDS
+        if refHeader[field] != newHeader[field]
+    ]
+    if not metadata and scalingEqual and _headerBytes(refFile, refHeader) != _headerBytes(newFile, newHeader):
+        # Fields that are not parsed (e.g. the reserved field of the signals) or formatting of the fields
+        metadata.append("header: content differs")
+
+    recordsPerBlock = 1
+    if refHeader["recordDuration"] > 0:
+        recordsPerBlock = max(1, int(round(blockDuration / refHeader["recordDuration"])))
+    refHashes = _blockHashes(refFile, refHeader, recordsPerBlock)
+    newHashes = _blockHashes(newFile, newHeader, recordsPerBlock)
+    differentBlocks = [i for i, (x, y) in enumerate(zip(refHashes, newHashes)) if x != y]
+    result = {"numBlocks": len(refHashes), "differentBlocks": len(differentBlocks), "maxDifference": 0.0}
+    if not differentBlocks and scalingEqual:
+        if metadata:
+            return result | {"status": "different", "withinTolerance": False, "details": metadata[:_MAX_DETAILS]}
+        return result | {"status": "identical", "withinTolerance": True}
+
+    # Decode the differing blocks (all blocks if the scaling of the samples changed)
+    blocks = differentBlocks if scalingEqual else range(len(refHashes))
+    if tolerance is None:
+        # One quantization step of the coarser of the two files
+        tolerances = np.maximum(quantizationSteps(refHeader), quantizationSteps(newHeader))
+    else:
+        tolerances = np.full(len(refHeader["labels"]), tolerance)
+    differences = np.zeros(len(refHeader["labels"]))
+    with open(refFile, "rb") as ref, open(newFile, "rb") as new:
+        for block in blocks:
+            first = block * recordsPerBlock
+            refSignals = readEdfRecords(ref, refHeader, first, recordsPerBlock)
+            newSignals = readEdfRecords(new, newHeader, first, recordsPerBlock)
+            for i, (x, y) in enumerate(zip(refSignals, newSignals)):
+                if len(x):
+                    differences[i] = max(differences[i], np.max(np.abs(x - y)))
+    report = _differenceReport(refHeader["labels"], differences, tolerances)
+    if metadata:
+        report["withinTolerance"] = False
+        report["details"] = (metadata + report["details"])[:_MAX_DETAILS]
+    return result | {"status": "different"} | report
+
+
+def _differenceReport(labels: list[str], differences: np.ndarray, tolerances: np.ndarray) -> dict:
+    """Largest difference and channels above tolerance from the largest difference per channel."""
+    above = [
+        f"{label}: {difference:.6g}"
+        for label, difference, channelTolerance in zip(labels, differences, tolerances)
+        if difference > channelTolerance
+    ]
+    return {
+        "maxDifference": float(differences.max(initial=0)),
+        "withinTolerance": not above,
+        "details": above[:_MAX_DETAILS],
+    }
+
+
+def _signalLayout(file: Path) -> dict:
+    """Channels, fs, numSamples and quantization steps per channel (0 for float columns) of a recording store."""
+    if file.suffix == f".{FileFormat.CHUNKED.value}":
+        with ChunkedReader(file.as_posix()) as reader:
+            return {
+                "channels": reader.channels,
+                "fs": reader.fs,
+                "numSamples": reader.numSamples,
+                "steps": np.array(reader.metadata["gains"]),
+            }
+    import pyarrow.parquet as pq
+
+    parquetFile = pq.ParquetFile(file)
+    metadata = json.loads(parquetFile.schema_arrow.metadata[_PARQUET_METADATA_KEY.encode()])
+    return {
+        "channels": metadata["channels"],
+        "fs": metadata["fs"],
+        "numSamples": parquetFile.metadata.num_rows,
+        "steps": np.zeros(len(metadata["channels"])) if metadata["scales"] is None else np.array(metadata["scales"]),
+    }
+
+
+def _loadSignals(file: Path, start: float, duration: float) -> np.ndarray:
+    if file.suffix == f".{FileFormat.CHUNKED.value}":
+        return loadChunked(file.as_posix(), start, duration).data
+    return Eeg.loadDataFrame(file.as_posix(), start, start + duration).data
+
+
+def _compareSignals(refFile: Path, newFile: Path, blockDuration: float, tolerance: float) -> dict:
+    """Compare the samples of two chunked stores or EEG Parquet files."""
+    refLayout = _signalLayout(refFile)
+    newLayout = _signalLayout(newFile)
+    details = [
+        f"{field}: {refLayout[field]} != {newLayout[field]}"
+        for field in ("channels", "fs", "numSamples")
+        if refLayout[field] != newLayout[field]
+    ]
+    if details:
+        # Data of files with different layouts can not be compared
+        return {"status": "different", "maxDifference": np.inf, "withinTolerance": False, "details": details}
+
+    if tolerance is None:
+        # One quantization step of the coarser of the two files
+        tolerances = np.maximum(refLayout["steps"], newLayout["steps"])
+    else:
+        tolerances = np.full(len(refLayout["channels"]), tolerance)
+    differences = np.zeros(len(refLayout["channels"]))
+    duration = refLayout["numSamples"] / refLayout["fs"]
+    for start in np.arange(0, duration, blockDuration):
+        ref = _loadSignals(refFile, start, blockDuration)
+        new = _loadSignals(newFile, start, blockDuration)
+        if ref.size:
+            differences = np.maximum(differences, np.max(np.abs(ref.astype(float) - new), axis=1))
+    report = _differenceReport(refLayout["channels"], differences, tolerances)
+    return report | {"status": "different" if report["maxDifference"] else "identical"}
+
+
+def _diffJson(ref, new, path: str = "") -> list[str]:
+    """Paths of the values that differ between two JSON documents."""
+    if isinstance(ref, dict) and isinstance(new, dict):
+        differences = list()
+        for key in sorted(set(ref) | set(new)):
+            if key not in new:
+                differences.append(f"{path}/{key}: removed")
+            elif key not in ref:
+                differences.append(f"{path}/{key}: added")
+            else:
+                differences += _diffJson(ref[key], new[key], f"{path}/{key}")
+        return differences
+    if isinstance(ref, list) and isinstance(new, list) and len(ref) == len(new):
+        return [x for i, (a, b) in enumerate(zip(ref, new)) for x in _diffJson(a, b, f"{path}[{i}]")]
+    if ref != new:
+        return [f"{path or '/'}: {ref!r} != {new!r}"]
+    return []
+
+
+def _diffTsv(refFile: Path, newFile: Path) -> list[str]:
+    """Cells that differ between two TSV files. Numbers are compared by value."""
+    ref = pd.read_csv(refFile, sep="\t", dtype=str, keep_default_na=False)
+    new = pd.read_csv(newFile, sep="\t", dtype=str, keep_default_na=False)
+    return _diffTables(ref, new)
+
+
+def _diffParquet(refFile: Path, newFile: Path) -> list[str]:
+    """Cells that differ between two Parquet tables. Numbers are compared by value."""
+    ref = pd.read_parquet(refFile)
+    new = pd.read_parquet(newFile)
+    # Missing values are written as empty cells, as in TSV files
+    return _diffTables(ref.astype(str).where(ref.notna(), ""), new.astype(str).where(new.notna(), ""))
+
+
+def _diffTables(ref: pd.DataFrame, new: pd.DataFrame) -> list[str]:
+    """Cells that differ between two tables of strings. Numbers are compared by value."""
+    if list(ref.columns) != list(new.columns):
+        return [f"columns: {list(ref.columns)} != {list(new.columns)}"]
+    if len(ref) != len(new):
+        return [f"rows: {len(ref)} != {len(new)}"]
+    differences = list()
+    for column in ref.columns:
+        a = ref[column].to_numpy()
+        b = new[column].to_numpy()
+        different = a != b
+        numericA = pd.to_numeric(ref[column], errors="coerce").to_numpy()
+        numericB = pd.to_numeric(new[column], errors="coerce").to_numpy()
+        # "1" and "1.0" are the same number
+        different &= ~((numericA == numericB) & ~np.isnan(numericA))
+        differences += [f"{column}[{i}]: {a[i]!r} != {b[i]!r}" for i in np.flatnonzero(different)]
+    return differences
+
+
+def _fileHash(file: Path) -> bytes:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file, "rb") as f:
+        for chunk in iter(lambda: f.read(2**20), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _isSignalStore(file: Path) -> bool:
+    """True for the recordings written as chunked stores or Parquet files."""
+    return file.suffix == f".{FileFormat.CHUNKED.value}" or file.name.endswith("_eeg.parquet")
+
+
+def _kind(file: str) -> str:
+    suffix = os.path.splitext(file)[1]
+    if suffix == ".edf" or _isSignalStore(Path(file)):
+        return "eeg"
+    return suffix[1:] if suffix in (".json", ".tsv", ".parquet") else "other"
+
+
+def _compareFile(args: tuple) -> dict:
+    """Compare a file of two BIDS trees. Used as a unit of work by the process pool."""
+    refFile, newFile, blockDuration, tolerance = args
+    if refFile.suffix == ".edf":
+        return _compareEdf(refFile, newFile, blockDuration, tolerance)
+    if _fileHash(refFile) == _fileHash(newFile):
+        details = []
+    elif _isSignalStore(refFile):
+        return _compareSignals(refFile, newFile, blockDuration, tolerance)
+    elif refFile.suffix == ".json":
+        with open(refFile, "r") as f:
+            ref = json.load(f)
+        with open(newFile, "r") as f:
+            new = json.load(f)
+        details = _diffJson(ref, new)
+    elif refFile.suffix == ".tsv":
+        details = _diffTsv(refFile, newFile)
+    elif refFile.suffix == ".parquet":
+        details = _diffParquet(refFile, newFile)
+    else:
+        details = ["content differs"]
+    return {
+        "status": "different" if details else "identical",
+        "withinTolerance": not details,
+        "details": details[:_MAX_DETAILS],
+    }
+
+
+def compareDatasets(
+    refRoot: Path,
+    newRoot: Path,
+    blockDuration: float = 60,
+    tolerance: float = None,
+    numWorkers: int = None,
+) -> pd.DataFrame:
+    """Compare two converted BIDS trees.
+
+    Args:
+        refRoot (Path): root folder of the reference BIDS dataset.
+        newRoot (Path): root folder of the BIDS dataset to check against the reference.
+        blockDuration (float, optional): duration of the blocks of EDF data that are hashed, in seconds. Only the
+                                         blocks whose hashes differ are decoded. Chunked stores and Parquet
+                                         recordings are decoded in blocks of this duration. Defaults to 60.
+        tolerance (float, optional): largest accepted difference between samples, in physical units (e.g. uV).
+                                     Defaults to None (one quantization step of the recordings, 0 for float
+                                     Parquet columns).
+        numWorkers (int, optional): number of worker processes. Defaults to None (number of CPUs).
+
+    Returns:
+        pd.DataFrame: one row per file of either dataset with columns file (relative path), kind (eeg, json, tsv,
+                      parquet or other), status (identical, different, missing from newRoot or added in newRoot),
+                      numBlocks and differentBlocks (EDF files), maxDifference (largest difference between samples of
+                      recordings), withinTolerance and details (list of differences).
+    """
+    refRoot = Path(refRoot)
+    newRoot = Path(newRoot)
+    refFiles = {x.relative_to(refRoot).as_posix() for x in refRoot.rglob("*") if x.is_file()}
+    newFiles = {x.relative_to(newRoot).as_posix() for x in newRoot.rglob("*") if x.is_file()}
+    common = sorted(refFiles & newFiles)
+
+    tasks = [(refRoot / file, newRoot / file, blockDuration, tolerance) for file in common]
+    if numWorkers == 1 or len(tasks) <= 1:
+        results = [_compareFile(x) for x in tasks]
+    else:
+        numWorkers = numWorkers or os.cpu_count()
+        with ProcessPoolExecutor(numWorkers) as executor:
+            results = list(executor.map(_compareFile, tasks, chunksize=max(1, len(tasks) // (4 * numWorkers))))
+
+    rows = [{"file": file, "kind": _kind(file)} | result for file, result in zip(common, results)]
+    for status, files in (("missing", refFiles - newFiles), ("added", newFiles - refFiles)):
+        rows += [{"file": file, "kind": _kind(file), "status": status, "withinTolerance": False} for file in files]
+    columns = ["file", "kind", "status", "numBlocks", "differentBlocks", "maxDifference", "withinTolerance", "details"]
+    report = pd.DataFrame(rows, columns=columns).sort_values("file", ignore_index=True)
+    report["details"] = [x if isinstance(x, list) else [] for x in report["details"]]
+    return report
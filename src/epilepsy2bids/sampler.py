@@ -0,0 +1,284 @@
+"""Random-access sampling of labelled windows from converted recordings.
+
+Windows are read directly from the EDF files of a BIDS dataset. Files are kept open with their parsed header in a pool
+of limited size so that reading a window only costs a seek and a read of the data records covering it instead of
+decoding the full file. Data records are decoded without the EDF library (see edfheader), so files held by the pool
+can still be opened by Eeg.loadEdf. Datasets converted to chunked stores are read through a similar pool of readers,
+which parse the footer of a store once and decompress the chunks that cover each window.
+"""
+
+import abc
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .chunked import ChunkedReader
+from .dataset import BidsDataset
+from .edfheader import EDF_ANNOTATIONS, readEdfHeader, readEdfRecords
+from .eeg import FileFormat
+from .labels import DEFAULT_LABEL_OPTIONS, Labels
+
+
+class _EdfFile:
+    def __init__(self, edfFile: str):
+        """EDF file kept open with its parsed header."""
+        self.file = open(edfFile, "rb")
+        self.header = readEdfHeader(self.file)
+        if self.header["numRecords"] < 0:
+            # Number of data records not written by the recorder
+            size = os.fstat(self.file.fileno()).st_size
+            self.header["numRecords"] = (size - self.header["headerBytes"]) // self.header["recordBytes"]
+        self.signals = [i for i, label in enumerate(self.header["labels"]) if label != EDF_ANNOTATIONS]
+        self.lock = threading.Lock()  # the offset of the file is shared by the threads
+
+    def close(self):
+        self.file.close()
+
+
+class _PoolEntry:
+    def __init__(self, reader):
+        self.reader = reader
+        self.users = 0  # number of threads currently using the reader
+
+
+class _ReaderPool(abc.ABC):
+    def __init__(self, maxOpen: int = 32):
+        """Least recently used pool of open readers of recordings.
+
+        The pool can be shared by threads. Each process uses its own readers: readers inherited by a forked process
+        are closed in that process and a pickled pool starts empty.
+
+        Args:
+            maxOpen (int, optional): maximum number of readers kept open. Readers in use are never closed, the pool
+                                     may therefore temporarily exceed this size. Defaults to 32.
+        """
+        self.maxOpen = maxOpen
+        self._reset()
+
+    @abc.abstractmethod
+    def _open(self, file: str):
+        """Open a reader of a recording."""
+
+    def _reset(self):
+        if getattr(self, "_pid", None) not in (None, os.getpid()):
+            # Files inherited from the parent process share its file offsets and can not be used
+            for entry in self._entries.values():
+                entry.reader.close()
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, _PoolEntry] = OrderedDict()
+
+    def __getstate__(self) -> dict:
+        return {"maxOpen": self.maxOpen}
+
+    def __setstate__(self, state: dict):
+        self.maxOpen = state["maxOpen"]
+        self._reset()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _acquire(self, file: str) -> _PoolEntry:
+        if os.getpid() != self._pid:
+            self._reset()
+        with self._lock:
+            entry = self._entries.get(file)
+            if entry is None:
+                entry = _PoolEntry(self._open(file))
+                self._entries[file] = entry
+            self._entries.move_to_end(file)
+            entry.users += 1
+            self._evict()
+            return entry
+
+    def _release(self, entry: _PoolEntry):
+        with self._lock:
+            entry.users -= 1
+            self._evict()
+
+    def _evict(self):
+        # Close least recently used readers that are not in use. Called with the pool lock held.
+        for key in list(self._entries.keys()):
+            if len(self._entries) <= self.maxOpen:
+                break
+            if self._entries[key].users == 0:
+                self._entries.pop(key).reader.close()
+
+    def close(self):
+        """Close all readers of the pool."""
+        with self._lock:
+            for entry in self._entries.values():
+                entry.reader.close()
+            self._entries.clear()
+
+
+class EdfPool(_ReaderPool):
+    """Least recently used pool of open EDF files (see _ReaderPool)."""
+
+    def _open(self, edfFile: str) -> _EdfFile:
+        return _EdfFile(edfFile)
+
+    def read(self, edfFile: str, start: int, n: int) -> tuple[np.ndarray, float]:
+        """Read a range of samples of all the signals of an EDF file.
+
+        Signals are expected to share the same sampling frequency, as in converted recordings. Samples past the end
+        of the recording are padded with zeros.
+
+        Args:
+            edfFile (str): path to EDF file.
+            start (int): index of the first sample.
+            n (int): number of samples.
+
+        Returns:
+            tuple[NDArray[Shape['*, *'], float32], float]: data (channels x samples) and sampling frequency.
+        """
+        entry = self._acquire(edfFile)
+        try:
+            edf = entry.reader
+            header = edf.header
+            samplesPerRecord = header["samplesPerRecord"][edf.signals]
+            # Data records covering the samples of every signal
+            firstRecord = int(np.min(start // samplesPerRecord))
+            lastRecord = int(np.max(-(-(start + n) // samplesPerRecord)))
+            numRecords = max(0, min(lastRecord, header["numRecords"]) - firstRecord)
+            with edf.lock:
+                signals = readEdfRecords(edf.file, header, firstRecord, numRecords)
+            data = np.zeros((len(edf.signals), n), dtype=np.float32)
+            for row, (i, perRecord) in enumerate(zip(edf.signals, samplesPerRecord)):
+                samples = signals[i][start - firstRecord * perRecord :][:n]
+                data[row, : len(samples)] = samples
+            fs = float(samplesPerRecord[0] / header["recordDuration"])
+        finally:
+            self._release(entry)
+        return data, fs
+
+
+class ChunkedPool(_ReaderPool):
+    """Least recently used pool of open chunked stores (see _ReaderPool). The footer of a store is parsed once."""
+
+    def _open(self, file: str) -> ChunkedReader:
+        return ChunkedReader(file)
+
+    def read(self, file: str, start: int, n: int) -> np.ndarray:
+        """Read a range of samples of all the channels of a chunked store. Only the chunks covering it are decompressed.
+
+        Args:
+            file (str): path to the store.
+            start (int): index of the first sample.
+            n (int): number of samples. Samples past the end of the recording are padded with zeros.
+
+        Returns:
+            NDArray[Shape['*, *'], float32]: data (channels x samples).
+        """
+        entry = self._acquire(file)
+        try:
+            data = entry.reader.read(start, start + n)
+        finally:
+            self._release(entry)
+        return np.pad(data, ((0, 0), (0, n - data.shape[1])))
+
+
+# Pools of readers shared by all samplers of the process
+EDF_POOL = EdfPool()
+CHUNKED_POOL = ChunkedPool()
+
+
+class WindowSampler:
+    def __init__(
+        self,
+        dataset: BidsDataset,
+        runs: pd.DataFrame = None,
+        window: float = DEFAULT_LABEL_OPTIONS["window"],
+        stride: float = DEFAULT_LABEL_OPTIONS["stride"],
+        minOverlap: float = DEFAULT_LABEL_OPTIONS["minOverlap"],
+    ):
+        """Random-access sampler of (data, label) windows of the runs of a BIDS dataset.
+
+        Windows are either addressed by (run, offset) with sample or by a flat index over all windows of all runs
+        with __getitem__. The sampler can be used from thread workers and pickled to process workers. Files are read
+        through the shared EDF_POOL and CHUNKED_POOL.
+
+        Args:
+            dataset (BidsDataset): converted dataset.
+            runs (pd.DataFrame, optional): runs to sample from, as returned by BidsDataset.query.
+                                           Defaults to None (all runs).
+            window (float, optional): duration of a window, in seconds. Defaults to 4.
+            stride (float, optional): time between the start of two consecutive windows of the flat index, in
+                                      seconds. Defaults to 4.
+            minOverlap (float, optional): fraction of a window that must be covered by seizures for the window to be
+                                          labelled as seizure. 0 labels any overlapping window as seizure.
+                                          Defaults to 0.
+        """
+        self.runs = dataset.getRuns(runs)
+        self.window = window
+        self.stride = stride
+        self.minOverlap = minOverlap
+        self._labels: dict[int, Labels] = dict()
+
+        # Same number of windows per run as Labels.fromAnnotations
+        durations = np.array([run.duration for run in self.runs], dtype=float)
+        numWindows = np.maximum(0, np.floor((durations - window) / stride).astype(int) + 1)
+        self._firstWindow = np.concatenate(([0], np.cumsum(numWindows)))
+
+    def __len__(self) -> int:
+        return int(self._firstWindow[-1])
+
+    def __getitem__(self, index: int) -> tuple[np.ndarray, int]:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Window index {index} out of range")
+        return self.sample(*self.locate(index))
+
+    def locate(self, index: int) -> tuple[int, float]:
+        """Run and offset (in seconds) of a window of the flat index."""
+        run = int(np.searchsorted(self._firstWindow, index, side="right")) - 1
+        return run, float((index - self._firstWindow[run]) * self.stride)
+
+    def labels(self, run: int) -> Labels:
+        """Labels of a run, loaded from its label cache on first use."""
+        labels = self._labels.get(run)
+        if labels is None:
+            labels = self.runs[run].loadLabels(self.window, self.stride, self.minOverlap)
+            self._labels[run] = labels
+        return labels
+
+    def label(self, run: int, offset: float) -> int:
+        """Label of the window of a run starting at a given offset.
+
+        Args:
+            run (int): index of the run in the sampler.
+            offset (float): start of the window in seconds.
+
+        Returns:
+            int: 1 for seizure and 0 for background.
+        """
+        intervals = self.labels(run).intervals
+        overlap = np.sum(
+            np.clip(np.minimum(offset + self.window, intervals[:, 1]) - np.maximum(offset, intervals[:, 0]), 0, None)
+        )
+        if self.minOverlap > 0:
+            return int(overlap >= self.minOverlap * self.window)
+        return int(overlap > 0)
+
+    def sample(self, run: int, offset: float) -> tuple[np.ndarray, int]:
+        """Read a window of a run.
+
+        Args:
+            run (int): index of the run in the sampler.
+            offset (float): start of the window in seconds.
+
+        Returns:
+            tuple[NDArray[Shape['*, *'], float32], int]: data of the window (channels x samples) and its label.
+        """
+        fs = self.runs[run].fs
+        first = int(round(offset * fs))
+        n = int(round(self.window * fs))
+        if self.runs[run].edfFile.suffix == f".{FileFormat.CHUNKED.value}":
+            data = CHUNKED_POOL.read(self.runs[run].edfFile.as_posix(), first, n)
+        else:
+            data, _ = EDF_POOL.read(self.runs[run].edfFile.as_posix(), first, n)
+        return data, self.label(run, offset)
@@ -0,0 +1,186 @@
+"""Batch scoring of hypotheses against reference annotations for whole BIDS datasets.
+
+Reference and hypothesis trees are read as columnar tables of events instead of instantiating an Annotations object per
+file. Runs are then scored in parallel with the sample-based and event-based scoring of the timescoring library and
+the results are aggregated per subject and for the whole dataset.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+from .annotations import SeizureType
+from .bidsio import EVENTS_COLUMNS, EVENTS_FILE_REGEX, EVENTS_TABLE, RUN_KEYS, readEventsFile
+
+if TYPE_CHECKING:
+    from timescoring import scoring
+
+# timescoring is imported on first use to keep the import of this module fast.
+
+
+def loadEventsTable(root: Path, numWorkers: int = None, consolidated: bool = True) -> pd.DataFrame:
+    """Load all _events.tsv files of a BIDS dataset in a single table.
+
+    Args:
+        root (Path): root folder of the BIDS dataset.
+        numWorkers (int, optional): number of threads used to read the files. Defaults to None (Python default).
+        consolidated (bool, optional): read the consolidated events table written by the converters at the root of
+                                       the dataset instead of the individual files if it exists, holds the same runs
+                                       as the _events.tsv files and no _events.tsv file was modified after it.
+                                       Defaults to True.
+
+    Returns:
+        pd.DataFrame: one row per event with columns subject, session, task, run, onset, duration, eventType and
+                      recordingDuration.
+    """
+    columns = RUN_KEYS + list(EVENTS_COLUMNS.keys())
+    files = sorted(
+        x for x in Path(root).glob("sub-*/ses-*/eeg/*_events.tsv") if EVENTS_FILE_REGEX.search(x.name)
+    )
+    tableFile = Path(root) / EVENTS_TABLE
+    if consolidated and tableFile.exists():
+        tableTime = os.stat(tableFile).st_mtime_ns
+        # Events files edited after the table was written make it stale
+        if all(os.stat(x).st_mtime_ns <= tableTime for x in files):
+            table = pd.read_parquet(tableFile, columns=columns)
+            # So do runs added or removed without updating the table (e.g. files copied with their modification time)
+            tableRuns = set(table[RUN_KEYS].itertuples(index=False, name=None))
+            fileRuns = {EVENTS_FILE_REGEX.search(x.name).group(*RUN_KEYS) for x in files}
+            if tableRuns == fileRuns:
+                return table
+
+    if len(files) == 0:
+        return pd.DataFrame(columns=columns)
+    with ThreadPoolExecutor(numWorkers) as executor:
+        tables = list(executor.map(readEventsFile, files))
+    return pd.concat(tables, ignore_index=True)[columns]
+
+
+def _seizureEvents(events: pd.DataFrame) -> dict[tuple, list[tuple[float, float]]]:
+    """Group seizure events of an events table by run as lists of (start, stop) tuples."""
+    seizures = events[events["eventType"].isin(SeizureType._member_names_)]
+    starts = seizures["onset"].to_numpy()
+    stops = starts + seizures["duration"].to_numpy()
+    grouped = dict()
+    for key, start, stop in zip(
+        seizures[RUN_KEYS].itertuples(index=False, name=None), starts, stops
+    ):
+        grouped.setdefault(key, list()).append((float(start), float(stop)))
+    return grouped
+
+
+def _scoreRun(
+    ref: list[tuple[float, float]],
+    hyp: list[tuple[float, float]],
+    duration: float,
+    fs: int,
+    param: "scoring.EventScoring.Parameters",
+) -> tuple[int, int, int, int, int, int]:
+    """Score a single run. Returns sample tp, fp, refTrue and event tp, fp, refTrue."""
+    from timescoring import scoring
+    from timescoring.annotations import Annotation as MaskEvents
+
+    numSamples = round(duration * fs)
+    ref = MaskEvents(ref, fs, numSamples)
+    hyp = MaskEvents(hyp, fs, numSamples)
+    sampleScore = scoring.SampleScoring(ref, hyp, fs)
+    eventScore = scoring.EventScoring(ref, hyp, param)
+    return (
+        int(sampleScore.tp),
+        int(sampleScore.fp),
+        int(sampleScore.refTrue),
+        int(eventScore.tp),
+        int(eventScore.fp),
+        int(eventScore.refTrue),
+    )
+
+
+def _scoreRuns(args: tuple) -> list[tuple]:
+    """Score a batch of runs. Used as a unit of work by the process pool."""
+    runs, fs, param = args
+    return [_scoreRun(ref, hyp, duration, fs, param) for ref, hyp, duration in runs]
+
+
+def _computeScores(df: pd.DataFrame) -> pd.DataFrame:
+    """Compute sensitivity, precision, f1 and false positive rate from the counts of a scoring table."""
+    for prefix in ("sample", "event"):
+        tp = df[f"{prefix}_tp"].to_numpy(dtype=float)
+        fp = df[f"{prefix}_fp"].to_numpy(dtype=float)
+        refTrue = df[f"{prefix}_refTrue"].to_numpy(dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            df[f"{prefix}_sensitivity"] = np.where(refTrue > 0, tp / refTrue, np.nan)
+            df[f"{prefix}_precision"] = np.where(tp + fp > 0, tp / (tp + fp), np.nan)
+            df[f"{prefix}_f1"] = np.where(
+                refTrue + fp > 0, 2 * tp / (2 * tp + fp + (refTrue - tp)), np.nan
+            )
+            df[f"{prefix}_fpRate"] = fp / (df["duration"].to_numpy() / 3600 / 24)  # FP per day
+    return df
+
+
+def scoreDataset(
+    refRoot: Path,
+    hypRoot: Path,
+    fs: int = 1,
+    param: "scoring.EventScoring.Parameters" = None,
+    numWorkers: int = None,
+    batchSize: int = 64,
+) -> dict[str, pd.DataFrame]:
+    """Score all hypotheses of a BIDS tree against the reference annotations of another BIDS tree.
+
+    Runs are matched on their subject, session, task and run entities. A reference run without hypothesis is scored as
+    a run without detections. Subject and dataset scores are computed from the summed counts of their runs.
+
+    Args:
+        refRoot (Path): root folder of the reference BIDS dataset.
+        hypRoot (Path): root folder of the hypotheses, organized as a BIDS dataset.
+        fs (int, optional): sampling frequency of the labels for the sample-based scoring. Defaults to 1.
+        param (EventScoring.Parameters, optional): parameters of the event-based scoring. Defaults to None (default
+                                                   values of timescoring).
+        numWorkers (int, optional): number of worker processes. Defaults to None (number of CPUs).
+        batchSize (int, optional): number of runs scored by a worker per task. Defaults to 64.
+
+    Returns:
+        dict[str, pd.DataFrame]: scores with keys "run", "subject" and "dataset". Each table contains the duration (in
+                                 seconds) and the tp, fp, refTrue, sensitivity, precision, f1 and fpRate (per day) of
+                                 the sample-based ("sample_" prefix) and event-based ("event_" prefix) scoring.
+    """
+    if param is None:
+        from timescoring import scoring
+
+        param = scoring.EventScoring.Parameters()
+    refEvents = loadEventsTable(refRoot)
+    hypEvents = loadEventsTable(hypRoot)
+
+    durations = refEvents.groupby(RUN_KEYS, sort=True)["recordingDuration"].first()
+    refSeizures = _seizureEvents(refEvents)
+    hypSeizures = _seizureEvents(hypEvents)
+
+    runs = [
+        (refSeizures.get(key, []), hypSeizures.get(key, []), duration)
+        for key, duration in durations.items()
+    ]
+    batches = [(runs[i : i + batchSize], fs, param) for i in range(0, len(runs), batchSize)]
+    if numWorkers == 1 or len(batches) <= 1:
+        results = [x for batch in batches for x in _scoreRuns(batch)]
+    else:
+        with ProcessPoolExecutor(numWorkers or os.cpu_count()) as executor:
+            results = [x for batchResults in executor.map(_scoreRuns, batches) for x in batchResults]
+
+    columns = [f"{prefix}_{count}" for prefix in ("sample", "event") for count in ("tp", "fp", "refTrue")]
+    runScores = pd.DataFrame(results, columns=columns, index=durations.index)
+    runScores.insert(0, "duration", durations.to_numpy(dtype=float))
+    runScores = runScores.reset_index()
+
+    counts = ["duration"] + columns
+    subjectScores = runScores.groupby("subject", sort=True)[counts].sum().reset_index()
+    datasetScores = runScores[counts].sum().to_frame().transpose()
+
+    return {
+        "run": _computeScores(runScores),
+        "subject": _computeScores(subjectScores),
+        "dataset": _computeScores(datasetScores),
+    }
@@ -0,0 +1,131 @@
+"""Extract seizure-centred and background segments from EDF recordings without decoding the full file."""
+
+from typing import TypedDict
+
+import numpy as np
+
+from .annotations import Annotations, EventType, SeizureType
+from .eeg import Eeg
+
+
+class Segment(TypedDict):
+    onset: float  # start time of the segment from the beginning of the source recording, in seconds
+    duration: float  # duration of the segment, in seconds
+    eventType: EventType  # type of the first seizure in the segment, bckg for background segments
+
+
+class SegmentOptions(TypedDict):
+    margin: float  # context kept before and after each seizure, in seconds
+    numBackground: int  # number of background segments sampled per recording
+    backgroundDuration: float  # duration of each background segment, in seconds
+    seed: int  # seed of the random generator used to sample background segments
+
+
+DEFAULT_SEGMENT_OPTIONS: SegmentOptions = {
+    "margin": 60,
+    "numBackground": 1,
+    "backgroundDuration": 120,
+    "seed": 0,
+}
+
+
+def selectSegments(
+    annotations: Annotations,
+    margin: float = DEFAULT_SEGMENT_OPTIONS["margin"],
+    numBackground: int = DEFAULT_SEGMENT_OPTIONS["numBackground"],
+    backgroundDuration: float = DEFAULT_SEGMENT_OPTIONS["backgroundDuration"],
+    seed: int = DEFAULT_SEGMENT_OPTIONS["seed"],
+) -> list[Segment]:
+    """Select seizure-centred segments and a random set of background segments of a recording.
+
+    Every seizure is extended by margin seconds on both sides and clipped to the recording. Overlapping seizure
+    segments are merged. Background segments are drawn uniformly from the time that is not covered by seizure segments
+    and do not overlap each other. Segment boundaries are rounded to whole seconds.
+
+    Args:
+        annotations (Annotations): annotations of the recording.
+        margin (float, optional): context kept before and after each seizure, in seconds. Defaults to 60.
+        numBackground (int, optional): number of background segments. Fewer segments are returned if the recording
+                                       does not contain enough background. Defaults to 1.
+        backgroundDuration (float, optional): duration of each background segment, in seconds. Defaults to 120.
+        seed (int, optional): seed of the random generator used to sample background segments. Defaults to 0.
+
+    Returns:
+        list[Segment]: segments sorted by onset.
+    """
+    recordingDuration = annotations.events[0]["recordingDuration"]
+
+    # Seizure segments
+    seizureSegments = list()
+    for event in sorted(annotations.events, key=lambda x: x["onset"]):
+        if event["eventType"].value not in SeizureType._member_names_:
+            continue
+        onset = float(max(0, np.floor(event["onset"] - margin)))
+        end = float(min(recordingDuration, np.ceil(event["onset"] + event["duration"] + margin)))
+        if end <= onset:
+            continue
+        if len(seizureSegments) and onset <= seizureSegments[-1]["onset"] + seizureSegments[-1]["duration"]:
+            previous = seizureSegments[-1]
+            previous["duration"] = max(previous["duration"], end - previous["onset"])
+        else:
+            seizureSegments.append(Segment(onset=onset, duration=end - onset, eventType=event["eventType"]))
+
+    # Background segments
+    free = list()
+    previousEnd = 0
+    for segment in seizureSegments:
+        free.append((previousEnd, segment["onset"]))
+        previousEnd = segment["onset"] + segment["duration"]
+    free.append((previousEnd, float(np.floor(recordingDuration))))
+
+    rng = np.random.default_rng(seed)
+    backgroundSegments = list()
+    for _ in range(numBackground):
+        # Possible start times of a segment in each free interval
+        candidates = [j for j, (start, end) in enumerate(free) if end - start >= backgroundDuration]
+        if len(candidates) == 0:
+            break
+        lengths = np.array([free[j][1] - free[j][0] - backgroundDuration for j in candidates]) + 1
+        j = candidates[rng.choice(len(candidates), p=lengths / np.sum(lengths))]
+        start, end = free.pop(j)
+        onset = float(start + rng.integers(0, int(end - start - backgroundDuration) + 1))
+        backgroundSegments.append(Segment(onset=onset, duration=backgroundDuration, eventType=EventType.bckg))
+
+        # Remove sampled segment from the free time
+        free.insert(j, (onset + backgroundDuration, end))
+        free.insert(j, (start, onset))
+
+    return sorted(seizureSegments + backgroundSegments, key=lambda x: x["onset"])
+
+
+def extractSegments(
+    edfFile: str,
+    annotations: Annotations,
+    montage: Eeg.Montage = Eeg.Montage.UNIPOLAR,
+    electrodes: list[str] = Eeg.ELECTRODES_10_20,
+    segments: list[Segment] = None,
+    **kwargs,
+) -> list[tuple[Segment, Eeg, Annotations]]:
+    """Load the seizure-centred and background segments of an EDF recording.
+
+    Only the data records covering the segments are decoded.
+
+    Args:
+        edfFile (str): path to EDF file.
+        annotations (Annotations): annotations of the recording.
+        montage (Montage, optional): montage of the EEG recording. Defaults to Montage.UNIPOLAR.
+        electrodes (list[str], optional): electrodes to load. Defaults to the 19 electrodes of the 10-20 system.
+        segments (list[Segment], optional): segments to extract. If None they are selected with selectSegments.
+        **kwargs: options forwarded to selectSegments (see SegmentOptions).
+
+    Returns:
+        list[tuple[Segment, Eeg, Annotations]]: for each segment, its description, its data and its annotations
+                                                relative to the start of the segment.
+    """
+    if segments is None:
+        segments = selectSegments(annotations, **kwargs)
+    extracted = list()
+    for segment in segments:
+        eeg = Eeg.loadEdf(edfFile, montage, electrodes, segment["onset"], segment["duration"])
+        extracted.append((segment, eeg, annotations.crop(segment["onset"], segment["duration"])))
+    return extracted
@@ -0,0 +1,214 @@
+"""Virtual continuous recording of the runs of a session.
+
+Runs of a subject and session are often consecutive segments of a single long monitoring. A Session places the runs of
+a session on a common timeline from the dateTime and recordingDuration of their events, without reading their data.
+Windows of the timeline are read from the parts of the runs that they overlap only, samples of the gaps between runs
+are NaN. Events of all runs are expressed in seconds from the start of the session and events split by the end of a
+run are merged with their continuation in the next run.
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .annotations import SeizureType
+from .dataset import BidsDataset, Run
+from .eeg import Eeg
+
+_EVENT_COLUMNS = ["onset", "duration", "eventType", "confidence", "channels", "run"]
+
+
+class Session:
+    def __init__(self, runs: list[Run]):
+        """Timeline of the runs of a session. Only the events of the runs are read.
+
+        Runs are placed at the time of their dateTime, relative to the earliest run. If a run has no dateTime, runs are
+        placed one after the other in the given order.
+
+        Args:
+            runs (list[Run]): runs of a session, e.g. from BidsDataset.getRuns. Runs must have the same sampling
+                              frequency.
+
+        Raises:
+            ValueError: raised if no run is given or if the sampling frequencies of the runs are unknown or differ.
+        """
+        if len(runs) == 0:
+            raise ValueError("A session needs at least one run.")
+        frequencies = np.array([run.fs for run in runs], dtype=float)
+        if np.isnan(frequencies).any() or len(set(frequencies.tolist())) > 1:
+            raise ValueError(f"Runs of a session must have the same known sampling frequency, got {frequencies}.")
+        self.fs = int(frequencies[0]) if frequencies[0].is_integer() else float(frequencies[0])
+
+        events = [run.loadAnnotations().toDataFrame() for run in runs]
+        dateTimes = [x["dateTime"].iloc[0] if len(x) else pd.NaT for x in events]
+        durations = np.array(
+            [
+                run.duration if not np.isnan(run.duration) else x["recordingDuration"].iloc[0]
+                for run, x in zip(runs, events)
+            ],
+            dtype=float,
+        )
+        if not pd.isna(dateTimes).any():
+            order = np.argsort(np.array(dateTimes, dtype="datetime64[us]"), kind="stable")
+            self.dateTime: datetime = min(dateTimes).to_pydatetime()
+            starts = np.array([(dateTimes[i] - min(dateTimes)).total_seconds() for i in order])
+        else:
+            order = np.arange(len(runs))
+            self.dateTime: datetime = None
+            starts = np.concatenate(([0], np.cumsum(durations)[:-1]))
+
+        self.runs = [runs[i] for i in order]
+        self.starts = starts  # start of each run, in seconds from the start of the session
+        self.durations = durations[order]  # duration of each run, in seconds
+        self._events = [events[i] for i in order]
+        self._first = None  # single sample of the first run, read for its channels and montage
+
+    @classmethod
+    def fromDataset(cls, dataset: BidsDataset, subject: str, session: str, task: str = None):
+        """Timeline of a session of a BIDS dataset.
+
+        Args:
+            dataset (BidsDataset): indexed BIDS dataset.
+            subject (str): BIDS subject label.
+            session (str): BIDS session label.
+            task (str, optional): BIDS task label. Defaults to None (all tasks).
+
+        Returns:
+            Session: timeline of the runs of the session.
+        """
+        return cls(dataset.getRuns(dataset.query(subject=subject, session=session, task=task)))
+
+    def __len__(self) -> int:
+        return len(self.runs)
+
+    def __repr__(self) -> str:
+        run = self.runs[0]
+        return f"Session(sub-{run.subject}_ses-{run.session}, {len(self)} runs, {self.duration:.2f} s)"
+
+    @property
+    def duration(self) -> float:
+        """Duration of the session from the start of its first run to the end of its last run, in seconds."""
+        return float(np.max(self.starts + self.durations))
+
+    @property
+    def channels(self) -> list[str]:
+        """Channels of the session, those of its first run. Reads a single sample of the first run."""
+        if self._first is None:
+            self._first = self.runs[0].loadEeg(0, 1 / self.fs)
+        return list(self._first.channels)
+
+    def gaps(self, minDuration: float = 0) -> list[tuple[float, float]]:
+        """Parts of the session that are not covered by any run.
+
+        Args:
+            minDuration (float, optional): shorter gaps are ignored, in seconds. Defaults to 0.
+
+        Returns:
+            list[tuple[float, float]]: start and duration of each gap, in seconds from the start of the session.
+        """
+        gaps = list()
+        end = 0
+        for start, duration in zip(self.starts, self.durations):
+            if start - end > minDuration:
+                gaps.append((float(end), float(start - end)))
+            end = max(end, start + duration)
+        return gaps
+
+    def locate(self, time: float) -> tuple[Run, float]:
+        """Run covering a time of the session.
+
+        Args:
+            time (float): time in seconds from the start of the session.
+
+        Returns:
+            tuple[Run, float]: run covering the time and time in seconds from the start of the run. (None, None) if the
+                               time falls in a gap. If runs overlap, the run starting last is returned.
+        """
+        covering = np.flatnonzero((self.starts <= time) & (time < self.starts + self.durations))
+        if len(covering) == 0:
+            return None, None
+        i = covering[-1]
+        return self.runs[i], float(time - self.starts[i])
+
+    def read(self, start: float = 0, duration: float = None) -> Eeg:
+        """Read a window of the session. Only the part of each run that overlaps the window is loaded.
+
+        Args:
+            start (float, optional): start of the window in seconds from the start of the session. Defaults to 0.
+            duration (float, optional): duration of the window in seconds. Defaults to None (until the end of the
+                                        session).
+
+        Returns:
+            Eeg: data of the window with the channels of the session. Samples in gaps between runs, and channels
+                 missing from a run, are NaN. Where runs overlap, the run starting last is used.
+        """
+        stop = self.duration if duration is None else start + duration
+        first = int(round(start * self.fs))
+        numSamples = max(0, int(round(stop * self.fs)) - first)
+        channels = self.channels
+        data = np.full((len(channels), numSamples), np.nan)
+        for run, runStart, runDuration in zip(self.runs, self.starts, self.durations):
+            runFirst = int(round(runStart * self.fs))
+            begin = max(first, runFirst)
+            end = min(first + numSamples, runFirst + int(round(runDuration * self.fs)))
+            if end <= begin:
+                continue
+            eeg = run.loadEeg((begin - runFirst) / self.fs, (end - begin) / self.fs)
+            n = min(end - begin, eeg.data.shape[1])
+            rows = [(channels.index(x), i) for i, x in enumerate(eeg.channels) if x in channels]
+            data[[x[0] for x in rows], begin - first : begin - first + n] = eeg.data[[x[1] for x in rows], :n]
+        return Eeg(data, channels, self.fs, self._first.montage)
+
+    def events(
+        self, start: float = 0, stop: float = None, eventType: str | list[str] = None, mergeGap: float = 0
+    ) -> pd.DataFrame:
+        """Events of the session that overlap a window.
+
+        Args:
+            start (float, optional): start of the window in seconds from the start of the session. Defaults to 0.
+            stop (float, optional): end of the window in seconds from the start of the session. Defaults to None (end
+                                    of the session).
+            eventType (str | list[str], optional): event type(s) to select. "seizure" selects all seizure types.
+                                                   Defaults to None (all).
+            mergeGap (float, optional): events of the same type in consecutive runs are merged if they are separated
+                                        by at most mergeGap seconds, e.g. a seizure split between two files. Defaults
+                                        to 0 (events that touch).
+
+        Returns:
+            pd.DataFrame: one row per event with columns onset (in seconds from the start of the session), duration,
+                          eventType, confidence, channels and run (label of the run of the onset of the event).
+        """
+        tables = list()
+        for run, runStart, events in zip(self.runs, self.starts, self._events):
+            events = events.assign(onset=events["onset"] + runStart, run=run.run)
+            tables.append(events[_EVENT_COLUMNS])
+        events = pd.concat(tables, ignore_index=True).sort_values("onset", kind="stable", ignore_index=True)
+
+        if eventType == "seizure":
+            eventType = SeizureType._member_names_
+        elif isinstance(eventType, str):
+            eventType = [eventType]
+        if eventType is not None:
+            events = events[events["eventType"].isin(eventType)].reset_index(drop=True)
+
+        # Merge events split between consecutive runs
+        rows = list()
+        tolerance = mergeGap + 0.5 / self.fs
+        for event in events.to_dict("records"):
+            previous = next((x for x in reversed(rows) if x["eventType"] == event["eventType"]), None)
+            if (
+                previous is not None
+                and previous["run"] != event["run"]
+                and event["onset"] - (previous["onset"] + previous["duration"]) <= tolerance
+            ):
+                previous["duration"] = max(
+                    previous["duration"], event["onset"] + event["duration"] - previous["onset"]
+                )
+                continue
+            rows.append(event)
+        events = pd.DataFrame(rows, columns=_EVENT_COLUMNS)
+
+        stop = self.duration if stop is None else stop
+        overlap = (events["onset"] < stop) & (events["onset"] + events["duration"] > start)
+        return events[overlap.to_numpy(dtype=bool)].reset_index(drop=True)
@@ -0,0 +1,248 @@
+"""Export of converted recordings to large shard files for sequential reads during training.
+
+Recordings of a BIDS dataset are standardized, labelled and packed in tar shards of a few GB. Each run is stored as
+three consecutive members sharing the key of the run:
+    - <key>.npy: data array (channels x samples).
+    - <key>.labels.npy: window labels (see labels.Labels).
+    - <key>.json: channels, sampling frequency, montage, events and labelling parameters.
+
+Shards can be streamed with purely sequential reads, in an order shuffled deterministically per epoch. The list of
+shards (shards.json) is completed by an index of the offset of every member in the shards (index.parquet) which allows
+random access to a single run.
+"""
+
+import io
+import json
+import os
+import tarfile
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from .annotations import Annotations
+from .dataset import BidsDataset
+from .eeg import Eeg
+from .labels import DEFAULT_LABEL_OPTIONS, Labels
+
+SHARD_INDEX = "index.parquet"
+SHARD_LIST = "shards.json"
+_MEMBERS = ("data", "labels", "metadata")
+_SUFFIXES = {"data": ".npy", "labels": ".labels.npy", "metadata": ".json"}
+
+
+def _npyBytes(array: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+    return buffer.getvalue()
+
+
+def _eventsToJson(annotations: Annotations) -> list[dict]:
+    return [
+        {
+            "onset": event["onset"],
+            "duration": event["duration"],
+            "eventType": event["eventType"].value,
+        }
+        for event in annotations.events
+    ]
+
+
+class _ShardWriter:
+    def __init__(self, outDir: Path, shardSize: int):
+        self.outDir = outDir
+        self.shardSize = shardSize
+        self.shards = list()
+        self._tar = None
+
+    def add(self, key: str, members: dict[str, bytes]) -> dict:
+        """Write the members of a record and return their location."""
+        if self._tar is None or self._tar.offset >= self.shardSize:
+            self.close()
+            self.shards.append(f"shard-{len(self.shards):05}.tar")
+            self._tar = tarfile.open(self.outDir / self.shards[-1], "w", format=tarfile.GNU_FORMAT)
+        location = {"shard": len(self.shards) - 1}
+        for member in _MEMBERS:
+            content = members[member]
+            info = tarfile.TarInfo(key + _SUFFIXES[member])
+            info.size = len(content)
+            self._tar.addfile(info, io.BytesIO(content))
+            # Data of a member starts after its header and ends on a 512 bytes block boundary
+            blocks = -(-info.size // tarfile.BLOCKSIZE)
+            location[f"{member}Offset"] = self._tar.offset - blocks * tarfile.BLOCKSIZE
+            location[f"{member}Size"] = info.size
+        return location
+
+    def close(self):
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+
+
+def exportShards(
+    dataset: BidsDataset,
+    outDir: Path,
+    runs: pd.DataFrame = None,
+    shardSize: int = 2 * 2**30,
+    dtype: np.dtype = np.float32,
+    window: float = DEFAULT_LABEL_OPTIONS["window"],
+    stride: float = DEFAULT_LABEL_OPTIONS["stride"],
+    minOverlap: float = DEFAULT_LABEL_OPTIONS["minOverlap"],
+) -> list[Path]:
+    """Pack the recordings and labels of a converted dataset in tar shards.
+
+    Args:
+        dataset (BidsDataset): converted dataset.
+        outDir (Path): folder of the shards. It is created if it does not exist.
+        runs (pd.DataFrame, optional): runs to export, as returned by BidsDataset.query. Defaults to None (all runs).
+        shardSize (int, optional): size in bytes after which a new shard is started. Defaults to 2 GiB.
+        dtype (np.dtype, optional): type of the stored data. Defaults to np.float32.
+        window (float, optional): duration of a labelled window, in seconds. Defaults to 4.
+        stride (float, optional): time between the start of two consecutive windows, in seconds. Defaults to 4.
+        minOverlap (float, optional): fraction of a window that must be covered by seizures for the window to be
+                                      labelled as seizure. Defaults to 0 (any overlap).
+
+    Returns:
+        list[Path]: paths of the shards.
+    """
+    outDir = Path(outDir)
+    os.makedirs(outDir, exist_ok=True)
+    writer = _ShardWriter(outDir, shardSize)
+    rows = list()
+    try:
+        for run in dataset.getRuns(runs):
+            key = f"sub-{run.subject}_ses-{run.session}_task-{run.task}_run-{run.run}"
+            eeg = run.loadEeg()
+            annotations = run.loadAnnotations()
+            labels = Labels.fromAnnotations(annotations, window, stride, minOverlap)
+            metadata = {
+                "subject": run.subject,
+                "session": run.session,
+                "task": run.task,
+                "run": run.run,
+                "channels": list(eeg.channels),
+                "fs": eeg.fs,
+                "montage": Eeg.Montage(eeg.montage).value,
+                "events": _eventsToJson(annotations),
+                "intervals": labels.intervals.tolist(),
+                "window": window,
+                "stride": stride,
+                "minOverlap": minOverlap,
+                "duration": labels.duration,
+            }
+            location = writer.add(
+                key,
+                {
+                    "data": _npyBytes(eeg.data.astype(dtype)),
+                    "labels": _npyBytes(labels.labels),
+                    "metadata": json.dumps(metadata).encode(),
+                },
+            )
+            rows.append(
+                {"key": key, "subject": run.subject, "session": run.session, "task": run.task, "run": run.run}
+                | location
+            )
+    finally:
+        writer.close()
+
+    index = pd.DataFrame(rows)
+    index.to_parquet(outDir / SHARD_INDEX, index=False)
+    with open(outDir / SHARD_LIST, "w") as f:
+        json.dump(writer.shards, f)
+    return [outDir / shard for shard in writer.shards]
+
+
+def _record(members: dict[str, bytes]) -> tuple[Eeg, Labels, dict]:
+    metadata = json.loads(members["metadata"])
+    eeg = Eeg(
+        np.load(io.BytesIO(members["data"])),
+        metadata["channels"],
+        metadata["fs"],
+        Eeg.Montage(metadata["montage"]),
+    )
+    labels = Labels(
+        np.load(io.BytesIO(members["labels"])),
+        np.array(metadata["intervals"], dtype=np.float64).reshape((-1, 2)),
+        metadata["window"],
+        metadata["stride"],
+        metadata["duration"],
+    )
+    return eeg, labels, metadata
+
+
+def shardOrder(numShards: int, seed: int = None, epoch: int = 0) -> list[int]:
+    """Order in which shards are read. The order is shuffled deterministically for a given seed and epoch.
+
+    Args:
+        numShards (int): number of shards.
+        seed (int, optional): seed of the shuffling. Defaults to None (shards are read in order).
+        epoch (int, optional): epoch, combined with the seed so that each epoch reads shards in another order.
+                               Defaults to 0.
+
+    Returns:
+        list[int]: indices of the shards in reading order.
+    """
+    if seed is None:
+        return list(range(numShards))
+    return np.random.default_rng([seed, epoch]).permutation(numShards).tolist()
+
+
+def iterShards(
+    shardDir: Path,
+    seed: int = None,
+    epoch: int = 0,
+    worker: int = 0,
+    numWorkers: int = 1,
+) -> Iterator[tuple[Eeg, Labels, dict]]:
+    """Stream the records of exported shards with sequential reads.
+
+    Args:
+        shardDir (Path): folder of the shards.
+        seed (int, optional): seed of the shuffling of the shard order. Defaults to None (shards are read in order).
+        epoch (int, optional): epoch, combined with the seed to shuffle shards differently at each epoch. Defaults to 0.
+        worker (int, optional): index of the worker reading the shards. Defaults to 0.
+        numWorkers (int, optional): number of workers. Shards are split between workers. Defaults to 1.
+
+    Yields:
+        tuple[Eeg, Labels, dict]: recording, labels and metadata of each run.
+    """
+    shardDir = Path(shardDir)
+    with open(shardDir / SHARD_LIST, "r") as f:
+        shards = json.load(f)
+    order = shardOrder(len(shards), seed, epoch)[worker::numWorkers]
+    for i in order:
+        members = dict()
+        with tarfile.open(shardDir / shards[i], "r|") as tar:
+            for info in tar:
+                member = next(x for x in _MEMBERS[::-1] if info.name.endswith(_SUFFIXES[x]))
+                members[member] = tar.extractfile(info).read()
+                # Metadata is the last member of a record
+                if member == "metadata":
+                    yield _record(members)
+                    members = dict()
+
+
+def loadRecord(shardDir: Path, key: str, index: pd.DataFrame = None) -> tuple[Eeg, Labels, dict]:
+    """Read a single record of exported shards using the offset index.
+
+    Args:
+        shardDir (Path): folder of the shards.
+        key (str): key of the run (sub-<subject>_ses-<session>_task-<task>_run-<run>).
+        index (pd.DataFrame, optional): offset index, to avoid reading it for every record. Defaults to None.
+
+    Returns:
+        tuple[Eeg, Labels, dict]: recording, labels and metadata of the run.
+    """
+    shardDir = Path(shardDir)
+    if index is None:
+        index = pd.read_parquet(shardDir / SHARD_INDEX)
+    with open(shardDir / SHARD_LIST, "r") as f:
+        shards = json.load(f)
+    location = index[index["key"] == key].iloc[0]
+    members = dict()
+    with open(shardDir / shards[int(location["shard"])], "rb") as f:
+        for member in _MEMBERS:
+            f.seek(int(location[f"{member}Offset"]))
+            members[member] = f.read(int(location[f"{member}Size"]))
+    return _record(members)
@@ -0,0 +1,493 @@
+"""Access to source recordings stored in archives, compressed files or file-like objects.
+
+Datasets are often distributed as .zip or .tar(.gz) archives. A file inside an archive is addressed by the path of the
+archive followed by its path in the archive (e.g. /data/tuh.zip/edf/train/aaaaaaac/s001_2002/01_tcp_ar/x.edf).
+sourcePath returns an ArchivePath for such paths, which supports the subset of pathlib.Path used by the converters
+(joining, glob, iterdir, open, ...), so that a dataset can be converted without extracting it.
+
+Members of archives are streamed: they are never held in memory as a whole. Gzip-compressed tar archives are read
+through a seekable gzip reader that keeps snapshots of the decompression state taken while the archive is indexed, so
+that reading a member only decompresses from the closest snapshot before it instead of from the start of the archive.
+
+EDF files are decoded by the EDF library, which can only open files by name. EDF files that are not plain files
+(archive members, .edf.gz files, bytes and file-like objects) are decompressed to an anonymous in-memory file which is
+passed to the library. No data is written to disk, except on platforms without in-memory files (os.memfd_create) where
+a temporary file is used. The header of an EDF file (start time, duration, signal labels) is parsed from the first
+bytes of the source, without this copy.
+"""
+
+import bisect
+import contextlib
+import datetime
+import fnmatch
+import gzip
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import zipfile
+import zlib
+from functools import lru_cache
+from pathlib import Path, PurePath
+from typing import IO, Iterator
+
+from .edfheader import readEdfHeader, readEdfStart
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+# Uncompressed bytes between two snapshots of the decompression state of a gzip-compressed archive. A snapshot holds
+# the 32 KiB window of the decompressor.
+_GZIP_SPAN = 16 * 2**20
+_GZIP_CHUNK = 2**16
+_GZIP_WBITS = zlib.MAX_WBITS | 32  # gzip header
+
+
+def _isArchiveName(name: str) -> bool:
+    return name.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _memberName(name: str) -> str:
+    """Path of an archive member without leading ./ and trailing /."""
+    while name.startswith("./"):
+        name = name[2:]
+    return name.rstrip("/")
+
+
+class _IndexedGzipFile(io.RawIOBase):
+    def __init__(self, file: str, span: int = None):
+        """Seekable reader of a gzip file.
+
+        Snapshots of the decompression state are taken every span bytes of decompressed data the first time they are
+        read. Seeking backwards, or far forward into data that was already read once, restarts the decompression from
+        the closest snapshot before the target instead of from the start of the file.
+
+        Args:
+            file (str): path of the gzip file.
+            span (int, optional): decompressed bytes between two snapshots. Defaults to None (_GZIP_SPAN).
+        """
+        self._file = open(file, "rb")
+        self._span = span or _GZIP_SPAN
+        # (decompressed offset, compressed offset, decompressor) at the boundaries of compressed chunks
+        self._snapshots = [(0, 0, zlib.decompressobj(_GZIP_WBITS))]
+        self._restore(0)
+
+    def _restore(self, snapshot: int):
+        self._out, self._in, decompressor = self._snapshots[snapshot]
+        self._decompressor = decompressor.copy()  # the snapshot can be restored again
+        self._file.seek(self._in)
+        # Last decompressed chunk, which ends at self._out, and position of the next byte to read in it
+        self._pending = b""
+        self._pendingOffset = 0
+        self._eof = False
+
+    def _advance(self) -> bytes:
+        """Decompress the next chunk of the file. Returns None at the end of the file."""
+        decompressor = self._decompressor
+        if decompressor.unconsumed_tail:
+            data = decompressor.unconsumed_tail
+        else:
+            data = decompressor.unused_data if decompressor.eof else b""
+            if not data:
+                data = self._file.read(_GZIP_CHUNK)
+                self._in += len(data)
+            if decompressor.eof:
+                if not data.startswith(b"\x1f\x8b"):
+                    # End of the last member, possibly followed by padding
+                    return None
+                decompressor = self._decompressor = zlib.decompressobj(_GZIP_WBITS)
+        output = decompressor.decompress(data, 16 * _GZIP_CHUNK)
+        if not data and not output and not decompressor.eof:
+            raise EOFError("Compressed file ended before the end-of-stream marker was reached.")
+        self._out += len(output)
+        if (
+            self._out >= self._snapshots[-1][0] + self._span
+            and not decompressor.unconsumed_tail
+            and not decompressor.eof
+        ):
+            self._snapshots.append((self._out, self._in, decompressor.copy()))
+        return output
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._out - len(self._pending) + self._pendingOffset
+
+    def _fill(self) -> int:
+        """Number of decompressed bytes available without decompressing more data, 0 at the end of the file."""
+        while self._pendingOffset == len(self._pending) and not self._eof:
+            output = self._advance()
+            if output is None:
+                self._eof = True
+            else:
+                self._pending = output
+                self._pendingOffset = 0
+        return len(self._pending) - self._pendingOffset
+
+    def readinto(self, buffer) -> int:
+        n = min(len(buffer), self._fill())
+        buffer[:n] = self._pending[self._pendingOffset : self._pendingOffset + n]
+        self._pendingOffset += n
+        return n
+
+    def read(self, size: int = -1) -> bytes:
+        # Reads are never short before the end of the file, as expected by tarfile
+        chunks = list()
+        while size != 0:
+            available = self._fill()
+            if available == 0:
+                break
+            n = available if size < 0 else min(size, available)
+            chunks.append(self._pending[self._pendingOffset : self._pendingOffset + n])
+            self._pendingOffset += n
+            if size > 0:
+                size -= n
+        return b"".join(chunks)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.tell()
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("Gzip files can not be seeked from their end.")
+        snapshot = bisect.bisect_right(self._snapshots, offset, key=lambda x: x[0]) - 1
+        if offset < self.tell() or self._snapshots[snapshot][0] > self.tell():
+            self._restore(snapshot)
+        # Decompress up to the target
+        while self.tell() < offset:
+            available = self._fill()
+            if available == 0:
+                break
+            self._pendingOffset += min(available, offset - self.tell())
+        return self.tell()
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+class _TarMember(io.RawIOBase):
+    def __init__(self, archive: "_Archive", member: tarfile.TarInfo):
+        """Stream of a regular member of a tar archive, read from the shared file object of the archive."""
+        self._archive = archive
+        self._offset = member.offset_data
+        self._size = member.size
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: self._size}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        n = max(0, min(len(buffer), self._size - self._position))
+        if n:
+            with self._archive._lock:
+                stream = self._archive._tar.fileobj
+                stream.seek(self._offset + self._position)
+                data = stream.read(n)
+            n = len(data)
+            buffer[:n] = data
+            self._position += n
+        return n
+
+
+class _Archive:
+    def __init__(self, archiveFile: str):
+        """Index of the members of a zip or tar archive."""
+        self.archiveFile = archiveFile
+        self._lock = threading.Lock()  # tar archives are read through a single file object
+        if archiveFile.lower().endswith(".zip"):
+            self._zip = zipfile.ZipFile(archiveFile)
+            self._tar = None
+            self._members = {_memberName(info.filename): info for info in self._zip.infolist()}
+            names = [(name, info.is_dir()) for name, info in self._members.items()]
+        else:
+            self._zip = None
+            if archiveFile.lower().endswith((".tar.gz", ".tgz")):
+                # Indexing the archive reads it once, taking the snapshots used to read its members
+                self._tar = tarfile.open(fileobj=_IndexedGzipFile(archiveFile), mode="r:")
+            else:
+                self._tar = tarfile.open(archiveFile, "r:*")
+            self._members = {_memberName(member.name): member for member in self._tar.getmembers()}
+            names = [(name, member.isdir()) for name, member in self._members.items()]
+
+        # Directories are not always stored as members: they are derived from the paths of the files
+        self.files = set()
+        self.children: dict[str, dict[str, None]] = {"": dict()}
+        for name, isDir in names:
+            if not name:
+                continue
+            parts = name.split("/")
+            for i in range(len(parts)):
+                parent = "/".join(parts[:i])
+                self.children.setdefault(parent, dict())[parts[i]] = None
+            if isDir:
+                self.children.setdefault(name, dict())
+            else:
+                self.files.add(name)
+
+    def open(self, member: str) -> IO[bytes]:
+        if self._zip is not None:
+            return self._zip.open(self._members[member])
+        info = self._members[member]
+        if info.isreg() and not info.sparse:
+            return io.BufferedReader(_TarMember(self, info), 2**20)
+        with self._lock:
+            return io.BytesIO(self._tar.extractfile(info).read())
+
+
+@lru_cache(maxsize=16)
+def _loadArchive(archiveFile: str, size: int, mtime: int, pid: int) -> _Archive:
+    # Keyed on the signature of the archive and on the process, as open file objects can not be shared after a fork
+    return _Archive(archiveFile)
+
+
+def _openArchive(archiveFile: str) -> _Archive:
+    stat = os.stat(archiveFile)
+    return _loadArchive(archiveFile, stat.st_size, stat.st_mtime_ns, os.getpid())
+
+
+def _findArchive(path: str) -> tuple[str, str]:
+    """Split a path into the archive containing it and its path in the archive. Returns None if not in an archive."""
+    parts = PurePath(path).parts
+    for i in range(1, len(parts) + 1):
+        candidate = os.path.join(*parts[:i])
+        if _isArchiveName(candidate) and os.path.isfile(candidate):
+            return candidate, "/".join(parts[i:])
+    return None
+
+
+class ArchivePath(type(PurePath())):
+    """Path of a file or folder inside a zip or tar archive, with a subset of the pathlib.Path interface."""
+
+    def _locate(self) -> tuple[_Archive, str]:
+        location = _findArchive(str(self))
+        if location is None:
+            raise FileNotFoundError(f"{self} is not in an archive.")
+        archiveFile, member = location
+        return _openArchive(archiveFile), member
+
+    def exists(self) -> bool:
+        archive, member = self._locate()
+        return member in archive.files or member in archive.children
+
+    def is_dir(self) -> bool:
+        archive, member = self._locate()
+        return member in archive.children
+
+    def is_file(self) -> bool:
+        archive, member = self._locate()
+        return member in archive.files
+
+    def iterdir(self) -> Iterator["ArchivePath"]:
+        archive, member = self._locate()
+        if member not in archive.children:
+            raise NotADirectoryError(str(self))
+        for name in archive.children[member]:
+            yield self / name
+
+    def _glob(self, archive: _Archive, member: str, pattern: list[str]) -> Iterator[str]:
+        if not pattern:
+            yield member
+            return
+        children = archive.children.get(member, dict())
+        if pattern[0] == "**":
+            yield from self._glob(archive, member, pattern[1:])
+            for name in children:
+                child = f"{member}/{name}" if member else name
+                if child in archive.children:
+                    yield from self._glob(archive, child, pattern)
+            return
+        for name in (x for x in children if fnmatch.fnmatchcase(x, pattern[0])):
+            child = f"{member}/{name}" if member else name
+            if len(pattern) == 1 or child in archive.children:
+                yield from self._glob(archive, child, pattern[1:])
+
+    def glob(self, pattern: str) -> Iterator["ArchivePath"]:
+        """Paths in this folder matching a glob pattern. ** matches any number of folders."""
+        archive, member = self._locate()
+        prefix = len(member) + 1 if member else 0
+        matches = dict.fromkeys(self._glob(archive, member, pattern.rstrip("/").split("/")))
+        for match in matches:
+            if match != member:
+                yield self / match[prefix:]
+
+    def rglob(self, pattern: str) -> Iterator["ArchivePath"]:
+        """Paths in this folder and its subfolders matching a glob pattern."""
+        return self.glob(f"**/{pattern}")
+
+    def open(self, mode: str = "r", encoding: str = None, newline: str = None) -> IO:
+        """Open a file of the archive for reading."""
+        if mode not in ("r", "rb", "rt"):
+            raise ValueError(f"Archive members can only be read, got mode {mode}.")
+        archive, member = self._locate()
+        if member not in archive.files:
+            raise FileNotFoundError(str(self))
+        stream = archive.open(member)
+        if mode == "rb":
+            return stream
+        return io.TextIOWrapper(stream, encoding=io.text_encoding(encoding), newline=newline)
+
+    def read_bytes(self) -> bytes:
+        with self.open("rb") as f:
+            return f.read()
+
+    def read_text(self, encoding: str = None) -> str:
+        with self.open("r", encoding=encoding) as f:
+            return f.read()
+
+
+def sourcePath(path: str) -> Path:
+    """Path object for a file or folder that may be inside an archive.
+
+    Args:
+        path (str): path of a file or folder. An archive is treated as a folder.
+
+    Returns:
+        Path: ArchivePath if the path is an archive or is inside an archive, pathlib.Path otherwise.
+    """
+    if isinstance(path, ArchivePath):
+        return path
+    path = os.fspath(path)
+    if os.path.exists(path) and not (_isArchiveName(path) and os.path.isfile(path)):
+        return Path(path)
+    if _findArchive(path) is not None:
+        return ArchivePath(path)
+    return Path(path)
+
+
+def sourceStat(source: str) -> os.stat_result:
+    """os.stat of a file, or of the archive containing it."""
+    path = sourcePath(source)
+    if isinstance(path, ArchivePath):
+        return os.stat(_findArchive(str(path))[0])
+    return os.stat(path)
+
+
+def openSource(source, mode: str = "rb") -> IO:
+    """Open a source file for reading.
+
+    Args:
+        source (str | Path | IO): path of a plain file, of a file inside an archive, or an open binary file object
+                                  (returned as is). Files ending with .gz are decompressed on the fly.
+        mode (str, optional): "rb" for a binary or "r" for a text file object. Defaults to "rb".
+
+    Returns:
+        IO: file object.
+    """
+    if hasattr(source, "read"):
+        return source
+    path = sourcePath(source)
+    if path.name.endswith(".gz") and not _isArchiveName(path.name):
+        stream = gzip.GzipFile(fileobj=path.open("rb")) if isinstance(path, ArchivePath) else gzip.open(path, "rb")
+        return stream if mode == "rb" else io.TextIOWrapper(stream)
+    return path.open(mode)
+
+
+def _isPlainFile(source) -> bool:
+    if not isinstance(source, (str, os.PathLike)) or isinstance(source, ArchivePath):
+        return False
+    path = os.fspath(source)
+    # Missing files are passed to the EDF library, which reports them
+    return not path.endswith(".gz") and (os.path.isfile(path) or _findArchive(path) is None)
+
+
+@contextlib.contextmanager
+def _inMemoryFile(source) -> Iterator[str]:
+    """Copy a source to an anonymous in-memory file and yield a path to it."""
+    if hasattr(os, "memfd_create"):
+        fd = os.memfd_create("edf")
+        path = f"/proc/self/fd/{fd}"
+    else:
+        fd, path = tempfile.mkstemp(suffix=".edf")
+    try:
+        with os.fdopen(os.dup(fd), "wb") as f:
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                f.write(source)
+            else:
+                with contextlib.ExitStack() as stack:
+                    stream = openSource(source)
+                    if stream is not source:
+                        stack.enter_context(stream)
+                    shutil.copyfileobj(stream, f, 2**20)
+        yield path
+    finally:
+        os.close(fd)
+        if not hasattr(os, "memfd_create"):
+            os.remove(path)
+
+
+@contextlib.contextmanager
+def _edfStream(source) -> Iterator[IO[bytes]]:
+    """Binary stream of an EDF source, positioned at the start of the file."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(source)
+    elif hasattr(source, "read"):
+        yield source
+    else:
+        with openSource(source) as stream:
+            yield stream
+
+
+def sourceEdfHeader(source) -> dict:
+    """Header of an EDF file, read from the first bytes of the source (see edfheader.readEdfHeader).
+
+    Args:
+        source (str | Path | bytes | IO): any source accepted by openEdf. File objects are consumed up to the end of
+                                          the header.
+
+    Returns:
+        dict: fields of the header.
+    """
+    with _edfStream(source) as stream:
+        return readEdfHeader(stream)
+
+
+def sourceEdfStart(source) -> tuple[datetime.datetime, float]:
+    """Start time and duration of an EDF recording, read from the first bytes of the source.
+
+    Args:
+        source (str | Path | bytes | IO): any source accepted by openEdf. File objects are consumed up to the end of
+                                          the first data record.
+
+    Returns:
+        tuple[datetime.datetime, float]: start of the recording and its duration in seconds.
+    """
+    with _edfStream(source) as stream:
+        return readEdfStart(stream)
+
+
+@contextlib.contextmanager
+def openEdf(source):
+    """Open an EDF file with pyedflib.
+
+    Args:
+        source (str | Path | bytes | IO): path of a plain EDF file, of an EDF file inside an archive or of an .edf.gz
+                                          file, content of an EDF file, or binary file object positioned at the start
+                                          of an EDF file.
+
+    Yields:
+        pyedflib.EdfReader: reader of the EDF file.
+    """
+    import pyedflib
+
+    if _isPlainFile(source):
+        with pyedflib.EdfReader(os.fspath(source)) as edf:
+            yield edf
+    else:
+        with _inMemoryFile(source) as path:
+            with pyedflib.EdfReader(path) as edf:
+                yield edf
@@ -0,0 +1,461 @@
+"""Offline validation of the subset of EEG-BIDS written by the converters.
+
+The following is checked without the reference BIDS validator:
+    - naming: every file not listed in .bidsignore is named after the BIDS entities of its folder.
+    - required files: dataset_description.json and README at the root of the dataset, and the _eeg.json sidecar and
+      _events.tsv file of every recording.
+    - sidecars: required fields of the _eeg.json sidecars and their consistency with the EDF header of the recording.
+    - events: columns and values of the _events.tsv files against the events.json sidecar that applies to them.
+    - participants: participants.tsv against participants.json and the subject folders.
+    - EDF headers: layout of the header, scaling of the signals and size of the file.
+
+Runs are checked in parallel by a pool of processes. Only the headers of the EDF files are read.
+"""
+
+import csv
+import functools
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from fnmatch import fnmatch
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .edfheader import EDF_ANNOTATIONS, readEdfHeader
+
+ERROR = "error"
+WARNING = "warning"
+
+# Maximum number of rows listed in the message of an issue
+_MAX_DETAILS = 10
+
+_LABEL = "[a-zA-Z0-9]+"
+_RUN_FILE_REGEX = re.compile(
+    rf"^sub-(?P<subject>{_LABEL})(_ses-(?P<session>{_LABEL}))?_task-(?P<task>{_LABEL})(_acq-{_LABEL})?"
+    rf"(_run-(?P<run>[0-9]+))?_(?P<suffix>[a-zA-Z]+)\.(?P<extension>[a-zA-Z0-9.]+)$"
+)
+_SIDECAR_REGEX = re.compile(rf"^((?:(?:sub|ses|task|acq|run)-{_LABEL}_)*)(?P<suffix>eeg|events|channels)\.json$")
+# Files of a run in an eeg folder
+_RUN_FILES = {("eeg", "edf"), ("eeg", "json"), ("events", "tsv"), ("events", "json"), ("channels", "tsv")}
+_ROOT_FILES = {
+    "dataset_description.json",
+    "README",
+    "README.md",
+    "README.rst",
+    "README.txt",
+    "CHANGES",
+    "LICENSE",
+    "participants.tsv",
+    "participants.json",
+}
+# Folders at the root of a dataset whose content is not validated
+_SKIPPED_FOLDERS = {"code", "derivatives", "sourcedata", "stimuli", "phenotype"}
+
+_EEG_REQUIRED_FIELDS = ("TaskName", "EEGReference", "SamplingFrequency", "PowerLineFrequency", "SoftwareFilters")
+_NUMERIC_EVENT_COLUMNS = ("onset", "duration", "confidence", "recordingDuration")
+
+
+def _entities(name: str) -> dict:
+    """BIDS entities (key-value pairs) of a file name."""
+    return dict(x.split("-", 1) for x in name.split("_")[:-1] if "-" in x)
+
+
+def _ignorePatterns(root: Path) -> list[str]:
+    bidsIgnore = root / ".bidsignore"
+    if not bidsIgnore.exists():
+        return []
+    lines = [x.strip() for x in bidsIgnore.read_text().splitlines()]
+    return [x for x in lines if x and not x.startswith("#")]
+
+
+def _isIgnored(relPath: str, patterns: list[str]) -> bool:
+    """Whether a file matches a .bidsignore pattern. Patterns without a slash match a name at any level."""
+    parts = relPath.split("/")
+    for pattern in patterns:
+        anchored = "/" in pattern.rstrip("/")
+        pattern = pattern.strip("/")
+        for i in range(len(parts)):
+            if fnmatch("/".join(parts[: i + 1]) if anchored else parts[i], pattern):
+                return True
+    return False
+
+
+def _listFiles(root: Path) -> list[str]:
+    """Files of a dataset relative to its root, without hidden files and skipped folders."""
+    files = list()
+    for folder, folders, names in os.walk(root):
+        relFolder = Path(folder).relative_to(root).as_posix()
+        folders[:] = [
+            x for x in folders if not x.startswith(".") and not (relFolder == "." and x in _SKIPPED_FOLDERS)
+        ]
+        prefix = "" if relFolder == "." else f"{relFolder}/"
+        files += [prefix + x for x in names if not x.startswith(".")]
+    return sorted(files)
+
+
+def _nameIssue(relPath: str) -> str:
+    """Reason why a file does not follow the BIDS naming of its folder, None if it does."""
+    *folders, name = relPath.split("/")
+    if not folders:
+        match = _SIDECAR_REGEX.match(name)
+        if name in _ROOT_FILES or (match and not _entities(name).keys() & {"sub", "ses"}):
+            return None
+        return "unknown file at the root of the dataset"
+
+    # sub-<label>[/ses-<label>][/eeg]
+    folderEntities = dict()
+    for key, folder in zip(("sub", "ses"), folders):
+        if not re.fullmatch(rf"{key}-{_LABEL}", folder):
+            break
+        folderEntities[key] = folder.split("-", 1)[1]
+    remaining = folders[len(folderEntities) :]
+    if "sub" not in folderEntities or remaining not in ([], ["eeg"]):
+        return "unknown folder"
+    entities = _entities(name)
+    if {key: entities.get(key) for key in ("sub", "ses")} != {"sub": None, "ses": None} | folderEntities:
+        return "subject or session of the file name does not match its folder"
+
+    if remaining == ["eeg"]:
+        match = _RUN_FILE_REGEX.match(name)
+        if match is None or (match.group("suffix"), match.group("extension")) not in _RUN_FILES:
+            return "not a file of an EEG run"
+        return None
+    if _SIDECAR_REGEX.match(name):
+        return None
+    if name.endswith(("_scans.tsv", "_scans.json")) and ("ses" in folderEntities or len(folders) == 1):
+        return None
+    if name.endswith(("_sessions.tsv", "_sessions.json")) and len(folders) == 1:
+        return None
+    return "unknown file in a subject or session folder"
+
+
+@functools.lru_cache(maxsize=4096)
+def _listDir(folder: Path) -> tuple[str]:
+    try:
+        return tuple(sorted(os.listdir(folder)))
+    except OSError:
+        return tuple()
+
+
+@functools.lru_cache(maxsize=4096)
+def _loadJson(file: Path) -> dict:
+    with open(file, "r") as f:
+        content = json.load(f)
+    if not isinstance(content, dict):
+        raise ValueError(f"{file} is not a JSON object")
+    return content
+
+
+def _inheritedSidecar(root: Path, relPath: str, suffix: str) -> dict:
+    """Merge the JSON sidecars that apply to a file of a run, from the root of the dataset to the folder of the run.
+
+    Args:
+        root (Path): root folder of the dataset.
+        relPath (str): path of the file relative to the root.
+        suffix (str): suffix of the sidecars (eeg, events).
+
+    Raises:
+        ValueError: raised if an applicable sidecar is not a valid JSON object.
+    """
+    *folders, name = relPath.split("/")
+    entities = _entities(name)
+    sidecar = dict()
+    for i in range(len(folders) + 1):
+        folder = root.joinpath(*folders[:i])
+        for candidate in _listDir(folder):
+            match = _SIDECAR_REGEX.match(candidate)
+            if match is None or match.group("suffix") != suffix:
+                continue
+            if _entities(candidate).items() <= entities.items():
+                sidecar = sidecar | _loadJson(folder / candidate)
+    return sidecar
+
+
+def _readTsv(file: Path) -> list[list[str]]:
+    with open(file, "r", newline="") as f:
+        return [row for row in csv.reader(f, delimiter="\t") if row]
+
+
+def _rowsIssue(file: str, severity: str, code: str, message: str, rows: list[int]) -> tuple:
+    """Issue covering several rows of a TSV file, listing the first of them."""
+    listed = ", ".join(str(x) for x in rows[:_MAX_DETAILS])
+    more = f" and {len(rows) - _MAX_DETAILS} more" if len(rows) > _MAX_DETAILS else ""
+    return (file, severity, code, f"{message} (rows {listed}{more})")
+
+
+def _checkColumns(relPath: str, rows: list[list[str]], schema: dict, numeric: list[str]) -> list[tuple]:
+    """Check the values of the columns of a TSV file against its JSON sidecar."""
+    issues = list()
+    header = rows[0]
+    badLength = [i for i, row in enumerate(rows[1:], 1) if len(row) != len(header)]
+    if badLength:
+        issues.append(_rowsIssue(relPath, ERROR, "TSV_ROW_LENGTH", "rows differ in length from the header", badLength))
+    for j, column in enumerate(header):
+        values = [(i, row[j]) for i, row in enumerate(rows[1:], 1) if j < len(row)]
+        description = schema.get(column)
+        if not isinstance(description, dict):
+            if column not in ("onset", "duration", "participant_id"):
+                issues.append((relPath, WARNING, "UNDESCRIBED_COLUMN", f"column {column} is not described"))
+            description = dict()
+        if column in numeric or "Units" in description:
+            invalid = list()
+            for i, value in values:
+                if value == "n/a" and column != "onset":
+                    continue
+                try:
+                    number = float(value)
+                except ValueError:
+                    invalid.append(i)
+                    continue
+                if np.isnan(number) or (column in ("onset", "duration") and number < 0):
+                    invalid.append(i)
+                elif column == "confidence" and not 0 <= number <= 1:
+                    invalid.append(i)
+            if invalid:
+                issues.append(_rowsIssue(relPath, ERROR, "INVALID_VALUE", f"invalid values of {column}", invalid))
+        if isinstance(description.get("Levels"), dict):
+            unknown = [i for i, value in values if value != "n/a" and value not in description["Levels"]]
+            if unknown:
+                issues.append(
+                    _rowsIssue(relPath, ERROR, "UNKNOWN_LEVEL", f"values of {column} are not in its Levels", unknown)
+                )
+    return issues
+
+
+def _checkEvents(root: Path, relPath: str, recordingDuration: float) -> list[tuple]:
+    """Check an _events.tsv file against the events.json sidecar that applies to it."""
+    try:
+        schema = _inheritedSidecar(root, relPath, "events")
+    except ValueError as e:
+        return [(relPath, ERROR, "INVALID_JSON", f"events sidecar: {e}")]
+    rows = _readTsv(root / relPath)
+    if not rows or rows[0][:2] != ["onset", "duration"]:
+        return [(relPath, ERROR, "EVENTS_COLUMNS", "the first columns must be onset and duration")]
+    issues = _checkColumns(relPath, rows, schema, _NUMERIC_EVENT_COLUMNS)
+    if recordingDuration is not None:
+        outside = list()
+        for i, row in enumerate(rows[1:], 1):
+            try:
+                if float(row[0]) > recordingDuration:
+                    outside.append(i)
+            except ValueError:
+                continue
+        if outside:
+            issues.append(
+                _rowsIssue(relPath, WARNING, "EVENT_OUTSIDE_RECORDING", "events start after the recording", outside)
+            )
+    return issues
+
+
+def _checkEdf(root: Path, relPath: str) -> tuple[list[tuple], dict]:
+    """Check the header of an EDF file.
+
+    Returns:
+        tuple[list[tuple], dict]: issues and properties of the recording (fs, numChannels, duration, recordDuration),
+                                  None if the header can not be parsed.
+    """
+    edfFile = root / relPath
+    try:
+        header = readEdfHeader(edfFile)
+    except (ValueError, IndexError) as e:
+        return [(relPath, ERROR, "EDF_HEADER", f"header can not be parsed: {e}")], None
+    issues = list()
+    labels = header["labels"]
+    numSignals = len(labels)
+    if header["version"] != "0":
+        issues.append((relPath, ERROR, "EDF_HEADER", f"version is {header['version']!r} instead of '0'"))
+    if header["headerBytes"] != 256 * (numSignals + 1):
+        issues.append((relPath, ERROR, "EDF_HEADER", f"header size {header['headerBytes']} for {numSignals} signals"))
+    if header["numRecords"] < 0 or header["recordDuration"] <= 0:
+        issues.append((relPath, ERROR, "EDF_HEADER", "unknown number of data records or record duration"))
+    elif os.path.getsize(edfFile) != header["headerBytes"] + header["numRecords"] * header["recordBytes"]:
+        issues.append((relPath, ERROR, "EDF_SIZE", "file size does not match the number of data records"))
+    if len(set(labels)) != numSignals:
+        issues.append((relPath, ERROR, "EDF_HEADER", "signal labels are not unique"))
+
+    data = np.array([x != EDF_ANNOTATIONS for x in labels], dtype=bool)
+    badScaling = [
+        label
+        for label, physicalMin, physicalMax, digitalMin, digitalMax in zip(
+            labels, header["physicalMin"], header["physicalMax"], header["digitalMin"], header["digitalMax"]
+        )
+        if not (physicalMin < physicalMax and digitalMin < digitalMax)
+    ]
+    if badScaling:
+        issues.append((relPath, ERROR, "EDF_SCALING", f"invalid physical or digital range of {badScaling}"))
+    if header["recordDuration"] <= 0:
+        return issues, None
+    frequencies = set((header["samplesPerRecord"][data] / header["recordDuration"]).tolist())
+    if len(frequencies) > 1:
+        issues.append((relPath, WARNING, "EDF_SAMPLING", f"signals have different sampling frequencies {frequencies}"))
+    recording = {
+        "fs": frequencies.pop() if len(frequencies) == 1 else None,
+        "numChannels": int(data.sum()),
+        "duration": header["numRecords"] * header["recordDuration"],
+        "recordDuration": header["recordDuration"],
+    }
+    return issues, recording
+
+
+def _checkRun(root: Path, recording: str, files: set) -> list[tuple]:
+    base = recording[: recording.rindex("_eeg.")]
+    sidecarFile = f"{base}_eeg.json"
+    eventsFile = f"{base}_events.tsv"
+    issues = list()
+    recordingDuration = None
+    edf = None
+    if recording.endswith(".edf"):
+        edfIssues, edf = _checkEdf(root, recording)
+        issues += edfIssues
+        if edf is not None:
+            recordingDuration = edf["duration"]
+
+    if sidecarFile not in files:
+        issues.append((recording, ERROR, "MISSING_SIDECAR", f"{sidecarFile} is missing"))
+    else:
+        try:
+            sidecar = _inheritedSidecar(root, sidecarFile, "eeg")
+        except ValueError as e:
+            sidecar = None
+            issues.append((sidecarFile, ERROR, "INVALID_JSON", str(e)))
+        if sidecar is not None:
+            missing = [x for x in _EEG_REQUIRED_FIELDS if x not in sidecar]
+            if missing:
+                issues.append((sidecarFile, ERROR, "MISSING_FIELD", f"required fields {missing} are missing"))
+            task = _RUN_FILE_REGEX.match(sidecarFile.split("/")[-1]).group("task")
+            if "TaskName" in sidecar and sidecar["TaskName"] != task:
+                issues.append((sidecarFile, ERROR, "TASK_NAME", f"TaskName {sidecar['TaskName']!r} is not {task!r}"))
+            if edf is not None:
+                for field, value, tolerance in (
+                    ("SamplingFrequency", edf["fs"], 1e-6),
+                    ("EEGChannelCount", edf["numChannels"], 0),
+                    ("RecordingDuration", edf["duration"], edf["recordDuration"]),
+                ):
+                    if field in sidecar and value is not None and abs(float(sidecar[field]) - value) > tolerance:
+                        issues.append(
+                            (sidecarFile, ERROR, "SIDECAR_MISMATCH", f"{field} {sidecar[field]} != {value} in EDF")
+                        )
+            elif isinstance(sidecar.get("RecordingDuration"), (int, float)):
+                recordingDuration = sidecar["RecordingDuration"]
+
+    if eventsFile not in files:
+        issues.append((recording, ERROR, "MISSING_EVENTS", f"{eventsFile} is missing"))
+    else:
+        issues += _checkEvents(root, eventsFile, recordingDuration)
+    return issues
+
+
+def _checkRuns(args: tuple) -> list[tuple]:
+    """Check a batch of runs. Used as a unit of work by the process pool."""
+    root, recordings, files = args
+    return [x for recording in recordings for x in _checkRun(root, recording, files)]
+
+
+def _checkParticipants(root: Path, subjects: set) -> list[tuple]:
+    participantsFile = "participants.tsv"
+    if not (root / participantsFile).exists():
+        return [(participantsFile, WARNING, "MISSING_FILE", "participants.tsv is missing")]
+    rows = _readTsv(root / participantsFile)
+    if not rows or rows[0][0] != "participant_id":
+        return [(participantsFile, ERROR, "PARTICIPANTS_COLUMNS", "the first column must be participant_id")]
+    try:
+        schema = _loadJson(root / "participants.json") if (root / "participants.json").exists() else dict()
+    except ValueError as e:
+        return [("participants.json", ERROR, "INVALID_JSON", str(e))]
+    issues = _checkColumns(participantsFile, rows, schema, [])
+
+    ids = [row[0] for row in rows[1:]]
+    invalid = [i for i, x in enumerate(ids, 1) if not re.fullmatch(rf"sub-{_LABEL}", x)]
+    if invalid:
+        issues.append(_rowsIssue(participantsFile, ERROR, "INVALID_VALUE", "invalid participant_id", invalid))
+    duplicates = sorted({x for x in ids if ids.count(x) > 1})
+    if duplicates:
+        issues.append((participantsFile, ERROR, "DUPLICATE_PARTICIPANT", f"{duplicates} are listed more than once"))
+    missing = sorted(subjects - set(ids))
+    if missing:
+        issues.append((participantsFile, ERROR, "PARTICIPANT_MISSING", f"subjects {missing} are not listed"))
+    withoutData = sorted(set(ids) - subjects)
+    if withoutData:
+        issues.append((participantsFile, WARNING, "PARTICIPANT_WITHOUT_DATA", f"{withoutData} have no folder"))
+    return issues
+
+
+def _checkDescription(root: Path, files: list[str]) -> list[tuple]:
+    descriptionFile = "dataset_description.json"
+    issues = list()
+    if descriptionFile not in files:
+        issues.append((descriptionFile, ERROR, "MISSING_FILE", f"{descriptionFile} is missing"))
+    else:
+        try:
+            description = _loadJson(root / descriptionFile)
+            missing = [x for x in ("Name", "BIDSVersion") if x not in description]
+            if missing:
+                issues.append((descriptionFile, ERROR, "MISSING_FIELD", f"required fields {missing} are missing"))
+        except ValueError as e:
+            issues.append((descriptionFile, ERROR, "INVALID_JSON", str(e)))
+    if not any(x.startswith("README") and "/" not in x for x in files):
+        issues.append(("README", ERROR, "MISSING_FILE", "README is missing"))
+    return issues
+
+
+def validateDataset(root: Path, numWorkers: int = None, batchSize: int = 256) -> pd.DataFrame:
+    """Validate a converted BIDS dataset without the reference BIDS validator.
+
+    Args:
+        root (Path): root folder of the BIDS dataset.
+        numWorkers (int, optional): number of worker processes. Defaults to None (number of CPUs).
+        batchSize (int, optional): number of runs checked by a worker at once. Defaults to 256.
+
+    Returns:
+        pd.DataFrame: one row per issue with columns file (relative path), severity (error or warning), code and
+                      message. The dataset is valid if no issue is an error.
+    """
+    root = Path(root)
+    # Both caches are only valid for the current state of the dataset
+    _listDir.cache_clear()
+    _loadJson.cache_clear()
+    files = _listFiles(root)
+    fileSet = set(files)
+    patterns = _ignorePatterns(root)
+
+    issues = _checkDescription(root, files)
+    recordings = list()
+    for file in files:
+        ignored = _isIgnored(file, patterns)
+        if not ignored:
+            reason = _nameIssue(file)
+            if reason is not None:
+                issues.append((file, ERROR, "INVALID_NAME", reason))
+                continue
+        match = _RUN_FILE_REGEX.match(file.split("/")[-1])
+        # Recordings in formats listed in .bidsignore still need their sidecar and events
+        if match and file.split("/")[-2:-1] == ["eeg"] and match.group("suffix") == "eeg":
+            if match.group("extension") != "json":
+                recordings.append(file)
+    runs = {x[: x.rindex("_eeg.")] for x in recordings}
+    for file in files:
+        for suffix in ("_eeg.json", "_events.tsv"):
+            if file.endswith(suffix) and file[: -len(suffix)] not in runs and not _isIgnored(file, patterns):
+                issues.append((file, ERROR, "ORPHAN_FILE", "no recording for this file"))
+    subjects = {x.split("/")[0] for x in files if "/" in x and x.startswith("sub-")}
+    issues += _checkParticipants(root, subjects)
+
+    # Only the files of the runs of a batch are sent to the workers
+    batches = list()
+    for i in range(0, len(recordings), batchSize):
+        batch = recordings[i : i + batchSize]
+        bases = {x[: x.rindex("_eeg.")] for x in batch}
+        batchFiles = {f"{base}{suffix}" for base in bases for suffix in ("_eeg.json", "_events.tsv")}
+        batches.append((root, batch, batchFiles & fileSet))
+    if numWorkers == 1 or len(batches) <= 1:
+        results = [_checkRuns(x) for x in batches]
+    else:
+        with ProcessPoolExecutor(numWorkers or os.cpu_count()) as executor:
+            results = list(executor.map(_checkRuns, batches))
+    issues += [x for batchIssues in results for x in batchIssues]
+
+    report = pd.DataFrame(issues, columns=["file", "severity", "code", "message"])
+    return report.sort_values(["file", "code"], ignore_index=True, kind="stable")
@@ -0,0 +1,213 @@
+"""Incremental ingestion of a source folder into an existing BIDS dataset.
+
+The source folder is polled, without any OS-specific notification mechanism. Files are compared on their size and
+modification time with the files converted so far, which are recorded in a state file at the root of the BIDS dataset.
+New or modified recordings and annotation files are converted by the dataset converter restricted to the recordings
+they affect (see SelectionOptions.include). The converter also rewrites participants.tsv from the subjects of the BIDS
+dataset and replaces the rows of the converted runs in the consolidated events table.
+
+Run labels depend on the order of the recordings of a folder: a new recording also affects the recordings sorted after
+it in its folder, which are converted again. Removed source files are forgotten but their runs are kept in the BIDS
+dataset.
+"""
+
+import fnmatch
+import glob
+import json
+import os
+import time
+from pathlib import Path, PurePosixPath
+from typing import Callable
+
+from .bids.convert2bids import DEFAULT_SELECTION_OPTIONS
+
+# State of the watched source folder, written at the root of the BIDS dataset
+WATCH_STATE = ".epilepsy2bids_watch.json"
+_STATE_VERSION = 1
+
+
+class FolderWatcher:
+    def __init__(
+        self,
+        convert: Callable,
+        root: Path,
+        outDir: Path,
+        interval: float = 60,
+        settleTime: float = 60,
+        runFolderDepth: int = 1,
+        stateFile: Path = WATCH_STATE,
+        **kwargs,
+    ):
+        """Watch a source folder and convert the recordings that arrive in it to an existing BIDS dataset.
+
+        Args:
+            convert (Callable): convert() function of the dataset (e.g. epilepsy2bids.bids.siena.convert2bids.convert).
+            root (Path): root folder of the source dataset.
+            outDir (Path): root folder of the BIDS output.
+            interval (float, optional): time between two polls, in seconds. Defaults to 60.
+            settleTime (float, optional): files whose size or modification time changed during the last settleTime
+                                          seconds are still being written and are left for a later poll. Defaults to
+                                          60.
+            runFolderDepth (int, optional): depth below root of the folders in which the converter numbers runs, 1 for
+                                            subject folders (CHB-MIT, SeizeIT, Siena), 3 for session folders (TUH).
+                                            Defaults to 1.
+            stateFile (Path, optional): path of the state file, relative to outDir. Defaults to WATCH_STATE.
+            **kwargs: conversion options forwarded to convert (e.g. segments, labels, select).
+        """
+        self.convert = convert
+        self.root = Path(root)
+        self.outDir = Path(outDir)
+        self.interval = interval
+        self.settleTime = settleTime
+        self.runFolderDepth = runFolderDepth
+        self.stateFile = self.outDir / stateFile
+        self.kwargs = kwargs
+        self.converted = self._loadState()
+        # Signature of the changed files and time since which it did not change
+        self._pending = dict()
+
+    def _loadState(self) -> dict:
+        try:
+            with open(self.stateFile, "r") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return dict()
+        if not isinstance(state, dict) or state.get("version") != _STATE_VERSION:
+            return dict()
+        return {key: tuple(value) for key, value in state["files"].items()}
+
+    def _saveState(self):
+        os.makedirs(self.outDir, exist_ok=True)
+        # Written to a temporary file first so that an interrupted watcher never leaves a truncated state
+        tmpFile = self.stateFile.with_name(self.stateFile.name + ".tmp")
+        with open(tmpFile, "w") as f:
+            json.dump({"version": _STATE_VERSION, "files": self.converted}, f)
+        os.replace(tmpFile, self.stateFile)
+
+    def scan(self) -> dict[str, tuple[int, int]]:
+        """Signatures of the files of the source folder.
+
+        Returns:
+            dict[str, tuple[int, int]]: size and modification time (in ns) of each file, by path relative to root.
+        """
+        files = dict()
+        for folder, folders, names in os.walk(self.root):
+            folders[:] = [x for x in folders if not x.startswith(".")]
+            for name in names:
+                if name.startswith("."):
+                    continue
+                path = Path(folder) / name
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    # Removed since the folder was listed
+                    continue
+                files[path.relative_to(self.root).as_posix()] = (stat.st_size, stat.st_mtime_ns)
+        return files
+
+    def markConverted(self):
+        """Record all files of the source folder as converted, for a BIDS dataset converted before it is watched."""
+        self.converted = self.scan()
+        self._saveState()
+
+    def changes(self, files: dict[str, tuple[int, int]]) -> list[str]:
+        """Files that are new or modified since they were converted and that are no longer being written.
+
+        A file is no longer being written once its signature did not change for settleTime seconds, as observed by
+        successive calls. Modification times are not compared with the clock as copies often preserve them.
+
+        Args:
+            files (dict[str, tuple[int, int]]): signatures of the files of the source folder (see scan).
+
+        Returns:
+            list[str]: paths of the files relative to root.
+        """
+        now = time.monotonic()
+        pending = dict()
+        for path, signature in files.items():
+            if self.converted.get(path) == signature:
+                continue
+            previous = self._pending.get(path)
+            pending[path] = (signature, previous[1] if previous and previous[0] == signature else now)
+        self._pending = pending
+        return sorted(path for path, (_, since) in pending.items() if now - since >= self.settleTime)
+
+    def affectedRecordings(self, changed: list[str], files: dict[str, tuple[int, int]]) -> list[str]:
+        """Recordings to convert again after some files changed.
+
+        A recording is affected if it changed, if an annotation file next to it changed or, for a new recording (or
+        any changed recording when segments are converted), if it is sorted after a changed recording of the same run
+        folder. Annotation files that do not share the name of a recording affect all recordings of their folder. Files
+        at the root of the source folder (e.g. subject information) do not affect any recording.
+
+        Args:
+            changed (list[str]): changed files, relative to root.
+            files (dict[str, tuple[int, int]]): signatures of the files of the source folder (see scan).
+
+        Returns:
+            list[str]: paths of the affected recordings relative to root, in the order of the converter.
+        """
+        recordings = sorted(PurePosixPath(x) for x in files if x.lower().endswith(".edf"))
+        affected = set()
+        for path in map(PurePosixPath, changed):
+            if path.suffix.lower() == ".edf":
+                affected.add(path)
+                if path.as_posix() in self.converted and self.kwargs.get("segments") is None:
+                    continue
+                # Runs of the recordings sorted after a new recording are shifted
+                scope = path.parts[: min(self.runFolderDepth, len(path.parts) - 1)]
+                affected.update(x for x in recordings if x.parts[: len(scope)] == scope and x > path)
+            elif len(path.parts) > 1:
+                siblings = [x for x in recordings if x.parent == path.parent]
+                matching = [x for x in siblings if path.name.startswith((f"{x.stem}.", f"{x.stem}_"))]
+                affected.update(matching or siblings)
+        return [x.as_posix() for x in sorted(affected)]
+
+    def poll(self) -> list[str]:
+        """Convert the changes of the source folder since the last poll.
+
+        Returns:
+            list[str]: recordings that were converted, relative to root.
+        """
+        files = self.scan()
+        changed = self.changes(files)
+        removed = [x for x in self.converted if x not in files]
+        if not changed:
+            if removed:
+                self.converted = {key: value for key, value in self.converted.items() if key in files}
+                self._saveState()
+            return []
+
+        recordings = self.affectedRecordings(changed, files)
+        select = DEFAULT_SELECTION_OPTIONS | (self.kwargs.get("select") or {})
+        if select["include"] is not None:
+            recordings = [x for x in recordings if any(fnmatch.fnmatch(x, y) for y in select["include"])]
+        # Without any recording only the metadata of the dataset is written again
+        select["include"] = [glob.escape(x) for x in recordings]
+        self.convert(self.root, self.outDir, **(self.kwargs | {"select": select}))
+
+        self.converted = {key: value for key, value in self.converted.items() if key in files}
+        self.converted.update({path: files[path] for path in changed})
+        self._saveState()
+        return recordings
+
+    def run(self, maxPolls: int = None):
+        """Poll the source folder until interrupted.
+
+        Errors of a conversion are reported and the files are converted again at the next poll.
+
+        Args:
+            maxPolls (int, optional): number of polls after which the watcher stops. Defaults to None (never stops).
+        """
+        numPolls = 0
+        while maxPolls is None or numPolls < maxPolls:
+            if numPolls:
+                time.sleep(self.interval)
+            numPolls += 1
+            try:
+                recordings = self.poll()
+            except Exception as e:
+                print(f"Conversion of the changes of {self.root} failed: {e!r}")
+                continue
+            if recordings:
+                print(f"Converted {len(recordings)} recordings of {self.root}")
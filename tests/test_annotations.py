@@ -23,6 +23,29 @@ class TestAnnotations(unittest.TestCase):
         self.assertEqual(len(test.events), len(annotations.events))
         np.testing.assert_array_equal(test.getMask(1), annotations.getMask(1))
         Path("test.tsv").unlink()
+    def test_crop(self):
+        annotations = Annotations.loadTsv("tests/sample.tsv")
+        cropped = annotations.crop(300, 200)
+        self.assertEqual(len(cropped.events), 1)
+        self.assertAlmostEqual(cropped.events[0]["onset"], 4.56)
+        self.assertAlmostEqual(cropped.events[0]["duration"], 121.14)
+        self.assertEqual(cropped.events[0]["recordingDuration"], 200)
+        np.testing.assert_array_equal(
+            cropped.getMask(1), annotations.getMask(1)[300:500]
+        )
+        # Window without seizure
+        background = annotations.crop(2000, 100)
+        self.assertEqual(len(background.events), 1)
+        self.assertEqual(len(background.getEvents()), 0)
+
+    def test_toDataFrame(self):
+        annotations = Annotations.loadTsv("tests/sample.tsv")
+        df = annotations.toDataFrame()
+        self.assertEqual(len(df), 3)
+        self.assertListEqual(list(df["eventType"]), ["sz", "sz", "sz"])
+        self.assertTrue(np.isnan(df["confidence"][1]))
+        np.testing.assert_allclose(df["onset"], [36.89, 304.56, 1023.45])
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
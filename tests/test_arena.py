@@ -0,0 +1,83 @@
+"""Buffer arena unit testing"""
+
+import tempfile
+import unittest
+from importlib import resources as impresources
+from pathlib import Path
+
+import numpy as np
+
+from epilepsy2bids.arena import BufferArena
+from epilepsy2bids.bids.siena.convert2bids import convert as convertSiena
+from epilepsy2bids.eeg import Eeg
+
+TEST_DIR = impresources.files("tests") / "data"
+
+
+class TestArena(unittest.TestCase):
+    def test_arena(self):
+        arena = BufferArena(maxBytes=2**20)
+        a = arena.empty((4, 100))
+        self.assertEqual(a.shape, (4, 100))
+        self.assertTrue(a.flags["C_CONTIGUOUS"])
+        arena.release(a[1:])
+        # Released buffer is reused by a smaller request of another type
+        b = arena.zeros((10, 10), np.float32)
+        self.assertTrue(np.shares_memory(a, b))
+        self.assertFalse(np.any(b))
+        c = arena.empty((4, 100))
+        self.assertFalse(np.shares_memory(b, c))
+        self.assertDictEqual(arena.stats(), {"hits": 1, "misses": 2, "buffers": 0, "bytes": 0})
+
+        # Foreign arrays and buffers released twice are ignored
+        arena.release(np.zeros(10))
+        arena.release(b)
+        arena.release(b)
+        self.assertEqual(arena.stats()["buffers"], 1)
+
+        # Released buffers are kept within the budget
+        arena.release(c)
+        arena.release(arena.empty((2**18,)))
+        self.assertLessEqual(arena.stats()["bytes"], 2**20)
+        arena.clear()
+        self.assertEqual(arena.stats()["buffers"], 0)
+
+    def test_loadEdf(self):
+        arena = BufferArena()
+        for electrodes in (None, ["Fp1", "Missing", "Cz"], Eeg.ELECTRODES_10_20):
+            expected = Eeg.loadEdf("tests/PN00-5_sample.edf", Eeg.Montage.UNIPOLAR, electrodes, 0.5, 1)
+            eeg = Eeg.loadEdf("tests/PN00-5_sample.edf", Eeg.Montage.UNIPOLAR, electrodes, 0.5, 1, arena)
+            self.assertListEqual(eeg.channels, expected.channels)
+            np.testing.assert_array_equal(eeg.data, expected.data)
+            arena.release(eeg.data)
+        self.assertGreater(arena.stats()["hits"], 0)
+
+        for reference in ("Avg", "bipolar"):
+            expected = Eeg.loadEdf("tests/PN00-5_sample.edf")
+            expected.standardize(128, reference=reference)
+            eeg = Eeg.loadEdf("tests/PN00-5_sample.edf", arena=arena)
+            eeg.standardize(128, reference=reference, arena=arena)
+            self.assertSequenceEqual(eeg.channels, expected.channels)
+            np.testing.assert_array_equal(eeg.data, expected.data)
+
+    def test_convertArena(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            arena = BufferArena()
+            convertSiena(TEST_DIR / "siena", Path(tmpDir) / "reference")
+            convertSiena(
+                TEST_DIR / "siena",
+                Path(tmpDir) / "arena",
+                arena=arena,
+                targets=[{"outDir": Path(tmpDir) / "bipolar", "reference": "bipolar"}],
+            )
+            edfFiles = sorted(x.relative_to(Path(tmpDir, "reference")) for x in Path(tmpDir, "reference").rglob("*.edf"))
+            self.assertGreater(len(edfFiles), 0)
+            for edfFile in edfFiles:
+                self.assertEqual(
+                    Path(tmpDir, "arena", edfFile).read_bytes(), Path(tmpDir, "reference", edfFile).read_bytes()
+                )
+            self.assertGreater(arena.stats()["hits"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
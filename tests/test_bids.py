@@ -1,16 +1,26 @@
 from importlib import resources as impresources
 import json
+import os
 import re
-from shutil import rmtree
+from pathlib import Path
+from shutil import copytree, rmtree
 import subprocess
+import tempfile
 import unittest
+from unittest import mock
 
+import pandas as pd
 from termcolor import cprint
 
+from epilepsy2bids.annotations import Annotations
 from epilepsy2bids.bids.chbmit.convert2bids import convert as convertChbmit
 from epilepsy2bids.bids.seizeit.convert2bids import convert as convertSeizeit
 from epilepsy2bids.bids.siena.convert2bids import convert as convertSiena
 from epilepsy2bids.bids.tuh.convert2bids import convert as convertTuh
+from epilepsy2bids.eeg import Eeg, FileFormat
+from epilepsy2bids.labels import loadLabels
+from epilepsy2bids.load_annotations.siena import loadAnnotationsFromEdf as loadSienaAnnotations
+from epilepsy2bids.scoring import loadEventsTable
 
 TEST_DIR = impresources.files("tests") / "data"
 
@@ -22,11 +32,170 @@ class TestConvert(unittest.TestCase):
             (convertChbmit, convertSeizeit, convertSiena, convertTuh),
         ):
             convert(TEST_DIR / dataset, TEST_DIR / "bids" / dataset)
+            # Consolidated events table matches the events files
+            eventsTable = loadEventsTable(TEST_DIR / "bids" / dataset)
+            self.assertEqual(
+                len(eventsTable),
+                len(loadEventsTable(TEST_DIR / "bids" / dataset, consolidated=False)),
+            )
             rmtree(TEST_DIR / "bids" / dataset)
             cprint(
                 f"Successfully converted {dataset.upper()} to BIDS.", "green", attrs=["bold"]
             )
 
+    def test_staleEventsTable(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            convertSiena(TEST_DIR / "siena", Path(tmpDir))
+            # Events file edited after the conversion
+            eventsFile = sorted(Path(tmpDir).glob("sub-*/ses-*/eeg/*_events.tsv"))[0]
+            annotations = Annotations.loadTsv(eventsFile.as_posix())
+            annotations.events = annotations.events[:1] * 2
+            annotations.saveTsv(eventsFile.as_posix())
+            tableTime = os.stat(Path(tmpDir) / "events.parquet").st_mtime_ns
+            os.utime(eventsFile, ns=(tableTime + 10**9, tableTime + 10**9))
+            pd.testing.assert_frame_equal(
+                loadEventsTable(Path(tmpDir)), loadEventsTable(Path(tmpDir), consolidated=False)
+            )
+
+    def test_staleEventsTableRuns(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            convertSiena(TEST_DIR / "siena", Path(tmpDir))
+            eventsFiles = sorted(Path(tmpDir).glob("sub-*/ses-*/eeg/*_events.tsv"))
+            tableTime = os.stat(Path(tmpDir) / "events.parquet").st_mtime_ns
+            # Run copied in with an older modification time
+            copy = eventsFiles[0].with_name(eventsFiles[0].name.replace("_run-", "_run-9"))
+            copy.write_bytes(eventsFiles[0].read_bytes())
+            os.utime(copy, ns=(tableTime - 10**9, tableTime - 10**9))
+            pd.testing.assert_frame_equal(
+                loadEventsTable(Path(tmpDir)), loadEventsTable(Path(tmpDir), consolidated=False)
+            )
+            # Deleted runs
+            copy.unlink()
+            eventsFiles[0].unlink()
+            pd.testing.assert_frame_equal(
+                loadEventsTable(Path(tmpDir)), loadEventsTable(Path(tmpDir), consolidated=False)
+            )
+
+    def test_convertSegments(self):
+        for dataset, convert in zip(
+            ("seizeit", "tuh"),
+            (convertSeizeit, convertTuh),
+        ):
+            outDir = TEST_DIR / "bids" / f"{dataset}_segments"
+            convert(
+                TEST_DIR / dataset,
+                outDir,
+                segments={"numBackground": 1, "backgroundDuration": 1},
+                labels={"window": 1, "stride": 1},
+            )
+            edfFiles = list(outDir.glob("sub-*/ses-*/eeg/*.edf"))
+            self.assertGreater(len(edfFiles), 0)
+            for edfFile in edfFiles:
+                eeg = Eeg.loadEdf(edfFile.as_posix(), Eeg.Montage.UNIPOLAR, None)
+                annotations = Annotations.loadTsv(
+                    edfFile.as_posix()[:-8] + "_events.tsv"
+                )
+                self.assertEqual(
+                    eeg.data.shape[1] / eeg.fs,
+                    annotations.events[0]["recordingDuration"],
+                )
+                labels = loadLabels(edfFile.as_posix()[:-8] + "_events.tsv", 1, 1)
+                self.assertEqual(len(labels), eeg.data.shape[1] / eeg.fs)
+            rmtree(outDir)
+
+    def test_convertSelection(self):
+        reference = TEST_DIR / "bids" / "tuh"
+        subset = TEST_DIR / "bids" / "tuh_eval"
+        convertTuh(TEST_DIR / "tuh", reference)
+        convertTuh(
+            TEST_DIR / "tuh",
+            subset,
+            select={"splits": ["eval"], "exclude": ["eval/aaaaarnq/s003_2014/*/*_t00[1-3].edf"]},
+        )
+        # Subset keeps the subject, session and run labels of the full conversion
+        files = sorted(x.relative_to(subset) for x in subset.glob("sub-*/ses-*/eeg/*.edf"))
+        self.assertGreater(len(files), 0)
+        for file in files:
+            self.assertTrue((reference / file).exists())
+            self.assertEqual((reference / file).read_bytes(), (subset / file).read_bytes())
+        self.assertEqual(len(files), len(list(TEST_DIR.glob("tuh/eval/*/*/*/*.edf"))) - 3)
+        participants = (subset / "participants.tsv").read_text().splitlines()[1:]
+        self.assertTrue(all(x.endswith("\teval") for x in participants))
+        rmtree(reference)
+        rmtree(subset)
+
+        # Time range
+        outDir = TEST_DIR / "bids" / "siena_range"
+        convertSiena(TEST_DIR / "siena", outDir, select={"timeRange": (0.5, 1.5)})
+        for edfFile in outDir.glob("sub-*/ses-*/eeg/*.edf"):
+            eeg = Eeg.loadEdf(edfFile.as_posix(), Eeg.Montage.UNIPOLAR, None)
+            self.assertLessEqual(eeg.data.shape[1] / eeg.fs, 1)
+        rmtree(outDir)
+
+    def test_convertSelectionSkipsFiles(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            root = Path(tmpDir) / "siena"
+            copytree(TEST_DIR / "siena", root)
+            # Recording of 1 s, which ends before the time range
+            edfFile = root / "PN00" / "PN00-2.edf"
+            content = bytearray(edfFile.read_bytes())
+            recordBytes = (len(content) - int(content[184:192])) // int(content[236:244])
+            content[236:244] = b"1".ljust(8)
+            edfFile.write_bytes(content[: int(content[184:192]) + recordBytes])
+
+            # Excluded files are never opened
+            with mock.patch(
+                "epilepsy2bids.bids.siena.convert2bids.loadAnnotationsFromEdf", wraps=loadSienaAnnotations
+            ) as loadAnnotations:
+                convertSiena(root, Path(tmpDir) / "bids", select={"exclude": ["PN00/PN00-[45].edf"]})
+            opened = sorted(Path(x.args[0]).name for x in loadAnnotations.call_args_list)
+            self.assertListEqual(opened, ["PN00-1.edf", "PN00-2.edf", "PN00-3.edf", "PN16-1.edf", "PN16-2.edf"])
+
+            # Files ending before the time range keep their run number
+            convertSiena(root, Path(tmpDir) / "range", select={"timeRange": (1.5, 2)})
+            runs = sorted(x.name[:-8] for x in (Path(tmpDir) / "range").glob("sub-00/ses-01/eeg/*_eeg.edf"))
+            self.assertListEqual(runs, [f"sub-00_ses-01_task-szMonitoring_run-0{i}" for i in (1, 3, 4, 5)])
+
+    def test_convertTargets(self):
+        outDir = TEST_DIR / "bids" / "siena_targets"
+        targets = [
+            {"outDir": outDir / "bipolar", "reference": "bipolar"},
+            {"outDir": outDir / "128", "fs": 128, "outputFormat": FileFormat.PARQUET_ZSTD},
+            {"outDir": outDir / "bipolar128", "fs": 128, "reference": "bipolar"},
+        ]
+        with mock.patch.object(Eeg, "loadEdf", wraps=Eeg.loadEdf) as loadEdf:
+            convertSiena(TEST_DIR / "siena", outDir / "avg", targets=targets)
+        # Each source file is decoded once for all targets
+        edfFiles = list(TEST_DIR.glob("siena/*/*.edf"))
+        self.assertEqual(loadEdf.call_count, len(edfFiles))
+
+        # Targets match single conversions
+        convertSiena(TEST_DIR / "siena", outDir / "single_avg")
+        convertSiena(TEST_DIR / "siena", outDir / "single_bipolar", reference="bipolar")
+        files = sorted(x.relative_to(outDir / "avg") for x in (outDir / "avg").rglob("*") if x.is_file())
+        self.assertEqual(len(list((outDir / "avg").glob("sub-*/ses-*/eeg/*.edf"))), len(edfFiles))
+        for file in files:
+            self.assertEqual((outDir / "avg" / file).read_bytes(), (outDir / "single_avg" / file).read_bytes())
+            self.assertEqual(
+                (outDir / "bipolar" / file).read_bytes(), (outDir / "single_bipolar" / file).read_bytes()
+            )
+        for parquetFile in (outDir / "128").glob("sub-*/ses-*/eeg/*_eeg.parquet"):
+            eeg = Eeg.loadDataFrame(parquetFile.as_posix())
+            self.assertEqual(eeg.fs, 128)
+            self.assertTrue(all(x.endswith("-Avg") for x in eeg.channels))
+            self.assertTrue((parquetFile.parent / parquetFile.name.replace(".parquet", ".json")).exists())
+            bipolar = Eeg.loadEdf(
+                (outDir / "bipolar128" / parquetFile.relative_to(outDir / "128")).with_suffix(".edf").as_posix(),
+                Eeg.Montage.BIPOLAR,
+                None,
+            )
+            self.assertEqual(bipolar.fs, 128)
+            self.assertEqual(bipolar.data.shape[1], eeg.data.shape[1])
+        self.assertIn("*_eeg.parquet", (outDir / "128" / ".bidsignore").read_text())
+        self.assertTrue((outDir / "128" / "events.parquet").exists())
+        self.assertRaises(ValueError, convertSiena, TEST_DIR / "siena", outDir, targets=[{"fs": 128}])
+        rmtree(outDir)
+
     def test_bids_validator(self):
         for dataset, convert in zip(
             ("chbmit", "seizeit", "siena", "tuh"),
@@ -0,0 +1,116 @@
+"""Eeg cache unit testing"""
+
+import filecmp
+import os
+import shutil
+import tempfile
+import unittest
+from importlib import resources as impresources
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from epilepsy2bids.bids.siena.convert2bids import convert as convertSiena
+from epilepsy2bids.cache import DiskCache, EegCache, _packageVersions
+from epilepsy2bids.eeg import Eeg
+
+FILE_NAME = "tests/PN00-5_sample.edf"
+TEST_DIR = impresources.files("tests") / "data"
+
+
+class TestEegCache(unittest.TestCase):
+    def test_loadStandardized(self):
+        cache = EegCache()
+        eeg = cache.loadStandardized(FILE_NAME, fs=128)
+        reference = Eeg.loadEdf(FILE_NAME)
+        reference.standardize(128)
+        np.testing.assert_array_equal(eeg.data, reference.data)
+        self.assertListEqual(list(eeg.channels), list(reference.channels))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (0, 2, 2))
+
+        # Returned recordings are copies
+        eeg.data[:] = 0
+        eeg = cache.loadStandardized(FILE_NAME, fs=128)
+        np.testing.assert_array_equal(eeg.data, reference.data)
+        # Decoded recording is reused for other standardization parameters
+        cache.loadStandardized(FILE_NAME, fs=256)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (2, 3, 3))
+
+    def test_budget(self):
+        cache = EegCache()
+        size = cache.loadEdf(FILE_NAME).data.nbytes
+        cache = EegCache(2 * size)
+        for start in (0, 0.5, 1):
+            cache.loadEdf(FILE_NAME, start=start, duration=1)
+        self.assertLessEqual(cache.stats()["bytes"], 2 * size)
+        cache = EegCache(size // 2)
+        cache.loadEdf(FILE_NAME)
+        self.assertEqual(len(cache), 0)
+        cache = EegCache(size + 1)
+        cache.loadEdf(FILE_NAME)
+        cache.loadEdf(FILE_NAME, start=0.5)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_invalidation(self):
+        cache = EegCache()
+        with tempfile.TemporaryDirectory() as tmpDir:
+            edfFile = os.path.join(tmpDir, "sample.edf")
+            shutil.copy(FILE_NAME, edfFile)
+            cache.loadEdf(edfFile)
+            os.utime(edfFile, ns=(0, 0))
+            cache.loadEdf(edfFile)
+        self.assertEqual(cache.stats()["misses"], 2)
+
+
+class TestDiskCache(unittest.TestCase):
+    def test_loadStandardized(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            cache = DiskCache(Path(tmpDir) / "cache")
+            eeg = cache.loadStandardized(FILE_NAME, fs=128)
+            # Entries are addressed by content: a copy of the file hits the cache
+            copy = os.path.join(tmpDir, "copy.edf")
+            shutil.copy(FILE_NAME, copy)
+            cached = DiskCache(Path(tmpDir) / "cache").loadStandardized(copy, fs=128)
+            np.testing.assert_array_equal(cached.data, eeg.data)
+            self.assertListEqual(list(cached.channels), list(eeg.channels))
+            self.assertEqual(cached._fileHeader, eeg._fileHeader)
+            self.assertEqual(cached._signalHeader, eeg._signalHeader)
+            cache.loadStandardized(FILE_NAME, fs=256)
+            stats = cache.stats()
+            self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (0, 2, 2))
+
+            cache.prune(stats["bytes"] - 1)
+            self.assertEqual(cache.stats()["entries"], 1)
+
+            # Package versions are looked up once per process
+            key = cache.key(FILE_NAME, fs=128)
+            with mock.patch("epilepsy2bids.cache.version") as version:
+                self.assertEqual(cache.key(FILE_NAME, fs=128), key)
+                version.assert_not_called()
+            # Upgrading a package changes the addresses of the entries
+            _packageVersions.cache_clear()
+            try:
+                with mock.patch("epilepsy2bids.cache.version", return_value="0.0.0"):
+                    self.assertNotEqual(cache.key(FILE_NAME, fs=128), key)
+            finally:
+                _packageVersions.cache_clear()
+
+    def test_convert(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            tmpDir = Path(tmpDir)
+            convertSiena(TEST_DIR / "siena", tmpDir / "reference")
+            convertSiena(TEST_DIR / "siena", tmpDir / "first", cacheDir=tmpDir / "cache")
+            convertSiena(TEST_DIR / "siena", tmpDir / "second", cacheDir=tmpDir / "cache")
+            edfFiles = sorted((tmpDir / "reference").glob("sub-*/ses-*/eeg/*.edf"))
+            self.assertGreater(len(edfFiles), 0)
+            for edfFile in edfFiles:
+                relative = edfFile.relative_to(tmpDir / "reference")
+                for output in ("first", "second"):
+                    self.assertTrue(filecmp.cmp(edfFile, tmpDir / output / relative, shallow=False))
+
+
+if __name__ == "__main__":
+    unittest.main()
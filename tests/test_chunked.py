@@ -0,0 +1,75 @@
+"""Chunked compressed store unit testing"""
+
+import tempfile
+import unittest
+from importlib import resources as impresources
+from pathlib import Path
+
+import numpy as np
+
+from epilepsy2bids.bids.siena.convert2bids import convert as convertSiena
+from epilepsy2bids.chunked import ChunkedReader, loadChunked, saveChunked
+from epilepsy2bids.dataset import BidsDataset
+from epilepsy2bids.eeg import Eeg, FileFormat
+from epilepsy2bids.sampler import CHUNKED_POOL, EDF_POOL, WindowSampler
+
+TEST_DIR = impresources.files("tests") / "data"
+
+
+class TestChunked(unittest.TestCase):
+    def test_saveChunked(self):
+        eeg = Eeg.loadEdf("tests/PN00-5_sample.edf", Eeg.Montage.UNIPOLAR, Eeg.ELECTRODES_10_20)
+        eeg.standardize()
+        with tempfile.TemporaryDirectory() as tmpDir:
+            eeg.saveEdf(f"{tmpDir}/test.edf")
+            edf = Eeg.loadEdf(f"{tmpDir}/test.edf", Eeg.Montage.UNIPOLAR, None)
+            for delta in (True, False):
+                saveChunked(eeg, f"{tmpDir}/test.chunked", chunkDuration=0.3, delta=delta)
+                loaded = loadChunked(f"{tmpDir}/test.chunked")
+                self.assertListEqual(loaded.channels, eeg.channels)
+                self.assertEqual(loaded.fs, eeg.fs)
+                self.assertDictEqual(loaded._fileHeader, eeg._fileHeader)
+                # Same resolution as the EDF output
+                np.testing.assert_allclose(loaded.data, edf.data, rtol=1e-6, atol=1e-2)
+
+                # Partial reads decompress the chunks covering the range
+                with ChunkedReader(f"{tmpDir}/test.chunked") as reader:
+                    channels = [eeg.channels[4], eeg.channels[1]]
+                    np.testing.assert_array_equal(reader.read(70, 300, channels), loaded.data[[4, 1], 70:300])
+                    self.assertEqual(reader.read(500, 600).shape, (len(eeg.channels), 12))
+                segment = loadChunked(f"{tmpDir}/test.chunked", start=0.5, duration=1)
+                np.testing.assert_array_equal(segment.data, loaded.data[:, 128:384])
+
+            self.assertRaises(ValueError, ChunkedReader, f"{tmpDir}/test.edf")
+
+    def test_convertChunked(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            convertSiena(TEST_DIR / "siena", Path(tmpDir) / "edf")
+            convertSiena(TEST_DIR / "siena", Path(tmpDir) / "chunked", outputFormat=FileFormat.CHUNKED)
+            edfFiles = sorted(Path(tmpDir, "edf").glob("sub-*/ses-*/eeg/*_eeg.edf"))
+            chunkedFiles = sorted(Path(tmpDir, "chunked").glob("sub-*/ses-*/eeg/*_eeg.chunked"))
+            self.assertEqual(len(chunkedFiles), len(edfFiles))
+            self.assertLess(sum(x.stat().st_size for x in chunkedFiles), sum(x.stat().st_size for x in edfFiles))
+
+            edfDataset = BidsDataset(Path(tmpDir) / "edf")
+            dataset = BidsDataset(Path(tmpDir) / "chunked")
+            self.assertEqual(len(dataset), len(edfDataset))
+            self.assertEqual(len(dataset.events), len(edfDataset.events))
+            for run, edfRun in zip(dataset, edfDataset):
+                np.testing.assert_allclose(run.loadEeg().data, edfRun.loadEeg().data, rtol=1e-6, atol=1e-2)
+
+            sampler = WindowSampler(dataset, window=1, stride=1)
+            edfSampler = WindowSampler(edfDataset, window=1, stride=1)
+            for i in range(len(sampler)):
+                data, label = sampler[i]
+                edfData, edfLabel = edfSampler[i]
+                np.testing.assert_allclose(data, edfData, rtol=1e-6, atol=1e-2)
+                self.assertEqual(label, edfLabel)
+            # Stores are opened once and kept by the pool
+            self.assertEqual(len(CHUNKED_POOL), len(sampler.runs))
+            EDF_POOL.close()
+            CHUNKED_POOL.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
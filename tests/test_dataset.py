@@ -0,0 +1,80 @@
+"""BIDS dataset index unit testing"""
+
+import os
+import tempfile
+import unittest
+from importlib import resources as impresources
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+
+from epilepsy2bids.bids.tuh.convert2bids import convert as convertTuh
+from epilepsy2bids.dataset import INDEX_CACHE, BidsDataset
+
+TEST_DIR = impresources.files("tests") / "data"
+
+
+class TestBidsDataset(unittest.TestCase):
+    def test_index(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            root = Path(tmpDir) / "tuh"
+            convertTuh(TEST_DIR / "tuh", root)
+            dataset = BidsDataset(root)
+            self.assertTrue((root / INDEX_CACHE).exists())
+            self.assertEqual(len(dataset), len(list(root.glob("sub-*/ses-*/eeg/*_eeg.edf"))))
+            self.assertEqual(len(dataset.events), len(dataset.queryEvents()))
+            self.assertTrue((dataset.runs["fs"] == 256).all())
+
+            # Queries
+            subject = dataset.subjects[0]
+            runs = dataset.query(subject=subject)
+            self.assertTrue((runs["subject"] == subject).all())
+            seizureRuns = dataset.query(hasSeizure=True)
+            self.assertEqual(
+                len(seizureRuns) + len(dataset.query(hasSeizure=False)), len(dataset)
+            )
+            self.assertEqual(
+                set(dataset.queryEvents("seizure")["run"]), set(seizureRuns["run"])
+            )
+
+            # Lazy handles
+            run = dataset.getRuns(runs)[0]
+            eeg = run.loadEeg(0, 1)
+            self.assertEqual(eeg.data.shape, (run.channels, run.fs))
+            self.assertEqual(
+                run.loadAnnotations().events[0]["recordingDuration"], run.duration
+            )
+
+            # Cached index is reused and refreshed when files change
+            runs = dataset.runs
+            with mock.patch.object(BidsDataset, "_scan", wraps=dataset._scan) as scan:
+                cached = BidsDataset(root)
+            scan.assert_not_called()
+            self.assertTrue(cached.runs.equals(runs))
+            pd.testing.assert_frame_equal(cached.events, dataset.events)
+            pd.testing.assert_frame_equal(cached.participants, dataset.participants)
+            # A corrupted cache is rebuilt
+            (root / INDEX_CACHE).write_bytes(b"PAR1")
+            self.assertTrue(BidsDataset(root).runs.equals(runs))
+            os.remove(run.eventsFile)
+            os.remove(run.edfFile)
+            self.assertEqual(len(BidsDataset(root)), len(dataset) - 1)
+
+    def test_indexWriteError(self):
+        def writeTable(table, where):
+            # Partial write interrupted by a full disk
+            Path(where).write_bytes(b"PAR1")
+            raise OSError(28, "No space left on device")
+
+        with tempfile.TemporaryDirectory() as tmpDir:
+            root = Path(tmpDir) / "tuh"
+            convertTuh(TEST_DIR / "tuh", root)
+            with mock.patch("pyarrow.parquet.write_table", side_effect=writeTable):
+                dataset = BidsDataset(root)
+            self.assertGreater(len(dataset), 0)
+            self.assertListEqual([x.name for x in root.glob(f"{INDEX_CACHE}*")], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
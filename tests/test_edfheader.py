@@ -0,0 +1,45 @@
+"""EDF header parsing unit testing"""
+
+import io
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pyedflib
+
+from epilepsy2bids.edfheader import EDF_ANNOTATIONS, readEdfHeader, readEdfRecords, readEdfStart
+from epilepsy2bids.eeg import Eeg
+
+
+class TestEdfHeader(unittest.TestCase):
+    def test_readEdfHeader(self):
+        edfFile = Path("tests/PN00-5_sample.edf")
+        header = readEdfHeader(edfFile)
+        with pyedflib.EdfReader(edfFile.as_posix()) as edf:
+            labels = edf.getSignalLabels()
+            self.assertListEqual([x for x in header["labels"] if x != EDF_ANNOTATIONS], labels)
+            self.assertEqual(header["duration"], edf.getFileDuration())
+            self.assertEqual((header["startDateTime"], header["duration"]), readEdfStart(edfFile))
+            self.assertEqual(readEdfStart(edfFile)[0], edf.getStartdatetime())
+        # Only the header is consumed from a stream
+        content = edfFile.read_bytes()
+        stream = io.BytesIO(content)
+        self.assertEqual(readEdfHeader(stream)["labels"], header["labels"])
+        self.assertEqual(stream.tell(), header["headerBytes"])
+        self.assertRaises(ValueError, readEdfHeader, io.BytesIO(content[:300]))
+
+    def test_readEdfRecords(self):
+        edfFile = Path("tests/PN00-5_sample.edf")
+        header = readEdfHeader(edfFile)
+        eeg = Eeg.loadEdf(edfFile.as_posix(), Eeg.Montage.UNIPOLAR, None)
+        with open(edfFile, "rb") as f:
+            signals = readEdfRecords(f, header, 0, header["numRecords"])
+            # Records past the end of the file are not returned
+            last = readEdfRecords(f, header, header["numRecords"] - 1, 10)
+            self.assertEqual(len(last[0]), header["samplesPerRecord"][0])
+        for channel, data in zip(eeg.channels, eeg.data):
+            np.testing.assert_allclose(signals[header["labels"].index(channel)], data, atol=1e-6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,11 @@
 """Eeg class unit testing"""
 
 import copy
+import gc
+import pickle
 import unittest
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 from pathlib import Path
 
 import numpy as np
@@ -10,6 +14,11 @@ import pandas as pd
 from src.epilepsy2bids.eeg import Eeg, FileFormat
 
 
+def _markAndSum(eeg: Eeg) -> float:
+    eeg.data[0, 0] = 42
+    return float(eeg.data.sum())
+
+
 class TestDataLoading(unittest.TestCase):
     def test_loadEdf(self):
         fileConfigurations = [
@@ -43,6 +52,21 @@ class TestDataLoading(unittest.TestCase):
             self.assertEqual(len(eeg.channels), len(fileConfig["electrodes"]))
             self.assertEqual(eeg.montage, fileConfig["montage"])
 
+    def test_loadEdfSegment(self):
+        fileName = "tests/PN00-5_sample.edf"
+        eeg = Eeg.loadEdf(fileName, Eeg.Montage.UNIPOLAR, Eeg.ELECTRODES_10_20)
+        segment = Eeg.loadEdf(
+            fileName, Eeg.Montage.UNIPOLAR, Eeg.ELECTRODES_10_20, start=0.5, duration=1
+        )
+        fs = int(eeg.fs)
+        self.assertEqual(segment.data.shape, (eeg.data.shape[0], fs))
+        np.testing.assert_array_equal(segment.data, eeg.data[:, fs // 2 : fs // 2 + fs])
+        # Segment is clipped to the end of the recording
+        segment = Eeg.loadEdf(
+            fileName, Eeg.Montage.UNIPOLAR, Eeg.ELECTRODES_10_20, start=1.5, duration=10
+        )
+        self.assertEqual(segment.data.shape[1], eeg.data.shape[1] - int(1.5 * eeg.fs))
+
     def test_resampling(self):
         fileConfig = {  # Siena
             "fileName": "tests/PN00-5_sample.edf",
@@ -60,6 +84,19 @@ class TestDataLoading(unittest.TestCase):
         self.assertEqual(fileDuration, newFileDuration)
         self.assertEqual(eeg.fs, newFs)
 
+    def test_resamplingSameFrequency(self):
+        import resampy
+
+        eeg = Eeg.loadEdf(
+            "tests/PN00-5_sample.edf", Eeg.Montage.UNIPOLAR, Eeg.ELECTRODES_10_20
+        )
+        fs = eeg.fs
+        # resampy low-pass filters the data even when the frequency does not change
+        expected = resampy.resample(eeg.data, fs, fs)
+        eeg.resample(fs)
+        np.testing.assert_array_equal(eeg.data, expected)
+        self.assertEqual(eeg.fs, fs)
+
     def test_reReference(self):
         fileConfig = {  # Siena
             "fileName": "tests/PN00-5_sample.edf",
@@ -143,19 +180,114 @@ class TestDataLoading(unittest.TestCase):
         )
         eeg.standardize()
         
-        for ext in [FileFormat.CSV, FileFormat.CSV_GZIP, FileFormat.PARQUET_GZIP]:
+        for ext in [FileFormat.CSV, FileFormat.CSV_GZIP, FileFormat.PARQUET_GZIP, FileFormat.PARQUET_ZSTD]:
             eeg.saveDataFrame(f"test.{ext}", ext)
             match ext:
                 case FileFormat.CSV:
                     tblData = pd.read_csv(f"test.{ext}")
                 case FileFormat.CSV_GZIP:
                     tblData = pd.read_csv(f"test.{ext}", compression="gzip")
-                case FileFormat.PARQUET_GZIP:
+                case FileFormat.PARQUET_GZIP | FileFormat.PARQUET_ZSTD:
                     tblData = pd.read_parquet(f"test.{ext}")
             self.assertListEqual(list(tblData), eeg.channels)
             np.testing.assert_allclose(eeg.data, tblData.to_numpy().transpose())
             Path(f"test.{ext}").unlink()
 
+    def test_loadDataFrame(self):
+        eeg = Eeg.loadEdf("tests/PN00-5_sample.edf", Eeg.Montage.UNIPOLAR, Eeg.ELECTRODES_10_20)
+        eeg.standardize()
+        fileHeader = eeg._fileHeader.copy()
+
+        eeg.saveDataFrame("test.parquet", rowGroupDuration=1)
+        self.assertDictEqual(eeg._fileHeader, fileHeader)
+        loaded = Eeg.loadDataFrame("test.parquet")
+        self.assertListEqual(loaded.channels, eeg.channels)
+        self.assertEqual(loaded.fs, eeg.fs)
+        self.assertEqual(loaded.montage, eeg.montage)
+        self.assertEqual(loaded.data.dtype, np.float64)
+        self.assertDictEqual(loaded._fileHeader, eeg._fileHeader)
+        self.assertDictEqual(loaded._signalHeader, eeg._signalHeader)
+        np.testing.assert_array_equal(loaded.data, eeg.data)
+
+        # float32 columns are opt-in
+        eeg.saveDataFrame("test.parquet", dtype=np.float32, rowGroupDuration=1)
+        loaded = Eeg.loadDataFrame("test.parquet")
+        self.assertEqual(loaded.data.dtype, np.float32)
+        np.testing.assert_allclose(loaded.data, eeg.data, rtol=1e-6)
+
+        # Partial read across row group boundaries
+        channels = [eeg.channels[9], eeg.channels[0]]
+        segment = Eeg.loadDataFrame("test.parquet", start=0.5, stop=2.25, channels=channels)
+        self.assertListEqual(segment.channels, channels)
+        indices = [eeg.channels.index(x) for x in channels]
+        np.testing.assert_allclose(segment.data, eeg.data[indices, 128:576], rtol=1e-6)
+
+        # int16 columns are scaled per channel
+        eeg.saveDataFrame("test.parquet", dtype=np.int16)
+        loaded = Eeg.loadDataFrame("test.parquet", stop=3)
+        steps = np.max(np.abs(eeg.data), axis=1, keepdims=True) / np.iinfo(np.int16).max
+        self.assertTrue(np.all(np.abs(loaded.data - eeg.data[:, :768]) <= steps))
+        Path("test.parquet").unlink()
+
+    def test_loadRaw(self):
+        eeg = Eeg.loadEdf("tests/PN00-5_sample.edf", Eeg.Montage.UNIPOLAR, Eeg.ELECTRODES_10_20)
+        eeg.standardize()
+
+        eeg.saveRaw("test.npy")
+        loaded = Eeg.loadRaw("test.npy")
+        self.assertIsInstance(loaded.data, np.memmap)
+        self.assertListEqual(loaded.channels, eeg.channels)
+        self.assertEqual(loaded.fs, eeg.fs)
+        self.assertEqual(loaded.montage, eeg.montage)
+        self.assertDictEqual(loaded._fileHeader, eeg._fileHeader)
+        self.assertDictEqual(loaded._signalHeader, eeg._signalHeader)
+        np.testing.assert_array_equal(loaded.data, eeg.data)
+        del loaded
+
+        eeg.saveRaw("test.npy", np.float32)
+        loaded = Eeg.loadRaw("test.npy", mmapMode=None)
+        self.assertEqual(loaded.data.dtype, np.float32)
+        np.testing.assert_allclose(loaded.data, eeg.data, rtol=1e-6)
+        Path("test.npy").unlink()
+        Path("test.json").unlink()
+
+    def test_sharedMemory(self):
+        eeg = Eeg.loadEdf("tests/PN00-5_sample.edf", Eeg.Montage.UNIPOLAR, Eeg.ELECTRODES_10_20)
+        reference = eeg.data.copy()
+        eeg.toSharedMemory()
+        try:
+            np.testing.assert_array_equal(eeg.data, reference)
+            # Only the name of the shared memory block is pickled
+            self.assertLess(len(pickle.dumps(eeg)), eeg.data.nbytes // 10)
+            copied = copy.deepcopy(eeg)
+            self.assertIsNone(copied._sharedMemory)
+            self.assertFalse(np.shares_memory(copied.data, eeg.data))
+            with ProcessPoolExecutor(1) as executor:
+                total = executor.submit(_markAndSum, eeg).result()
+            # Changes of the worker are visible without copying data back
+            self.assertEqual(eeg.data[0, 0], 42)
+            self.assertAlmostEqual(total, float(eeg.data.sum()))
+        finally:
+            eeg.releaseSharedMemory()
+        self.assertIsNone(eeg._sharedMemory)
+        self.assertEqual(eeg.data[0, 0], 42)
+
+        # The block of an Eeg garbage collected without releasing it is destroyed
+        shared = Eeg(eeg.data.copy(), eeg.channels, eeg.fs)
+        shared.toSharedMemory()
+        name = shared._sharedMemory.name
+        del shared
+        gc.collect()
+        self.assertRaises(FileNotFoundError, shared_memory.SharedMemory, name=name)
+
+        # Data in private memory is pickled out-of-band with protocol 5
+        buffers = list()
+        pickled = pickle.dumps(eeg, protocol=5, buffer_callback=buffers.append)
+        self.assertLess(len(pickled), eeg.data.nbytes // 10)
+        loaded = pickle.loads(pickled, buffers=buffers)
+        self.assertTrue(np.shares_memory(loaded.data, eeg.data))
+        self.assertListEqual(loaded.channels, eeg.channels)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,52 @@
+"""Import time regression testing"""
+
+import subprocess
+import sys
+import unittest
+
+HEAVY_MODULES = ("pandas", "pyedflib", "resampy", "numba", "timescoring")
+
+
+def _importedModules(module: str) -> set[str]:
+    """Top-level modules loaded by importing a module in a fresh interpreter."""
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import sys, {module}; print(' '.join(sorted(sys.modules)))",
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return set(x.split(".")[0] for x in output.stdout.split())
+
+
+class TestImports(unittest.TestCase):
+    def test_lightModules(self):
+        for module in (
+            "epilepsy2bids.eeg",
+            "epilepsy2bids.annotations",
+            "epilepsy2bids.labels",
+        ):
+            imported = _importedModules(module)
+            for heavy in HEAVY_MODULES:
+                self.assertNotIn(heavy, imported, f"{module} imports {heavy}")
+
+    def test_lazyEventTypes(self):
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import epilepsy2bids.annotations as a; print('SeizureType' in vars(a)); "
+                "print(a.SeizureType.sz.name); print('SeizureType' in vars(a))",
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        self.assertListEqual(output.stdout.split(), ["False", "sz", "True"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""Label cache unit testing"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from epilepsy2bids.annotations import Annotations
+from epilepsy2bids.labels import Labels, labelsFileName, loadLabels
+
+
+class TestLabels(unittest.TestCase):
+    def test_fromAnnotations(self):
+        annotations = Annotations.loadTsv("tests/sample.tsv")
+        labels = Labels.fromAnnotations(annotations, window=1, stride=1)
+        self.assertEqual(len(labels), 3600)
+        self.assertEqual(labels.intervals.shape, (3, 2))
+        # Any overlap with a seizure is labelled as seizure
+        mask = annotations.getMask(1)
+        self.assertTrue(np.all(labels[mask == 1] == 1))
+        self.assertEqual(labels.labelAt(36.5), 1)
+        self.assertEqual(labels.labelAt(35.5), 0)
+        # Overlapping windows
+        labels = Labels.fromAnnotations(annotations, window=10, stride=5, minOverlap=0.5)
+        self.assertEqual(len(labels), 719)
+        self.assertEqual(labels.labelAt(30), 0)  # 30 - 40 : 3.11 s of seizure
+        self.assertEqual(labels.labelAt(35), 1)  # 35 - 45 : 8.11 s of seizure
+
+    def test_loadLabels(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            eventsFile = Path(tmpDir) / "sub-01_ses-01_task-szMonitoring_run-01_events.tsv"
+            shutil.copy("tests/sample.tsv", eventsFile)
+            labels = loadLabels(eventsFile, window=1, stride=1)
+            self.assertTrue(labelsFileName(eventsFile).exists())
+            cached = loadLabels(eventsFile, window=1, stride=1)
+            np.testing.assert_array_equal(cached.labels, labels.labels)
+
+            # Cache is rebuilt when the events file changes
+            Annotations.loadEvents([(0, 10)], 100).saveTsv(eventsFile.as_posix())
+            labels = loadLabels(eventsFile, window=1, stride=1)
+            self.assertEqual(len(labels), 100)
+            self.assertEqual(np.sum(labels.labels), 10)
+
+            # Same content with a new modification time: the signature of the cache is refreshed, not the labels
+            stat = eventsFile.stat()
+            os.utime(eventsFile, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            with mock.patch("epilepsy2bids.labels.saveLabels") as saveLabels:
+                np.testing.assert_array_equal(loadLabels(eventsFile, window=1, stride=1).labels, labels.labels)
+                saveLabels.assert_not_called()
+            with mock.patch("epilepsy2bids.labels._fileHash") as fileHash:
+                loadLabels(eventsFile, window=1, stride=1)
+                fileHash.assert_not_called()
+
+            # A truncated cache is rebuilt, no temporary file is left
+            os.chmod(eventsFile, 0o640)
+            cacheFile = labelsFileName(eventsFile)
+            cacheFile.write_bytes(cacheFile.read_bytes()[:100])
+            np.testing.assert_array_equal(loadLabels(eventsFile, window=1, stride=1).labels, labels.labels)
+            files = sorted(x.name for x in Path(tmpDir).iterdir())
+            self.assertListEqual(files, sorted([cacheFile.name, eventsFile.name]))
+
+            # The cache has the permissions of the events file
+            self.assertEqual(cacheFile.stat().st_mode & 0o777, 0o640)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+"""Dataset annotation loaders unit testing"""
+
+import unittest
+from importlib import resources as impresources
+
+from epilepsy2bids.load_annotations import chbmit, seizeit, siena, tuh
+
+TEST_DIR = impresources.files("tests") / "data"
+
+
+class TestLoadAnnotations(unittest.TestCase):
+    def test_loadAnnotationsIndex(self):
+        for dataset, loader in zip(
+            ("chbmit", "seizeit", "siena", "tuh"), (chbmit, seizeit, siena, tuh)
+        ):
+            index = loader.loadAnnotationsIndex(TEST_DIR / dataset)
+            edfFiles = sorted((TEST_DIR / dataset).rglob("*.edf"))
+            self.assertGreater(len(edfFiles), 0)
+            for edfFile in edfFiles:
+                # Annotations from the index match the annotations parsed per file
+                self.assertListEqual(
+                    loader.loadAnnotationsFromEdf(edfFile.as_posix(), index).events,
+                    loader.loadAnnotationsFromEdf(edfFile.as_posix()).events,
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
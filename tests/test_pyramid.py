@@ -0,0 +1,76 @@
+"""Min/max pyramid unit testing"""
+
+import tempfile
+import unittest
+from importlib import resources as impresources
+from pathlib import Path
+
+import numpy as np
+
+from epilepsy2bids.bids.siena.convert2bids import convert as convertSiena
+from epilepsy2bids.dataset import BidsDataset
+from epilepsy2bids.eeg import Eeg
+from epilepsy2bids.pyramid import Pyramid, loadPyramid, pyramidFileName, savePyramid
+
+TEST_DIR = impresources.files("tests") / "data"
+
+
+class TestPyramid(unittest.TestCase):
+    def test_fromEeg(self):
+        rng = np.random.default_rng(0)
+        eeg = Eeg(rng.normal(size=(3, 10000)), ["Fp1-Avg", "Cz-Avg", "O2-Avg"], 100)
+        pyramid = Pyramid.fromEeg(eeg, binSize=10, factor=4, minBins=10)
+        self.assertListEqual([pyramid.level(i)[0].shape[1] for i in range(len(pyramid))], [1000, 250, 63, 16, 4])
+        # Every level bounds the signal
+        for i in range(len(pyramid)):
+            mins, maxs = pyramid.level(i)
+            self.assertEqual(np.min(mins), np.float32(np.min(eeg.data)))
+            self.assertEqual(np.max(maxs), np.float32(np.max(eeg.data)))
+        np.testing.assert_array_equal(pyramid.level(0)[1][1, 3], np.float32(np.max(eeg.data[1, 30:40])))
+        np.testing.assert_array_equal(pyramid.level(1)[0][2, 1], np.float32(np.min(eeg.data[2, 40:80])))
+
+        # Finest level with at most maxPoints bins
+        times, mins, maxs = pyramid.envelope(10, 30, maxPoints=20)
+        self.assertEqual(pyramid.selectLevel(10, 30, maxPoints=20), 2)
+        self.assertEqual(mins.shape, (3, 13))
+        self.assertAlmostEqual(times[0], 9.6)
+        np.testing.assert_array_equal(mins, pyramid.level(2)[0][:, 6:19])
+        times, mins, maxs = pyramid.envelope(maxPoints=2000, channels=["O2-Avg"])
+        self.assertEqual(mins.shape, (1, 1000))
+        np.testing.assert_array_equal(maxs[0], pyramid.level(0)[1][2])
+        self.assertEqual(pyramid.selectLevel(maxPoints=1), len(pyramid) - 1)
+
+    def test_savePyramid(self):
+        eeg = Eeg.loadEdf("tests/PN00-5_sample.edf", Eeg.Montage.UNIPOLAR, Eeg.ELECTRODES_10_20)
+        eeg.standardize()
+        with tempfile.TemporaryDirectory() as tmpDir:
+            eegFile = f"{tmpDir}/sub-00_ses-01_task-szMonitoring_run-01_eeg.edf"
+            pyramid = savePyramid(eeg, eegFile, binSize=4, minBins=8)
+            self.assertTrue(pyramidFileName(eegFile).exists())
+            loaded = loadPyramid(eegFile)
+            self.assertEqual(len(loaded), len(pyramid))
+            self.assertListEqual(loaded.channels, eeg.channels)
+            self.assertEqual((loaded.fs, loaded.numSamples), (eeg.fs, eeg.data.shape[1]))
+            # Levels are mapped from the file instead of being read in memory
+            self.assertIsInstance(loaded.level(0)[0], np.memmap)
+            for i in range(len(pyramid)):
+                np.testing.assert_array_equal(loaded.level(i)[0], pyramid.level(i)[0])
+                np.testing.assert_array_equal(loaded.level(i)[1], pyramid.level(i)[1])
+
+    def test_convertPyramid(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            convertSiena(TEST_DIR / "siena", Path(tmpDir), pyramid={"binSize": 16})
+            self.assertIn("*_pyramid.npz", (Path(tmpDir) / ".bidsignore").read_text())
+            dataset = BidsDataset(Path(tmpDir))
+            self.assertGreater(len(dataset), 0)
+            for run in dataset:
+                eeg = run.loadEeg()
+                pyramid = run.loadPyramid()
+                self.assertEqual(pyramid.binSize, 16)
+                _, mins, maxs = pyramid.envelope()
+                self.assertTrue(np.all(mins <= maxs))
+                self.assertEqual(mins.shape[0], len(eeg.channels))
+
+
+if __name__ == "__main__":
+    unittest.main()
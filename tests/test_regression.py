@@ -0,0 +1,179 @@
+"""Regression checker unit testing"""
+
+import json
+import shutil
+import tempfile
+import unittest
+from importlib import resources as impresources
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+
+from epilepsy2bids import regression
+from epilepsy2bids.bids.siena.convert2bids import convert as convertSiena
+from epilepsy2bids.chunked import loadChunked, saveChunked
+from epilepsy2bids.edfheader import readEdfHeader
+from epilepsy2bids.eeg import Eeg, FileFormat
+from epilepsy2bids.regression import compareDatasets
+
+TEST_DIR = impresources.files("tests") / "data"
+
+
+class TestRegression(unittest.TestCase):
+    def test_compareDatasets(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            ref = Path(tmpDir) / "ref"
+            new = Path(tmpDir) / "new"
+            convertSiena(TEST_DIR / "siena", ref)
+            shutil.copytree(ref, new)
+            report = compareDatasets(ref, new, numWorkers=1)
+            self.assertTrue((report["status"] == "identical").all())
+            self.assertTrue(report["withinTolerance"].all())
+
+            # Change a sample of the second block of an EDF file
+            edfFile = sorted(new.glob("sub-*/ses-*/eeg/*.edf"))[0]
+            header = readEdfHeader(edfFile)
+            content = bytearray(edfFile.read_bytes())
+            offset = header["headerBytes"] + header["recordBytes"] + 10
+            value = int.from_bytes(content[offset : offset + 2], "little", signed=True)
+            value = value + 1000 if value < 0 else value - 1000
+            content[offset : offset + 2] = value.to_bytes(2, "little", signed=True)
+            edfFile.write_bytes(content)
+            # Change a sidecar and an event, remove and add files
+            sidecar = edfFile.with_suffix(".json")
+            metadata = json.loads(sidecar.read_text())
+            metadata["SamplingFrequency"] = 128
+            sidecar.write_text(json.dumps(metadata))
+            eventsFile = Path(edfFile.as_posix()[:-8] + "_events.tsv")
+            lines = eventsFile.read_text().splitlines()
+            lines[1] = "\t".join(["0.5"] + lines[1].split("\t")[1:])
+            eventsFile.write_text("\n".join(lines) + "\n")
+            (new / "README").unlink()
+            (new / "extra.txt").write_text("extra")
+
+            report = compareDatasets(ref, new, blockDuration=1, numWorkers=2).set_index("file")
+            edfRow = report.loc[edfFile.relative_to(new).as_posix()]
+            self.assertEqual(edfRow["status"], "different")
+            self.assertEqual(edfRow["differentBlocks"], 1)
+            self.assertEqual(edfRow["numBlocks"], header["numRecords"])
+            self.assertGreater(edfRow["maxDifference"], 0)
+            self.assertFalse(edfRow["withinTolerance"])
+            self.assertEqual(len(edfRow["details"]), 1)
+            sidecarRow = report.loc[sidecar.relative_to(new).as_posix()]
+            self.assertListEqual(sidecarRow["details"], [f"/SamplingFrequency: {256!r} != {128!r}"])
+            eventsRow = report.loc[eventsFile.relative_to(new).as_posix()]
+            self.assertEqual(eventsRow["kind"], "tsv")
+            self.assertEqual(len(eventsRow["details"]), 1)
+            self.assertTrue(eventsRow["details"][0].startswith("onset[0]"))
+            self.assertEqual(report.loc["README", "status"], "missing")
+            self.assertEqual(report.loc["extra.txt", "status"], "added")
+            self.assertEqual((report["status"] != "identical").sum(), 5)
+
+            # Differences within tolerance
+            report = compareDatasets(ref, new, tolerance=1e6, numWorkers=1).set_index("file")
+            self.assertTrue(report.loc[edfFile.relative_to(new).as_posix(), "withinTolerance"])
+
+    def test_compareScaling(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            ref = Path(tmpDir) / "ref"
+            new = Path(tmpDir) / "new"
+            convertSiena(TEST_DIR / "siena", ref)
+            shutil.copytree(ref, new)
+            # Change the physical maximum of the first channel and a sample of the second block
+            edfFile = sorted(new.glob("sub-*/ses-*/eeg/*.edf"))[0]
+            header = readEdfHeader(edfFile)
+            numSignals = len(header["labels"])
+            content = bytearray(edfFile.read_bytes())
+            offset = 256 + 112 * numSignals
+            content[offset : offset + 8] = str(int(header["physicalMax"][0]) + 100).ljust(8).encode()
+            offset = header["headerBytes"] + header["recordBytes"] + 10
+            content[offset : offset + 2] = bytes(a ^ 0xFF for a in content[offset : offset + 2])
+            edfFile.write_bytes(content)
+
+            with mock.patch.object(regression, "readEdfRecords", wraps=regression.readEdfRecords) as readRecords:
+                report = compareDatasets(ref, new, blockDuration=1, numWorkers=1).set_index("file")
+            edfRow = report.loc[edfFile.relative_to(new).as_posix()]
+            self.assertEqual(edfRow["differentBlocks"], 1)
+            self.assertFalse(edfRow["withinTolerance"])
+            # Every block of both files is decoded
+            self.assertEqual(readRecords.call_count, 2 * header["numRecords"])
+
+    def test_compareHeader(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            ref = Path(tmpDir) / "ref"
+            new = Path(tmpDir) / "new"
+            convertSiena(TEST_DIR / "siena", ref)
+            shutil.copytree(ref, new)
+            # Change the start time and the prefiltering of the first channel, keeping the data records
+            edfFile = sorted(new.glob("sub-*/ses-*/eeg/*.edf"))[0]
+            header = readEdfHeader(edfFile)
+            numSignals = len(header["labels"])
+            content = bytearray(edfFile.read_bytes())
+            hour = (header["startDateTime"].hour + 1) % 24
+            content[176:178] = f"{hour:02d}".encode()
+            offset = 256 + 136 * numSignals
+            content[offset : offset + 80] = b"HP:0.5Hz".ljust(80)
+            edfFile.write_bytes(content)
+
+            report = compareDatasets(ref, new, numWorkers=1).set_index("file")
+            edfRow = report.loc[edfFile.relative_to(new).as_posix()]
+            self.assertEqual(edfRow["status"], "different")
+            self.assertEqual(edfRow["differentBlocks"], 0)
+            self.assertFalse(edfRow["withinTolerance"])
+            self.assertListEqual([x.split(":")[0] for x in edfRow["details"]], ["startDateTime", "prefilters"])
+
+            # Changes of fields that are not parsed are reported on the bytes of the header
+            shutil.copy(ref / edfFile.relative_to(new), edfFile)
+            content = bytearray(edfFile.read_bytes())
+            offset = 256 + 224 * numSignals
+            content[offset : offset + 4] = b"test"
+            edfFile.write_bytes(content)
+            report = compareDatasets(ref, new, numWorkers=1).set_index("file")
+            self.assertListEqual(report.loc[edfFile.relative_to(new).as_posix(), "details"], ["header: content differs"])
+
+    def test_compareStores(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            ref = Path(tmpDir) / "ref"
+            new = Path(tmpDir) / "new"
+            convertSiena(
+                TEST_DIR / "siena",
+                ref / "chunked",
+                outputFormat=FileFormat.CHUNKED,
+                targets=[{"outDir": ref / "parquet", "outputFormat": FileFormat.PARQUET_ZSTD}],
+            )
+            shutil.copytree(ref, new)
+            # Same contents written with other chunks, row groups and compression
+            chunkedFile = sorted(new.glob("chunked/sub-*/ses-*/eeg/*.chunked"))[0]
+            saveChunked(loadChunked(chunkedFile.as_posix()), chunkedFile.as_posix(), chunkDuration=0.5, delta=False)
+            parquetFile = sorted(new.glob("parquet/sub-*/ses-*/eeg/*_eeg.parquet"))[0]
+            Eeg.loadDataFrame(parquetFile.as_posix()).saveDataFrame(parquetFile.as_posix(), rowGroupDuration=0.5)
+            eventsTable = new / "parquet" / "events.parquet"
+            pd.read_parquet(eventsTable).to_parquet(eventsTable, compression="gzip")
+            report = compareDatasets(ref, new, blockDuration=1, numWorkers=1).set_index("file")
+            for file in (chunkedFile, parquetFile):
+                self.assertEqual(report.loc[file.relative_to(new).as_posix(), "kind"], "eeg")
+            self.assertEqual(report.loc[eventsTable.relative_to(new).as_posix(), "kind"], "parquet")
+            # Quantizing the chunked store again moves samples by less than a quantization step
+            self.assertTrue(report["withinTolerance"].all())
+            self.assertTrue((report.drop(chunkedFile.relative_to(new).as_posix())["status"] == "identical").all())
+
+            # Change a sample and an event
+            eeg = loadChunked(chunkedFile.as_posix())
+            eeg.data[0, 300] += 100
+            saveChunked(eeg, chunkedFile.as_posix())
+            events = pd.read_parquet(eventsTable)
+            events.loc[0, "onset"] += 1
+            events.to_parquet(eventsTable)
+            report = compareDatasets(ref, new, blockDuration=1, numWorkers=1).set_index("file")
+            chunkedRow = report.loc[chunkedFile.relative_to(new).as_posix()]
+            self.assertEqual(chunkedRow["status"], "different")
+            self.assertGreater(chunkedRow["maxDifference"], 50)
+            self.assertFalse(chunkedRow["withinTolerance"])
+            eventsRow = report.loc[eventsTable.relative_to(new).as_posix()]
+            self.assertEqual(len(eventsRow["details"]), 1)
+            self.assertTrue(eventsRow["details"][0].startswith("onset[0]"))
+
+
+if __name__ == "__main__":
+    unittest.main()
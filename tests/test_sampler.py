@@ -0,0 +1,82 @@
+"""Window sampler unit testing"""
+
+import pickle
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from importlib import resources as impresources
+from pathlib import Path
+
+import numpy as np
+
+from epilepsy2bids.bids.tuh.convert2bids import convert as convertTuh
+from epilepsy2bids.dataset import BidsDataset
+from epilepsy2bids.eeg import Eeg
+from epilepsy2bids.sampler import EDF_POOL, WindowSampler
+
+TEST_DIR = impresources.files("tests") / "data"
+
+
+def _readWindow(args):
+    sampler, index = args
+    return sampler[index][0]
+
+
+class TestWindowSampler(unittest.TestCase):
+    def test_sample(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            root = Path(tmpDir) / "tuh"
+            convertTuh(TEST_DIR / "tuh", root, labels={"window": 1, "stride": 1})
+            dataset = BidsDataset(root)
+            sampler = WindowSampler(dataset, window=1, stride=1)
+            self.assertEqual(len(sampler), int(dataset.runs["duration"].sum()))
+
+            # Windows match the data of the recording
+            run, offset = sampler.locate(len(sampler) - 1)
+            data, label = sampler[len(sampler) - 1]
+            # Files held by the pool can be opened by the EDF library
+            self.assertGreater(len(EDF_POOL), 0)
+            eeg = Eeg.loadEdf(
+                sampler.runs[run].edfFile.as_posix(), Eeg.Montage.UNIPOLAR, None, offset, 1
+            )
+            np.testing.assert_allclose(data, eeg.data, rtol=1e-5, atol=1e-3)
+            self.assertEqual(label, sampler.labels(run).labelAt(offset))
+
+            # Windows starting inside a data record and ending past the end of the recording
+            edfFile = sampler.runs[run].edfFile.as_posix()
+            eeg = Eeg.loadEdf(edfFile, Eeg.Montage.UNIPOLAR, None)
+            window, fs = EDF_POOL.read(edfFile, 37, 300)
+            self.assertEqual(fs, eeg.fs)
+            np.testing.assert_allclose(window, eeg.data[:, 37:337], rtol=1e-5, atol=1e-3)
+            window, _ = EDF_POOL.read(edfFile, eeg.data.shape[1] - 100, 300)
+            np.testing.assert_allclose(window[:, :100], eeg.data[:, -100:], rtol=1e-5, atol=1e-3)
+            self.assertFalse(window[:, 100:].any())
+
+            # Labels of the flat index match the label cache
+            for i in range(len(sampler)):
+                run, offset = sampler.locate(i)
+                self.assertEqual(sampler.label(run, offset), sampler.labels(run).labelAt(offset))
+
+            # Concurrent reads with a pool smaller than the number of files
+            maxOpen = EDF_POOL.maxOpen
+            EDF_POOL.maxOpen = 2
+            try:
+                with ThreadPoolExecutor(8) as executor:
+                    windows = list(executor.map(lambda i: sampler[i][0], range(len(sampler))))
+                self.assertLessEqual(len(EDF_POOL), 2)
+                np.testing.assert_array_equal(windows[-1], data)
+
+                # Process workers, with readers inherited from this process
+                copy = pickle.loads(pickle.dumps(sampler))
+                indices = range(len(copy) - 4, len(copy))
+                with ProcessPoolExecutor(2) as executor:
+                    windows = list(executor.map(_readWindow, [(copy, i) for i in indices]))
+                for i, window in zip(indices, windows):
+                    np.testing.assert_array_equal(window, sampler[i][0])
+            finally:
+                EDF_POOL.maxOpen = maxOpen
+                EDF_POOL.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
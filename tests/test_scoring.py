@@ -0,0 +1,49 @@
+"""Batch scoring unit testing"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from epilepsy2bids.annotations import Annotations
+from epilepsy2bids.scoring import loadEventsTable, scoreDataset
+
+
+def _eventsFile(root: Path, subject: str, run: int) -> str:
+    folder = root / f"sub-{subject}" / "ses-01" / "eeg"
+    folder.mkdir(parents=True, exist_ok=True)
+    return (folder / f"sub-{subject}_ses-01_task-szMonitoring_run-{run:02}_events.tsv").as_posix()
+
+
+class TestScoring(unittest.TestCase):
+    def test_scoreDataset(self):
+        annotations = Annotations.loadTsv("tests/sample.tsv")
+        with tempfile.TemporaryDirectory() as tmpDir:
+            refRoot = Path(tmpDir) / "ref"
+            hypRoot = Path(tmpDir) / "hyp"
+            for subject in ("01", "02"):
+                for run in (1, 2):
+                    annotations.saveTsv(_eventsFile(refRoot, subject, run))
+            # Perfect hypotheses for subject 01, no hypotheses for subject 02
+            for run in (1, 2):
+                annotations.saveTsv(_eventsFile(hypRoot, "01", run))
+
+            self.assertEqual(len(loadEventsTable(refRoot)), 12)
+            scores = scoreDataset(refRoot, hypRoot, numWorkers=1)
+
+        self.assertEqual(len(scores["run"]), 4)
+        self.assertEqual(len(scores["subject"]), 2)
+        subjects = scores["subject"].set_index("subject")
+        self.assertEqual(subjects.loc["01", "sample_sensitivity"], 1)
+        self.assertEqual(subjects.loc["01", "event_sensitivity"], 1)
+        self.assertEqual(subjects.loc["02", "event_sensitivity"], 0)
+        self.assertTrue(np.isnan(subjects.loc["02", "event_precision"]))
+        dataset = scores["dataset"].iloc[0]
+        self.assertEqual(dataset["duration"], 4 * 3600)
+        self.assertEqual(dataset["sample_refTrue"], 4 * np.sum(annotations.getMask(1)))
+        self.assertEqual(dataset["event_fp"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
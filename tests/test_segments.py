@@ -0,0 +1,48 @@
+"""Segment extraction unit testing"""
+
+import unittest
+
+import numpy as np
+
+from epilepsy2bids.annotations import Annotations, EventType
+from epilepsy2bids.segments import extractSegments, selectSegments
+
+
+class TestSegments(unittest.TestCase):
+    def test_selectSegments(self):
+        annotations = Annotations.loadTsv("tests/sample.tsv")
+        segments = selectSegments(annotations, margin=60, numBackground=3, backgroundDuration=100)
+        seizureSegments = [x for x in segments if x["eventType"] is not EventType.bckg]
+        backgroundSegments = [x for x in segments if x["eventType"] is EventType.bckg]
+        # The two first seizures overlap once extended by the margin
+        self.assertEqual(len(seizureSegments), 2)
+        self.assertEqual(seizureSegments[0]["onset"], 0)
+        self.assertEqual(seizureSegments[0]["duration"], np.ceil(304.56 + 121.14 + 60))
+        self.assertEqual(len(backgroundSegments), 3)
+        mask = annotations.getMask(1)
+        for segment in backgroundSegments:
+            start = int(segment["onset"])
+            self.assertEqual(np.sum(mask[start : start + int(segment["duration"])]), 0)
+        # Segments do not overlap
+        for previous, segment in zip(segments[:-1], segments[1:]):
+            self.assertLessEqual(previous["onset"] + previous["duration"], segment["onset"])
+        # Selection is deterministic
+        self.assertEqual(
+            segments, selectSegments(annotations, margin=60, numBackground=3, backgroundDuration=100)
+        )
+
+    def test_extractSegments(self):
+        annotations = Annotations.loadEvents([(0.5, 1)], 2)
+        extracted = extractSegments(
+            "tests/PN00-5_sample.edf", annotations, margin=0.2, numBackground=0
+        )
+        self.assertEqual(len(extracted), 1)
+        segment, eeg, segmentAnnotations = extracted[0]
+        self.assertEqual(segment["onset"], 0)
+        self.assertEqual(segment["duration"], 2)
+        self.assertEqual(eeg.data.shape[1], 2 * eeg.fs)
+        self.assertEqual(segmentAnnotations.getEvents(), [(0.5, 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""Session timeline unit testing"""
+
+import json
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from epilepsy2bids.annotations import Annotation, Annotations, EventType
+from epilepsy2bids.dataset import BidsDataset
+from epilepsy2bids.eeg import Eeg
+from epilepsy2bids.session import Session
+
+CHANNELS = [f"{x}-Avg" for x in Eeg.ELECTRODES_10_20]
+
+
+def _saveRun(root: Path, run: str, duration: float, events: list[tuple], dateTime: datetime):
+    """Write a run of 256 Hz random data with its sidecar and events."""
+    folder = root / "sub-01" / "ses-01" / "eeg"
+    folder.mkdir(parents=True, exist_ok=True)
+    baseName = folder / f"sub-01_ses-01_task-szMonitoring_run-{run}"
+    rng = np.random.default_rng(int(run))
+    Eeg(rng.normal(size=(len(CHANNELS), int(duration * 256))), CHANNELS, 256).saveEdf(f"{baseName}_eeg.edf")
+    sidecar = {"SamplingFrequency": 256, "EEGChannelCount": len(CHANNELS), "RecordingDuration": duration}
+    Path(f"{baseName}_eeg.json").write_text(json.dumps(sidecar))
+    annotations = Annotations()
+    for onset, eventDuration, eventType in events:
+        annotations.events.append(
+            Annotation(
+                onset=onset,
+                duration=eventDuration,
+                eventType=EventType[eventType],
+                confidence="n/a",
+                channels="n/a",
+                dateTime=dateTime,
+                recordingDuration=duration,
+            )
+        )
+    annotations.saveTsv(f"{baseName}_events.tsv")
+
+
+class TestSession(unittest.TestCase):
+    def test_session(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            root = Path(tmpDir)
+            start = datetime(2020, 1, 1, 10, 0, 0)
+            # Two contiguous runs with a seizure split between them, then a run after a gap
+            _saveRun(root, "01", 10, [(8, 2, "sz")], start)
+            _saveRun(root, "02", 10, [(0, 1, "sz")], start + timedelta(seconds=10))
+            _saveRun(root, "03", 5, [(0, 5, "bckg")], start + timedelta(seconds=60))
+            dataset = BidsDataset(root, cacheFile=None)
+            session = Session.fromDataset(dataset, "01", "01")
+            runs = {run.run: run for run in session.runs}
+
+            self.assertEqual(len(session), 3)
+            self.assertEqual(session.dateTime, start)
+            np.testing.assert_array_equal(session.starts, [0, 10, 60])
+            self.assertEqual(session.duration, 65)
+            self.assertListEqual(session.gaps(), [(20.0, 40.0)])
+            self.assertListEqual(session.gaps(minDuration=60), [])
+            run, offset = session.locate(12)
+            self.assertEqual((run.run, offset), ("02", 2.0))
+            self.assertEqual(session.locate(30), (None, None))
+            self.assertListEqual(session.channels, CHANNELS)
+
+            # Windows across a run boundary and across a gap
+            eeg = session.read(8, 4)
+            self.assertEqual(eeg.data.shape, (len(CHANNELS), 4 * 256))
+            expected = np.hstack((runs["01"].loadEeg(8, 2).data, runs["02"].loadEeg(0, 2).data))
+            np.testing.assert_array_equal(eeg.data, expected)
+            eeg = session.read(18, 44)
+            np.testing.assert_array_equal(eeg.data[:, : 2 * 256], runs["02"].loadEeg(8, 2).data)
+            self.assertTrue(np.isnan(eeg.data[:, 2 * 256 : 42 * 256]).all())
+            np.testing.assert_array_equal(eeg.data[:, 42 * 256 :], runs["03"].loadEeg(0, 2).data)
+            self.assertEqual(session.read().data.shape[1], 65 * 256)
+
+            # Events in session time, merged across the run boundary
+            seizures = session.events(eventType="seizure")
+            self.assertEqual(len(seizures), 1)
+            self.assertEqual((seizures["onset"][0], seizures["duration"][0], seizures["run"][0]), (8, 3, "01"))
+            self.assertEqual(len(session.events(30, 50)), 0)
+            events = session.events(start=50)
+            self.assertListEqual(events["eventType"].tolist(), ["bckg"])
+            self.assertEqual(events["onset"][0], 60)
+            self.assertEqual(len(session.events(eventType="sz", mergeGap=-1)), 2)
+
+            # Without dateTime, runs are placed one after the other
+            eventsFile = runs["03"].eventsFile
+            eventsFile.write_text(eventsFile.read_text().replace(str(start + timedelta(seconds=60)), "n/a"))
+            session = Session(dataset.getRuns())
+            self.assertIsNone(session.dateTime)
+            np.testing.assert_array_equal(session.starts, [0, 10, 20])
+            self.assertListEqual(session.gaps(), [])
+            self.assertRaises(ValueError, Session, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""Training shards unit testing"""
+
+import tempfile
+import unittest
+from importlib import resources as impresources
+from pathlib import Path
+
+import numpy as np
+
+from epilepsy2bids.bids.siena.convert2bids import convert as convertSiena
+from epilepsy2bids.dataset import BidsDataset
+from epilepsy2bids.labels import Labels
+from epilepsy2bids.shards import exportShards, iterShards, loadRecord, shardOrder
+
+TEST_DIR = impresources.files("tests") / "data"
+
+
+class TestShards(unittest.TestCase):
+    def test_exportShards(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            root = Path(tmpDir) / "siena"
+            convertSiena(TEST_DIR / "siena", root)
+            dataset = BidsDataset(root)
+            shards = exportShards(dataset, Path(tmpDir) / "shards", shardSize=1, window=1, stride=1)
+            # Every record starts a new shard with a 1 byte shard size
+            self.assertEqual(len(shards), len(dataset))
+
+            records = list(iterShards(Path(tmpDir) / "shards"))
+            self.assertEqual(len(records), len(dataset))
+            for (eeg, labels, metadata), run in zip(records, dataset):
+                reference = run.loadEeg()
+                np.testing.assert_allclose(eeg.data, reference.data, rtol=1e-6)
+                self.assertListEqual(list(eeg.channels), list(reference.channels))
+                expected = Labels.fromAnnotations(run.loadAnnotations(), 1, 1)
+                np.testing.assert_array_equal(labels.labels, expected.labels)
+                self.assertEqual(metadata["subject"], run.subject)
+
+            # Random access through the offset index
+            run = dataset[2]
+            key = f"sub-{run.subject}_ses-{run.session}_task-{run.task}_run-{run.run}"
+            eeg, labels, metadata = loadRecord(Path(tmpDir) / "shards", key)
+            np.testing.assert_array_equal(eeg.data, records[2][0].data)
+
+            # Deterministic shuffling of shards split between workers
+            order = shardOrder(len(shards), seed=1, epoch=3)
+            self.assertListEqual(order, shardOrder(len(shards), seed=1, epoch=3))
+            self.assertListEqual(sorted(order), list(range(len(shards))))
+            keys = [
+                x[2]["run"] + x[2]["subject"]
+                for worker in range(2)
+                for x in iterShards(Path(tmpDir) / "shards", seed=1, epoch=3, worker=worker, numWorkers=2)
+            ]
+            self.assertEqual(len(set(keys)), len(dataset))
+
+
+if __name__ == "__main__":
+    unittest.main()
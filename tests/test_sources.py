@@ -0,0 +1,144 @@
+"""Archive and file-like sources unit testing"""
+
+import gzip
+import io
+import tarfile
+import tempfile
+import unittest
+import zipfile
+from importlib import resources as impresources
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from epilepsy2bids.bids.siena.convert2bids import convert as convertSiena
+from epilepsy2bids.bids.tuh.convert2bids import convert as convertTuh
+from epilepsy2bids.edfheader import readEdfHeader
+from epilepsy2bids.eeg import Eeg
+from epilepsy2bids.load_annotations import tuh
+from epilepsy2bids.sources import (
+    ArchivePath,
+    _IndexedGzipFile,
+    openSource,
+    sourceEdfHeader,
+    sourceEdfStart,
+    sourcePath,
+)
+
+TEST_DIR = impresources.files("tests") / "data"
+
+
+def _zip(folder: Path, archiveFile: Path):
+    with zipfile.ZipFile(archiveFile, "w") as archive:
+        for file in sorted(Path(folder).rglob("*")):
+            if file.is_file():
+                archive.write(file, file.relative_to(folder).as_posix())
+
+
+def _files(folder: Path) -> dict[str, bytes]:
+    return {x.relative_to(folder).as_posix(): x.read_bytes() for x in sorted(Path(folder).rglob("*")) if x.is_file()}
+
+
+class TestSources(unittest.TestCase):
+    def test_archivePath(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            _zip(TEST_DIR / "tuh", Path(tmpDir) / "tuh.zip")
+            root = sourcePath(Path(tmpDir) / "tuh.zip")
+            self.assertIsInstance(root, ArchivePath)
+            self.assertIsInstance(sourcePath(tmpDir), Path)
+            self.assertTrue(root.is_dir())
+            self.assertListEqual(sorted(x.name for x in root.iterdir()), ["dev", "eval", "train"])
+            self.assertListEqual(
+                sorted(x.relative_to(root).as_posix() for x in root.rglob("*.edf")),
+                sorted(x.relative_to(TEST_DIR / "tuh").as_posix() for x in (TEST_DIR / "tuh").rglob("*.edf")),
+            )
+            edfFile = next(root.rglob("*.edf"))
+            self.assertTrue(edfFile.is_file())
+            self.assertFalse((root / "missing.edf").exists())
+            self.assertEqual(edfFile.read_bytes(), (TEST_DIR / "tuh" / edfFile.relative_to(root)).read_bytes())
+            self.assertRaises(ValueError, edfFile.open, "wb")
+
+            # Annotations are parsed from the archive
+            self.assertListEqual(
+                tuh.loadAnnotationsFromEdf(edfFile.as_posix()).events,
+                tuh.loadAnnotationsFromEdf((TEST_DIR / "tuh" / edfFile.relative_to(root)).as_posix()).events,
+            )
+
+    def test_loadEdf(self):
+        expected = Eeg.loadEdf("tests/PN00-5_sample.edf", Eeg.Montage.UNIPOLAR, Eeg.ELECTRODES_10_20)
+        content = Path("tests/PN00-5_sample.edf").read_bytes()
+        with tempfile.TemporaryDirectory() as tmpDir:
+            with gzip.open(f"{tmpDir}/sample.edf.gz", "wb") as f:
+                f.write(content)
+            with zipfile.ZipFile(f"{tmpDir}/sample.zip", "w") as archive:
+                archive.writestr("folder/sample.edf", content)
+            with openSource(f"{tmpDir}/sample.edf.gz") as f:
+                self.assertEqual(f.read(), content)
+            for source in (
+                f"{tmpDir}/sample.edf.gz",
+                f"{tmpDir}/sample.zip/folder/sample.edf",
+                content,
+                io.BytesIO(content),
+            ):
+                eeg = Eeg.loadEdf(source, Eeg.Montage.UNIPOLAR, Eeg.ELECTRODES_10_20)
+                self.assertListEqual(eeg.channels, expected.channels)
+                np.testing.assert_array_equal(eeg.data, expected.data)
+            # Converted files are read twice by loadEdfAutoDetectMontage
+            expected.standardize()
+            expected.saveEdf(f"{tmpDir}/standardized.edf")
+            eeg = Eeg.loadEdfAutoDetectMontage(io.BytesIO(Path(f"{tmpDir}/standardized.edf").read_bytes()))
+            self.assertEqual(eeg.montage, Eeg.Montage.UNIPOLAR)
+            self.assertListEqual(eeg.channels, expected.channels)
+
+    def test_convertArchive(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            tmpDir = Path(tmpDir)
+            convertSiena(TEST_DIR / "siena", tmpDir / "siena")
+            _zip(TEST_DIR / "siena", tmpDir / "siena.zip")
+            convertSiena(tmpDir / "siena.zip", tmpDir / "sienaZip")
+            self.assertDictEqual(_files(tmpDir / "sienaZip"), _files(tmpDir / "siena"))
+
+            convertTuh(TEST_DIR / "tuh", tmpDir / "tuh")
+            with tarfile.open(tmpDir / "tuh.tar.gz", "w:gz") as archive:
+                # Members stored in the reverse of the order in which they are converted
+                for file in sorted((TEST_DIR / "tuh").rglob("*"), reverse=True):
+                    if file.is_file():
+                        archive.add(file, f"tuh/{file.relative_to(TEST_DIR / 'tuh').as_posix()}")
+            # Snapshots of the decompression state every 64 KiB, so that members are read from the closest snapshot
+            with mock.patch("epilepsy2bids.sources._GZIP_SPAN", 2**16):
+                convertTuh(tmpDir / "tuh.tar.gz" / "tuh", tmpDir / "tuhTar")
+            self.assertDictEqual(_files(tmpDir / "tuhTar"), _files(tmpDir / "tuh"))
+
+    def test_indexedGzipFile(self):
+        rng = np.random.default_rng(0)
+        content = rng.integers(0, 256, 2**20, dtype=np.uint8).tobytes() + bytes(2**20) + b"end"
+        with tempfile.TemporaryDirectory() as tmpDir:
+            # Multi-member gzip file
+            with open(f"{tmpDir}/file.gz", "wb") as f:
+                f.write(gzip.compress(content[: 2**19]))
+                f.write(gzip.compress(content[2**19 :]))
+            stream = _IndexedGzipFile(f"{tmpDir}/file.gz", span=2**17)
+            self.assertEqual(stream.read(), content)
+            self.assertGreater(len(stream._snapshots), 4)
+            for start in rng.integers(0, len(content), 50):
+                stream.seek(start)
+                self.assertEqual(stream.read(50000), content[start : start + 50000])
+            self.assertEqual(stream.seek(10, io.SEEK_CUR), min(len(content), start + 50010))
+            stream.close()
+
+    def test_sourceEdfStart(self):
+        content = Path("tests/PN00-5_sample.edf").read_bytes()
+        expected = sourceEdfStart("tests/PN00-5_sample.edf")
+        with tempfile.TemporaryDirectory() as tmpDir:
+            with tarfile.open(f"{tmpDir}/sample.tar.gz", "w:gz") as archive:
+                archive.add("tests/PN00-5_sample.edf", "folder/sample.edf")
+            labels = readEdfHeader(io.BytesIO(content))["labels"]
+            for source in (f"{tmpDir}/sample.tar.gz/folder/sample.edf", content):
+                self.assertEqual(sourceEdfStart(source), expected)
+                self.assertListEqual(sourceEdfHeader(source)["labels"], labels)
+            self.assertEqual(sourceEdfStart(io.BytesIO(content)), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""Offline BIDS validator unit testing"""
+
+import json
+import tempfile
+import unittest
+from importlib import resources as impresources
+from pathlib import Path
+
+from epilepsy2bids.bids.chbmit.convert2bids import convert as convertChbmit
+from epilepsy2bids.bids.seizeit.convert2bids import convert as convertSeizeit
+from epilepsy2bids.bids.siena.convert2bids import convert as convertSiena
+from epilepsy2bids.bids.tuh.convert2bids import convert as convertTuh
+from epilepsy2bids.eeg import FileFormat
+from epilepsy2bids.validator import _isIgnored, _nameIssue, validateDataset
+
+TEST_DIR = impresources.files("tests") / "data"
+
+
+class TestValidator(unittest.TestCase):
+    def test_names(self):
+        for valid in (
+            "dataset_description.json",
+            "participants.tsv",
+            "task-szMonitoring_events.json",
+            "sub-01/ses-01/eeg/sub-01_ses-01_task-szMonitoring_run-01_eeg.edf",
+            "sub-01/ses-01/eeg/sub-01_ses-01_task-szMonitoring_run-01_events.tsv",
+            "sub-01/eeg/sub-01_task-szMonitoring_eeg.json",
+            "sub-01/sub-01_sessions.tsv",
+            "sub-01/ses-01/sub-01_ses-01_scans.tsv",
+        ):
+            self.assertIsNone(_nameIssue(valid), valid)
+        for invalid in (
+            "notes.txt",
+            "sub-01_events.json",
+            "sub-01/ses-01/eeg/sub-02_ses-01_task-szMonitoring_run-01_eeg.edf",
+            "sub-01/ses-01/eeg/sub-01_task-szMonitoring_run-01_eeg.edf",
+            "sub-01/ses-01/eeg/sub-01_ses-01_task-sz_monitoring_run-01_eeg.edf",
+            "sub-01/ses-01/eeg/sub-01_ses-01_task-szMonitoring_run-01_eeg.parquet",
+            "sub-01/ses-01/anat/sub-01_ses-01_T1w.nii",
+        ):
+            self.assertIsNotNone(_nameIssue(invalid), invalid)
+        self.assertTrue(_isIgnored("sub-01/ses-01/eeg/sub-01_ses-01_task-a_run-01_labels.npz", ["*_labels.npz"]))
+        self.assertTrue(_isIgnored("events.parquet", ["/events.parquet"]))
+        self.assertTrue(_isIgnored("extra/sub-01/file.txt", ["extra/"]))
+        self.assertFalse(_isIgnored("sub-01/events.parquet", ["/events.parquet"]))
+
+    def test_convert(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            for dataset, convert in zip(
+                ("chbmit", "seizeit", "siena", "tuh"),
+                (convertChbmit, convertSeizeit, convertSiena, convertTuh),
+            ):
+                # Raises a ValueError if the output has errors
+                convert(TEST_DIR / dataset, Path(tmpDir) / dataset, validate=True)
+            # Recordings in formats listed in .bidsignore
+            outDir = Path(tmpDir) / "chunked"
+            convertSiena(TEST_DIR / "siena", outDir, outputFormat=FileFormat.CHUNKED, validate=True)
+            report = validateDataset(outDir, numWorkers=2, batchSize=2)
+            self.assertFalse((report["severity"] == "error").any())
+
+    def test_validateDataset(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            root = Path(tmpDir)
+            convertSiena(TEST_DIR / "siena", root)
+            report = validateDataset(root, numWorkers=1)
+            self.assertFalse((report["severity"] == "error").any())
+
+            runs = sorted(root.glob("sub-*/ses-*/eeg/*_eeg.edf"))
+            base = [x.as_posix()[: -len("_eeg.edf")] for x in runs]
+            # Truncated EDF file
+            content = runs[0].read_bytes()
+            runs[0].write_bytes(content[:-10])
+            # Sidecar inconsistent with the EDF header
+            sidecarFile = Path(base[1] + "_eeg.json")
+            sidecar = json.loads(sidecarFile.read_text())
+            sidecar["SamplingFrequency"] = 128
+            del sidecar["PowerLineFrequency"]
+            sidecarFile.write_text(json.dumps(sidecar))
+            # Unknown event type and negative duration
+            eventsFile = Path(base[2] + "_events.tsv")
+            lines = eventsFile.read_text().splitlines()
+            fields = lines[1].split("\t")
+            fields[1] = "-1"
+            fields[2] = "sz_unknown"
+            eventsFile.write_text("\n".join(lines + ["\t".join(fields)]) + "\n")
+            # Missing events, badly named file, subject missing from participants.tsv
+            Path(base[3] + "_events.tsv").unlink()
+            (runs[4].parent / "notes.txt").write_text("notes")
+            participants = (root / "participants.tsv").read_text().splitlines()
+            (root / "participants.tsv").write_text("\n".join(participants[:-1]) + "\n")
+
+            report = validateDataset(root, numWorkers=2, batchSize=2)
+            errors = report[report["severity"] == "error"]
+            codes = {(file, code) for file, code in zip(errors["file"], errors["code"])}
+            relative = [Path(x).relative_to(root).as_posix() for x in base]
+            self.assertSetEqual(
+                codes,
+                {
+                    (f"{relative[0]}_eeg.edf", "EDF_SIZE"),
+                    (f"{relative[1]}_eeg.json", "SIDECAR_MISMATCH"),
+                    (f"{relative[1]}_eeg.json", "MISSING_FIELD"),
+                    (f"{relative[2]}_events.tsv", "INVALID_VALUE"),
+                    (f"{relative[2]}_events.tsv", "UNKNOWN_LEVEL"),
+                    (f"{relative[3]}_eeg.edf", "MISSING_EVENTS"),
+                    ((runs[4].parent / "notes.txt").relative_to(root).as_posix(), "INVALID_NAME"),
+                    ("participants.tsv", "PARTICIPANT_MISSING"),
+                },
+            )
+            self.assertRaises(ValueError, convertSiena, TEST_DIR / "siena", root, validate=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
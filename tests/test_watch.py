@@ -0,0 +1,117 @@
+"""Watch folder unit testing"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from importlib import resources as impresources
+from pathlib import Path
+
+import pandas as pd
+
+from epilepsy2bids.bids.siena.convert2bids import convert as convertSiena
+from epilepsy2bids.regression import compareDatasets
+from epilepsy2bids.scoring import loadEventsTable
+from epilepsy2bids.watch import WATCH_STATE, FolderWatcher
+
+TEST_DIR = impresources.files("tests") / "data"
+
+
+class TestWatch(unittest.TestCase):
+    def test_affectedRecordings(self):
+        files = {
+            x: (0, 0)
+            for x in (
+                "SUBJECT-INFO",
+                "P_ID64/P_ID64_r1.edf",
+                "P_ID64/P_ID64_r1_a1.tsv",
+                "P_ID64/P_ID64_r10.edf",
+                "P_ID64/P_ID64_r2.edf",
+                "P_ID64/summary.txt",
+                "P_ID83/P_ID83_r1.edf",
+                "train/p1/s1/a/p1_s1_t000.edf",
+                "train/p1/s1/a/p1_s1_t000.csv_bi",
+                "train/p1/s1/b/p1_s1_t001.edf",
+                "train/p1/s2/a/p1_s2_t000.edf",
+            )
+        }
+        watcher = FolderWatcher(convertSiena, Path("src"), Path("out"))
+        watcher.converted = dict(files)
+        # Modified recording or annotations of a single recording
+        self.assertListEqual(watcher.affectedRecordings(["P_ID64/P_ID64_r1.edf"], files), ["P_ID64/P_ID64_r1.edf"])
+        self.assertListEqual(watcher.affectedRecordings(["P_ID64/P_ID64_r1_a1.tsv"], files), ["P_ID64/P_ID64_r1.edf"])
+        # Annotations of a folder
+        self.assertListEqual(
+            watcher.affectedRecordings(["P_ID64/summary.txt"], files),
+            ["P_ID64/P_ID64_r1.edf", "P_ID64/P_ID64_r10.edf", "P_ID64/P_ID64_r2.edf"],
+        )
+        self.assertListEqual(watcher.affectedRecordings(["SUBJECT-INFO"], files), [])
+        # New recordings shift the runs of the recordings sorted after them in their run folder
+        del watcher.converted["P_ID64/P_ID64_r10.edf"]
+        self.assertListEqual(
+            watcher.affectedRecordings(["P_ID64/P_ID64_r10.edf"], files),
+            ["P_ID64/P_ID64_r10.edf", "P_ID64/P_ID64_r2.edf"],
+        )
+        del watcher.converted["train/p1/s1/a/p1_s1_t000.edf"]
+        self.assertListEqual(
+            watcher.affectedRecordings(["train/p1/s1/a/p1_s1_t000.edf"], files),
+            ["train/p1/s1/a/p1_s1_t000.edf", "train/p1/s1/b/p1_s1_t001.edf", "train/p1/s2/a/p1_s2_t000.edf"],
+        )
+        # TUH numbers runs per session
+        watcher.runFolderDepth = 3
+        self.assertListEqual(
+            watcher.affectedRecordings(["train/p1/s1/a/p1_s1_t000.edf"], files),
+            ["train/p1/s1/a/p1_s1_t000.edf", "train/p1/s1/b/p1_s1_t001.edf"],
+        )
+        self.assertListEqual(
+            watcher.affectedRecordings(["train/p1/s1/a/p1_s1_t000.csv_bi"], files), ["train/p1/s1/a/p1_s1_t000.edf"]
+        )
+
+    def test_poll(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            source = Path(tmpDir) / "source"
+            outDir = Path(tmpDir) / "bids"
+            shutil.copytree(TEST_DIR / "siena", source)
+            # Recordings that arrive later
+            later = Path(tmpDir) / "later"
+            later.mkdir()
+            for file in ("PN00/PN00-4.edf", "PN00/PN00-5.edf"):
+                shutil.move(source / file, later / Path(file).name)
+            shutil.move(source / "PN16", later / "PN16")
+
+            watcher = FolderWatcher(convertSiena, source, outDir, settleTime=0)
+            self.assertListEqual(watcher.poll(), ["PN00/PN00-1.edf", "PN00/PN00-2.edf", "PN00/PN00-3.edf"])
+            self.assertListEqual(watcher.poll(), [])
+            self.assertTrue((outDir / WATCH_STATE).exists())
+
+            for file in ("PN00-4.edf", "PN00-5.edf"):
+                shutil.move(later / file, source / "PN00" / file)
+            shutil.move(later / "PN16", source / "PN16")
+            # Files still being written are left for a later poll
+            self.assertListEqual(FolderWatcher(convertSiena, source, outDir, settleTime=3600).poll(), [])
+            self.assertListEqual(
+                watcher.poll(), ["PN00/PN00-4.edf", "PN00/PN00-5.edf", "PN16/PN16-1.edf", "PN16/PN16-2.edf"]
+            )
+            participants = pd.read_csv(outDir / "participants.tsv", sep="\t")
+            self.assertListEqual(participants["participant_id"].tolist(), ["sub-00", "sub-16"])
+
+            # Same dataset as a full conversion
+            fullDir = Path(tmpDir) / "full"
+            convertSiena(TEST_DIR / "siena", fullDir)
+            report = compareDatasets(fullDir, outDir, numWorkers=1).set_index("file")
+            self.assertListEqual(report.index[report["status"] == "added"].tolist(), [WATCH_STATE])
+            different = report.index[report["status"] == "different"].tolist()
+            self.assertTrue(set(different) <= {"events.parquet"})
+            pd.testing.assert_frame_equal(loadEventsTable(fullDir), loadEventsTable(outDir))
+
+            # The state is kept between watchers, annotations of a folder affect all its recordings
+            watcher = FolderWatcher(convertSiena, source, outDir, settleTime=0)
+            self.assertListEqual(watcher.poll(), [])
+            annotationFile = source / "PN16" / "Seizures-list-PN16.txt"
+            os.utime(annotationFile, ns=(annotationFile.stat().st_atime_ns, annotationFile.stat().st_mtime_ns + 10**9))
+            self.assertListEqual(watcher.poll(), ["PN16/PN16-1.edf", "PN16/PN16-2.edf"])
+            watcher.run(maxPolls=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
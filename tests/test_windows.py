@@ -0,0 +1,70 @@
+"""Balanced window index unit testing"""
+
+import tempfile
+import unittest
+from importlib import resources as impresources
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from epilepsy2bids.annotations import Annotations
+from epilepsy2bids.bids.tuh.convert2bids import convert as convertTuh
+from epilepsy2bids.dataset import BidsDataset
+from epilepsy2bids.labels import Labels
+from epilepsy2bids.sampler import EDF_POOL, WindowSampler
+from epilepsy2bids.windows import BACKGROUND, PREICTAL, WindowIndex, _labelWindows, buildWindowIndex
+
+TEST_DIR = impresources.files("tests") / "data"
+
+
+class TestWindowIndex(unittest.TestCase):
+    def test_buildWindowIndex(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            root = Path(tmpDir) / "tuh"
+            convertTuh(TEST_DIR / "tuh", root)
+            dataset = BidsDataset(root)
+            index = buildWindowIndex(dataset, window=1, stride=0.5, preictal=1)
+            sampler = WindowSampler(dataset, window=1, stride=0.5)
+            self.assertEqual(len(index), len(sampler))
+            self.assertIn(BACKGROUND, index.labels)
+            self.assertIn(PREICTAL, index.labels)
+            self.assertEqual(
+                sum(index.count(label) for label in index.labels), len(index)
+            )
+
+            # Balanced draws
+            rng = np.random.default_rng(0)
+            run, offset, labels = index.sample(1000, rng=rng)
+            counts = {label: labels.count(label) for label in index.labels}
+            self.assertGreater(min(counts.values()), 1000 / len(index.labels) / 2)
+            for i in range(100):
+                isSeizure = labels[i] not in (BACKGROUND, PREICTAL)
+                self.assertEqual(sampler.label(run[i], offset[i]), int(isSeizure))
+            run, offset, labels = index.sample(
+                100, {BACKGROUND: 1}, balanceSubjects=True, rng=rng
+            )
+            self.assertTrue(all(label == BACKGROUND for label in labels))
+            self.assertEqual(sampler.sample(run[0], offset[0])[0].shape[1], 256)
+            EDF_POOL.close()
+
+            # Save and load
+            index.save(Path(tmpDir) / "index.npz")
+            loaded = WindowIndex.load(Path(tmpDir) / "index.npz", dataset)
+            self.assertEqual(len(loaded), len(index))
+            self.assertTrue(loaded.groups.equals(index.groups))
+            self.assertTrue(loaded.runs["edfFile"].equals(index.runs["edfFile"]))
+
+    def test_labelWindowsSeveralSeizures(self):
+        # Two seizures covering 3 s each of the first 10 s window
+        seizures = pd.DataFrame({"onset": [2.0, 6.0], "duration": [3.0, 3.0], "eventType": ["sz_foc", "sz_gen"]})
+        labels = _labelWindows(2, seizures, window=10, stride=10, minOverlap=0.5, preictal=0)
+        self.assertListEqual(list(labels), ["sz_foc", BACKGROUND])
+        # Same decision as the label cache
+        annotations = Annotations.loadEvents([(2, 5), (6, 9)], 20)
+        cached = Labels.fromAnnotations(annotations, window=10, stride=10, minOverlap=0.5)
+        self.assertListEqual(list(cached.labels), [1, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()